@@ -0,0 +1,170 @@
+"""
+Access Log
+==========
+Fixed-capacity ring buffer of recent page views (served by `/logs`) with an
+optional background writer that appends batches to rotating NDJSON files.
+Recording an entry is an O(1) append; all file I/O happens on the writer
+thread.
+"""
+
+import os
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import get_config
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE_NAME = 'access.ndjson'
+
+
+class AccessLog:
+    """Recent access log entries plus batched persistence
+
+    Entries waiting for the writer are bounded too: if the disk falls behind,
+    the oldest unwritten entries are dropped (and counted) rather than
+    growing memory.
+    """
+
+    def __init__(self, capacity: int = 1000, log_dir: Optional[str] = None,
+                 max_bytes: int = 10 * 1024 * 1024, backups: int = 5, flush_interval: float = 2.0):
+        self.capacity = capacity
+        self.log_dir = Path(log_dir) if log_dir else None
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self._recent = deque(maxlen=capacity)
+        self._pending = deque(maxlen=capacity * 10) if self.log_dir else None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self.total = 0
+        self.written = 0
+        self.dropped = 0
+
+    def append(self, entry: Dict) -> None:
+        """Record one entry (no I/O)"""
+        self._recent.append(entry)
+        self.total += 1
+        if self._pending is not None:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append(entry)
+
+    def recent(self, limit: int = 100) -> List[Dict]:
+        """Most recent entries, oldest first"""
+        if limit <= 0:
+            return []
+        entries = list(self._recent)
+        return entries[-limit:]
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    @property
+    def path(self) -> Optional[Path]:
+        return self.log_dir / LOG_FILE_NAME if self.log_dir else None
+
+    def start(self) -> None:
+        """Start the background writer (no-op when persistence is disabled)"""
+        if self.log_dir is None or self._writer is not None:
+            return
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self._stopping.clear()
+        self._writer = threading.Thread(target=self._write_loop, name='access-log-writer', daemon=True)
+        self._writer.start()
+        logger.info(f"✓ Access log persisted to {self.path}")
+
+    def stop(self) -> None:
+        """Flush pending entries and stop the writer"""
+        if self._writer is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._writer.join(timeout=5)
+        self._writer = None
+
+    def _write_loop(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+        self.flush()
+
+    def flush(self) -> int:
+        """Write pending entries as one batch; returns how many were written"""
+        if self._pending is None or not self._pending:
+            return 0
+
+        batch = []
+        while self._pending:
+            try:
+                batch.append(self._pending.popleft())
+            except IndexError:
+                break
+
+        data = b''.join(dumps(entry) + b'\n' for entry in batch)
+        try:
+            self._rotate_if_needed(len(data))
+            with open(self.path, 'ab') as f:
+                f.write(data)
+            self.written += len(batch)
+        except OSError as e:
+            self.dropped += len(batch)
+            logger.warning(f"Failed to write {len(batch)} access log entries: {e}")
+            return 0
+        return len(batch)
+
+    def _rotate_if_needed(self, incoming: int) -> None:
+        """Shift access.ndjson → .1 → .2 … when the next batch would exceed max_bytes"""
+        path = self.path
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return
+        if size + incoming <= self.max_bytes:
+            return
+
+        if self.backups <= 0:
+            os.remove(path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = path.with_name(f"{path.name}.{index}")
+            if source.exists():
+                os.replace(source, path.with_name(f"{path.name}.{index + 1}"))
+        os.replace(path, path.with_name(f"{path.name}.1"))
+
+    def get_status(self) -> Dict:
+        """Get buffer usage and persistence counters"""
+        return {
+            'buffered': len(self._recent),
+            'capacity': self.capacity,
+            'total': self.total,
+            'persisted_to': str(self.path) if self.path else None,
+            'pending': len(self._pending) if self._pending is not None else 0,
+            'written': self.written,
+            'dropped': self.dropped
+        }
+
+
+# Global instance
+_access_log: Optional[AccessLog] = None
+
+
+def get_access_log() -> AccessLog:
+    """Get global access log instance"""
+    global _access_log
+    if _access_log is None:
+        config = get_config()
+        _access_log = AccessLog(
+            capacity=config.ACCESS_LOG_CAPACITY,
+            log_dir=config.ACCESS_LOG_DIR or None,
+            max_bytes=config.ACCESS_LOG_MAX_BYTES,
+            backups=config.ACCESS_LOG_BACKUPS,
+            flush_interval=config.ACCESS_LOG_FLUSH_INTERVAL
+        )
+    return _access_log
@@ -0,0 +1,181 @@
+"""
+Admission Control
+=================
+Process-wide budget for concurrent upstream (Open-Meteo) calls. Callers wait
+in a bounded queue for a slot; when the queue is full or a slot doesn't free
+up in time the call is shed with a Retry-After hint instead of piling more
+load onto the upstream container. A request that makes several upstream
+calls shares one queue deadline between them (see `UpstreamBudget.deadline`).
+"""
+
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from .config import get_config
+from .circuit_breaker import CircuitBreaker, get_circuit_breaker
+
+logger = logging.getLogger(__name__)
+
+# Monotonic time by which the current request must have its upstream slots
+_current_deadline: ContextVar[Optional[float]] = ContextVar('upstream_deadline', default=None)
+
+
+class UpstreamOverloaded(Exception):
+    """Raised when an upstream call is shed by the concurrency budget
+
+    `status_code` is 429 when the wait queue is full and 503 when the call
+    waited longer than the queue timeout; `retry_after` is in seconds.
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class UpstreamBudget:
+    """Bounded concurrency for upstream calls with a bounded, time-limited queue"""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+        self._avg_hold = 0.5  # seconds, smoothed
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _retry_after(self) -> int:
+        """Estimate how long until the current backlog has drained"""
+        backlog = self._waiting + self._in_use + 1
+        return max(1, math.ceil(backlog * self._avg_hold / self.max_concurrent))
+
+    def _acquire(self, timeout: Optional[float]) -> None:
+        with self._lock:
+            # Full when every slot is taken and the queue behind them is too
+            if self._in_use + self._waiting >= self.max_concurrent + self.max_queue:
+                self.rejected += 1
+                raise UpstreamOverloaded(
+                    f"Upstream queue full ({self._waiting} waiting)", 429, self._retry_after()
+                )
+            self._waiting += 1
+
+        acquired = self._slots.acquire(timeout=timeout)
+
+        with self._lock:
+            self._waiting -= 1
+            if not acquired:
+                self.timed_out += 1
+                raise UpstreamOverloaded(
+                    f"No upstream capacity within {timeout:.1f}s", 503, self._retry_after()
+                )
+            self._in_use += 1
+            self.admitted += 1
+
+    def _release(self, held: float) -> None:
+        with self._lock:
+            self._in_use -= 1
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+        self._slots.release()
+
+    @contextmanager
+    def deadline(self, timeout: Optional[float] = None):
+        """Share one queue deadline between every slot taken in the block
+
+        Sequential calls then wait at most `timeout` seconds (the configured
+        queue timeout by default) in total rather than each. Nested blocks
+        keep the outer deadline.
+        """
+        if _current_deadline.get() is not None:
+            yield
+            return
+        token = _current_deadline.set(time.monotonic() + (self.queue_timeout if timeout is None else timeout))
+        try:
+            yield
+        finally:
+            _current_deadline.reset(token)
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """Hold one upstream slot for the duration of the block
+
+        Waits at most `timeout` seconds (by default what is left of the
+        current `deadline`, or the configured queue timeout outside one) and
+        raises UpstreamOverloaded when the call is shed.
+        """
+        if timeout is None:
+            deadline = _current_deadline.get()
+            timeout = self.queue_timeout if deadline is None else max(0.0, deadline - time.monotonic())
+        self._acquire(timeout)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - start)
+
+    def get_status(self) -> Dict:
+        """Get current budget usage and shedding counters"""
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'max_queue': self.max_queue,
+                'queue_timeout_seconds': self.queue_timeout,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'avg_call_ms': int(self._avg_hold * 1000)
+            }
+
+
+# Upstream calls with their own breaker, so the latency of one class never sets the other's
+# timeout: live fetches (1 past day, 5s ceiling) and dataset refreshes (PAST_DAYS, 10s ceiling)
+UPSTREAM_CALL_CLASSES = ('live', 'refresh')
+
+# Refresh calls carry more history and get twice the live timeout ceiling
+REFRESH_SLOW_CALL_FACTOR = 2
+
+
+def get_upstream_breaker(call_class: str = 'live') -> CircuitBreaker:
+    """Get the circuit breaker for one class of calls to the Open-Meteo upstream"""
+    if call_class not in UPSTREAM_CALL_CLASSES:
+        raise ValueError(f"Unknown upstream call class: {call_class}")
+    config = get_config()
+    slow_call_seconds = config.CIRCUIT_SLOW_CALL_SECONDS
+    if call_class == 'refresh':
+        slow_call_seconds *= REFRESH_SLOW_CALL_FACTOR
+    return get_circuit_breaker(
+        f'open-meteo-{call_class}',
+        error_threshold=config.CIRCUIT_ERROR_THRESHOLD,
+        min_calls=config.CIRCUIT_MIN_CALLS,
+        open_seconds=config.CIRCUIT_OPEN_SECONDS,
+        slow_call_seconds=slow_call_seconds,
+        min_timeout=config.UPSTREAM_MIN_TIMEOUT
+    )
+
+
+# Global instance
+_upstream_budget: Optional[UpstreamBudget] = None
+
+
+def get_upstream_budget() -> UpstreamBudget:
+    """Get global upstream budget instance"""
+    global _upstream_budget
+    if _upstream_budget is None:
+        config = get_config()
+        _upstream_budget = UpstreamBudget(
+            max_concurrent=config.UPSTREAM_MAX_CONCURRENCY,
+            max_queue=config.UPSTREAM_QUEUE_SIZE,
+            queue_timeout=config.UPSTREAM_QUEUE_TIMEOUT
+        )
+    return _upstream_budget
@@ -7,8 +7,11 @@ class WeatherStation {
     constructor() {
         this.dataCache = null;
         this.dataCacheTime = 0;
+        this.dataVersion = null;
         this.dataStatus = null;
         this.statusCheckInterval = null;
+        this.eventSource = null;
+        this.eventStreamConnected = false;
         this.init();
     }
 
@@ -17,14 +20,54 @@ class WeatherStation {
         this.addAnimations();
         this.enhanceUserExperience();
         this.setupDataStatusMonitoring();
+        this.setupEventStream();
         this.loadWeatherData();
     }
 
+    setupEventStream() {
+        // Push updates replace polling where the browser supports Server-Sent Events
+        if (!window.EventSource) return;
+
+        this.eventSource = new EventSource('/api/events');
+        this.eventSource.onopen = () => {
+            this.eventStreamConnected = true;
+        };
+        this.eventSource.onerror = () => {
+            // EventSource reconnects by itself; poll until it does
+            this.eventStreamConnected = false;
+        };
+
+        this.eventSource.addEventListener('dataset_version', (event) => {
+            const update = JSON.parse(event.data);
+            if (this.dataCache && this.dataVersion !== null && update.version !== this.dataVersion) {
+                this.loadWeatherData(true);
+            }
+        });
+        this.eventSource.addEventListener('resync', () => {
+            if (this.dataCache) {
+                this.loadWeatherData(true);
+            }
+            this.checkDataStatus();
+        });
+        this.eventSource.addEventListener('refresh_progress', (event) => {
+            const progress = JSON.parse(event.data);
+            if (progress.stage === 'completed' || progress.stage === 'failed') {
+                this.checkDataStatus();
+            }
+        });
+        this.eventSource.addEventListener('upstream_health', () => {
+            this.checkDataStatus();
+        });
+    }
+
     setupDataStatusMonitoring() {
         // Check data status every 5 minutes
         this.checkDataStatus();
         this.statusCheckInterval = setInterval(() => {
-            this.checkDataStatus();
+            // Status changes are pushed while the event stream is connected
+            if (!this.eventStreamConnected) {
+                this.checkDataStatus();
+            }
         }, 300000); // 5 minutes
         
         // Add status indicator to navbar if it exists
@@ -38,8 +81,8 @@ class WeatherStation {
                 this.dataStatus = await response.json();
                 this.updateStatusIndicator();
                 
-                // If data needs updating, show notification
-                if (this.dataStatus.needs_update && this.dataStatus.auto_update_enabled) {
+                // If cities are waiting for a refresh, show notification
+                if (this.dataStatus.pending_refresh > 0 && this.dataStatus.auto_update_enabled) {
                     this.showDataUpdateNotification();
                 }
             }
@@ -224,7 +267,7 @@ class WeatherStation {
                 <div class="col-md-6">
                     <strong>Auto-Update:</strong><br>
                     ${this.dataStatus.auto_update_enabled ? '✅' : '❌'} ${this.dataStatus.auto_update_enabled ? 'Enabled' : 'Disabled'}<br>
-                    <small>Every ${Math.round(this.dataStatus.update_interval_hours || 168)} hours</small>
+                    <small>Next refresh ${this.dataStatus.next_refresh_at ? new Date(this.dataStatus.next_refresh_at).toLocaleString() : 'unknown'}</small>
                 </div>
                 <div class="col-md-6">
                     <strong>Locations:</strong><br>
@@ -304,6 +347,12 @@ class WeatherStation {
             return this.dataCache;
         }
         
+        // Once the cache is older, ask the server whether anything changed before re-downloading
+        if (!forceRefresh && this.dataCache && this.dataVersion !== null && !(await this.hasDataChanged())) {
+            this.dataCacheTime = now;
+            return this.dataCache;
+        }
+        
         try {
             const controller = new AbortController();
             const timeoutId = setTimeout(() => controller.abort(), 30000); // 30s timeout
@@ -321,6 +370,7 @@ class WeatherStation {
                 const result = await response.json();
                 this.dataCache = result.data;
                 this.dataCacheTime = now;
+                this.dataVersion = result.version ?? null;
                 
                 // Trigger custom event for data load
                 window.dispatchEvent(new CustomEvent('weatherDataLoaded', { 
@@ -356,6 +406,17 @@ class WeatherStation {
         }
     }
 
+    async hasDataChanged() {
+        try {
+            const response = await fetch(`/api/data/changes?since=${this.dataVersion}`);
+            // 204 means no city changed since our version
+            return response.status !== 204;
+        } catch (error) {
+            console.warn('Failed to check data changes:', error);
+            return true;
+        }
+    }
+
     setupGlobalHandlers() {
         // Add loading states for forms
         document.addEventListener('submit', (e) => {
@@ -0,0 +1,367 @@
+"""
+Cache Backends
+==============
+Pluggable key/value cache for live city data, serialized responses and
+computed stats. The in-process LRU is the default; the Redis backend lets
+several nodes share warm entries (any Redis-protocol server works, including
+fakeredis for local testing). Serialized response fragments get a separate,
+byte-bounded cache so they never push data out of the data cache.
+"""
+
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import get_config
+from .serialization import dumps, loads
+
+try:
+    import redis
+except ImportError:  # Optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Redis values are tagged so raw bytes (pre-serialized responses) round-trip unchanged
+_BYTES_TAG = b'b'
+_JSON_TAG = b'j'
+
+
+class CacheBackend(ABC):
+    """Interface shared by all cache backends
+
+    Values must be JSON-serializable or bytes so every backend can store
+    them. Cached objects may be shared between callers and must be treated
+    as read-only.
+    """
+
+    name = 'abstract'
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Get a value, or None when missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value; `ttl` is in seconds (None uses the backend default)"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a value if present"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every value owned by this cache"""
+
+    @abstractmethod
+    def get_stats(self) -> Dict:
+        """Get hit/miss statistics"""
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get several values at once; missing keys are left out of the result"""
+        result = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def snapshot(self, prefix: str = '') -> List[Tuple[str, Any, Optional[float]]]:
+        """List (key, value, remaining ttl) of entries to persist across restarts
+
+        Empty for backends that outlive the process on their own.
+        """
+        return []
+
+    def restore(self, entries: Iterable[Tuple[str, Any, Optional[float]]]) -> int:
+        """Load entries produced by `snapshot`; returns how many were restored"""
+        count = 0
+        for key, value, ttl in entries:
+            if ttl is not None and ttl <= 0:
+                continue
+            self.set(key, value, ttl)
+            count += 1
+        return count
+
+    def get_or_set(self, key: str, compute, ttl: Optional[float] = None) -> Any:
+        """Return the cached value, computing and storing it on a miss (None is not cached)"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.set(key, value, ttl)
+        return value
+
+
+def _size(value: Any) -> int:
+    """Bytes counted against `max_bytes`; only pre-serialized values have a known size"""
+    return len(value) if isinstance(value, (bytes, bytearray)) else 0
+
+
+class InProcessLRUCache(CacheBackend):
+    """Thread-safe LRU cache with per-entry expiry, local to this process
+
+    Bounded by entry count and, when `max_bytes` is set, by the total size of
+    bytes values.
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int = 1024, default_ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= _size(value)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        size = _size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= _size(previous[1])
+            self._entries[key] = (expires_at, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= _size(evicted)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= _size(entry[1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self, prefix: str = '') -> List[Tuple[str, Any, Optional[float]]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value, expires_at - now if expires_at is not None else None)
+                for key, (expires_at, value) in self._entries.items()
+                if key.startswith(prefix) and (expires_at is None or expires_at > now)
+            ]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.name,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+class RedisCache(CacheBackend):
+    """Cache shared between nodes through a Redis-protocol server
+
+    Pass `client` to use an existing connection (e.g. a fakeredis instance);
+    otherwise one is created from `url`. Connection errors are logged and
+    treated as misses so an unavailable cache never fails a request.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url: Optional[str] = None, client=None, prefix: str = 'weatherstation:',
+                 default_ttl: Optional[float] = None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("The redis package is required for the Redis cache backend")
+            client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.client = client
+        self.url = url
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _encode(self, value: Any) -> bytes:
+        if isinstance(value, (bytes, bytearray)):
+            return _BYTES_TAG + bytes(value)
+        return _JSON_TAG + dumps(value)
+
+    def _decode(self, raw: Optional[bytes]) -> Optional[Any]:
+        if raw is None:
+            return None
+        if raw[:1] == _BYTES_TAG:
+            return raw[1:]
+        return loads(raw[1:])
+
+    def _record(self, value: Optional[Any]) -> Optional[Any]:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            return self._record(self._decode(self.client.get(self.prefix + key)))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis cache get failed for {key}: {e}")
+            return None
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            raw_values = self.client.mget([self.prefix + key for key in keys])
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis cache mget failed: {e}")
+            return {}
+
+        result = {}
+        for key, raw in zip(keys, raw_values):
+            value = self._record(self._decode(raw))
+            if value is not None:
+                result[key] = value
+        return result
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            if ttl:
+                self.client.set(self.prefix + key, self._encode(value), px=max(1, int(ttl * 1000)))
+            else:
+                self.client.set(self.prefix + key, self._encode(value))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis cache set failed for {key}: {e}")
+
+    def delete(self, key: str) -> None:
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis cache delete failed for {key}: {e}")
+
+    def clear(self) -> None:
+        """Delete keys under this cache's prefix (other data in the database is untouched)"""
+        try:
+            keys = list(self.client.scan_iter(match=self.prefix + '*', count=500))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis cache clear failed: {e}")
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.name,
+            'prefix': self.prefix,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            'errors': self.errors
+        }
+
+
+def create_cache_backend(config=None) -> CacheBackend:
+    """Create the cache backend selected by CACHE_BACKEND, falling back to memory"""
+    config = config or get_config()
+
+    if config.CACHE_BACKEND == 'redis':
+        try:
+            cache = RedisCache(url=config.CACHE_REDIS_URL, prefix=config.CACHE_KEY_PREFIX)
+            cache.client.ping()
+            logger.info(f"✓ Using Redis cache at {config.CACHE_REDIS_URL}")
+            return cache
+        except Exception as e:
+            logger.warning(f"⚠️ Redis cache unavailable ({e}), falling back to in-process cache")
+
+    return InProcessLRUCache(max_entries=config.CACHE_MAX_ENTRIES)
+
+
+def create_response_cache(config=None) -> CacheBackend:
+    """Create the cache for serialized response fragments
+
+    Kept apart from the data cache so fragments for many `points` variants
+    cannot evict live data. In memory it is bounded by RESPONSE_CACHE_MAX_BYTES;
+    with Redis it shares the server under its own key prefix.
+    """
+    config = config or get_config()
+
+    if config.CACHE_BACKEND == 'redis':
+        try:
+            cache = RedisCache(url=config.CACHE_REDIS_URL, prefix=config.CACHE_KEY_PREFIX + 'response:')
+            cache.client.ping()
+            return cache
+        except Exception as e:
+            logger.warning(f"⚠️ Redis response cache unavailable ({e}), falling back to in-process cache")
+
+    # Entry count is only a backstop, the byte budget is the real limit
+    return InProcessLRUCache(max_entries=max(config.CACHE_MAX_ENTRIES, 65536),
+                             max_bytes=config.RESPONSE_CACHE_MAX_BYTES)
+
+
+# Global instances
+_cache: Optional[CacheBackend] = None
+_response_cache: Optional[CacheBackend] = None
+
+
+def get_cache() -> CacheBackend:
+    """Get global cache backend instance"""
+    global _cache
+    if _cache is None:
+        _cache = create_cache_backend()
+    return _cache
+
+
+def get_response_cache() -> CacheBackend:
+    """Get global response fragment cache instance"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = create_response_cache()
+    return _response_cache
@@ -0,0 +1,224 @@
+"""
+Circuit Breaker
+===============
+Closed / open / half-open circuit breaker for upstream calls, driven by the
+rolling error rate and share of slow calls, plus timeouts that adapt to the
+observed upstream p95 latency.
+
+This module only depends on the standard library so the standalone CLI
+updater can import it as well.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Whether an exception from an upstream call says the upstream is unhealthy
+
+    HTTP errors count only for 5xx and 429 responses; a 4xx answer means the
+    upstream is up and the request was bad. Anything without a response
+    (timeouts, connection errors) counts.
+    """
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status is None or status >= 500 or status == 429
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Fails fast while an upstream is unhealthy and probes it before recovering
+
+    The breaker opens when, over the last `window_seconds` (and at least
+    `min_calls` calls), the error rate reaches `error_threshold` or the share
+    of calls slower than `slow_call_seconds` reaches `slow_call_threshold`.
+    After `open_seconds` a limited number of trial calls is let through; one
+    success closes the circuit, one failure opens it again.
+    """
+
+    def __init__(self, name: str, error_threshold: float = 0.5, min_calls: int = 10,
+                 window_seconds: float = 60, window_size: int = 200, open_seconds: float = 30,
+                 slow_call_seconds: float = 4.0, slow_call_threshold: float = 0.8,
+                 half_open_calls: int = 1, min_timeout: float = 1.0, timeout_multiplier: float = 3.0):
+        self.name = name
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_threshold = slow_call_threshold
+        self.half_open_calls = half_open_calls
+        self.min_timeout = min_timeout
+        self.timeout_multiplier = timeout_multiplier
+
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=window_size)  # (timestamp, ok, latency or None)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._p95: Optional[float] = None
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        previous, self._state = self._state, state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+        if state == HALF_OPEN:
+            self._trials = 0
+        if state == CLOSED:
+            self._calls.clear()
+            self._p95 = None
+        log = logger.warning if state == OPEN else logger.info
+        log(f"Circuit '{self.name}' {previous} → {state}")
+
+    def _prune(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _check(self, now: float) -> str:
+        """Raise CircuitOpenError if calls are being rejected, else return the state (lock held)"""
+        state = self._current_state(now)
+        if state == OPEN or (state == HALF_OPEN and self._trials >= self.half_open_calls):
+            self.rejected += 1
+            retry_after = max(0.0, self.open_seconds - (now - self._opened_at)) if state == OPEN else 1.0
+            raise CircuitOpenError(self.name, retry_after)
+        return state
+
+    def check(self) -> None:
+        """Raise CircuitOpenError if calls are currently being rejected"""
+        with self._lock:
+            self._check(time.monotonic())
+
+    def _begin(self) -> None:
+        # Checked and counted in one critical section so only `half_open_calls` trials get through
+        with self._lock:
+            if self._check(time.monotonic()) == HALF_OPEN:
+                self._trials += 1
+
+    def record(self, ok: bool, latency: Optional[float]) -> None:
+        """Record the outcome of one call and update the circuit state
+
+        A latency of None counts the call for the error rate only (e.g. a
+        health probe, whose latency says nothing about regular calls).
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._transition(CLOSED if ok else OPEN)
+                if ok:
+                    self._calls.append((now, ok, latency))
+                return
+
+            self._calls.append((now, ok, latency))
+            self._p95 = None
+            self._prune(now)
+            if self._state != CLOSED or len(self._calls) < self.min_calls:
+                return
+
+            failures = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+            slow = sum(1 for _, _, call_latency in self._calls
+                       if call_latency is not None and call_latency >= self.slow_call_seconds)
+            if (failures / len(self._calls) >= self.error_threshold
+                    or slow / len(self._calls) >= self.slow_call_threshold):
+                self._transition(OPEN)
+
+    @contextmanager
+    def guard(self, timed: bool = True):
+        """Run one upstream call under the breaker
+
+        Raises CircuitOpenError without running the block when the circuit is
+        open. Exceptions raised by the block count as failures when
+        `is_upstream_failure` says so. With `timed=False` the call's latency
+        is left out of the p95 and slow-call statistics.
+        """
+        self._begin()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.record(not is_upstream_failure(e), time.monotonic() - start if timed else None)
+            raise
+        else:
+            self.record(True, time.monotonic() - start if timed else None)
+
+    def latency_p95(self) -> Optional[float]:
+        """95th percentile latency of recent successful calls, if known"""
+        with self._lock:
+            if self._p95 is None:
+                latencies = sorted(latency for _, ok, latency in self._calls if ok and latency is not None)
+                if len(latencies) < self.min_calls:
+                    return None
+                self._p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            return self._p95
+
+    def timeout(self, ceiling: float) -> float:
+        """Timeout for the next call: a multiple of the observed p95, capped at `ceiling`"""
+        p95 = self.latency_p95()
+        if p95 is None:
+            return ceiling
+        return min(ceiling, max(self.min_timeout, p95 * self.timeout_multiplier))
+
+    def get_status(self) -> Dict:
+        """Get circuit state and rolling statistics"""
+        p95 = self.latency_p95()
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            self._prune(now)
+            calls = len(self._calls)
+            failures = sum(1 for _, ok, _ in self._calls if not ok)
+            return {
+                'name': self.name,
+                'state': state,
+                'window_calls': calls,
+                'error_rate': round(failures / calls, 3) if calls else 0.0,
+                'latency_p95_ms': int(p95 * 1000) if p95 is not None else None,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened,
+                'retry_in_seconds': round(max(0.0, self.open_seconds - (now - self._opened_at)), 1) if state == OPEN else 0
+            }
+
+
+# Breakers shared by everything in this process that talks to the same upstream
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, **settings) -> CircuitBreaker:
+    """Get the named breaker, creating it with `settings` on first use"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **settings)
+        return breaker
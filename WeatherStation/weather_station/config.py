@@ -16,6 +16,7 @@ class WeatherStationConfig:
         self.HOST = os.getenv('WEATHER_STATION_HOST', '0.0.0.0')
         self.PORT = int(os.getenv('WEATHER_STATION_PORT', '8110'))
         self.DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
+        self.WORKERS = int(os.getenv('WORKERS', '1'))
         
         # API configuration
         self.OPEN_METEO_BASE_URL = os.getenv(
@@ -25,23 +26,105 @@ class WeatherStationConfig:
         self.USE_SELF_HOSTED = os.getenv('USE_SELF_HOSTED', 'true').lower() == 'true'
         self.SELF_HOSTED_PORT = int(os.getenv('SELF_HOSTED_PORT', '8080'))
         self.LIVE_DATA_ENABLED = os.getenv('LIVE_DATA_ENABLED', 'true').lower() == 'true'
+        # 'live', 'file' or 'hybrid' (memory → snapshot → upstream); defaults from LIVE_DATA_ENABLED
+        self.DATA_MODE = os.getenv('DATA_MODE', 'live' if self.LIVE_DATA_ENABLED else 'file').lower()
+        self.LIVE_DATA_ENABLED = self.DATA_MODE == 'live'
+        self.HYBRID_REFRESH_WORKERS = int(os.getenv('HYBRID_REFRESH_WORKERS', '4'))
+        self.HYBRID_RETRY_INTERVAL = float(os.getenv('HYBRID_RETRY_INTERVAL', '60'))
         
         # Data configuration
         self.DATA_UPDATE_INTERVAL = int(os.getenv('DATA_UPDATE_INTERVAL', '604800'))  # 7 days in seconds
-        self.DATA_RETENTION_DAYS = int(os.getenv('DATA_RETENTION_DAYS', '16'))  # Maximum 16 days of data
+        # Refreshes follow upstream model runs (UTC hours), once each run is served
+        self.MODEL_RUN_HOURS = [
+            int(hour) for hour in os.getenv('MODEL_RUN_HOURS', '0,6,12,18').split(',') if hour.strip()
+        ]
+        self.MODEL_RUN_LAG_MINUTES = float(os.getenv('MODEL_RUN_LAG_MINUTES', '240'))
+        self.REFRESH_WINDOW_MINUTES = float(os.getenv('REFRESH_WINDOW_MINUTES', '60'))
+        self.REFRESH_BATCHES = int(os.getenv('REFRESH_BATCHES', '6'))
+        self.REFRESH_IDLE_HOURS = float(os.getenv('REFRESH_IDLE_HOURS', '24'))  # Cities nobody requested
+        self.MODEL_SYNC_COMMAND = os.getenv('MODEL_SYNC_COMMAND', '')  # e.g. ./init-weather-data.sh
+        self.MODEL_SYNC_TIMEOUT = float(os.getenv('MODEL_SYNC_TIMEOUT', '1800'))
+        self.DATA_RETENTION_DAYS = int(os.getenv('DATA_RETENTION_DAYS', '16'))  # Past days kept in the data file; caps PAST_DAYS
         self.PAST_DAYS = int(os.getenv('PAST_DAYS', '16'))  # Fetch last 16 days
         self.MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))
         self.RETRY_DELAY = int(os.getenv('RETRY_DELAY', '5'))
         self.AUTO_UPDATE_ENABLED = os.getenv('AUTO_UPDATE_ENABLED', 'true').lower() == 'true'
+        self.VERSION_HISTORY_LIMIT = int(os.getenv('VERSION_HISTORY_LIMIT', '200'))
+        self.DATA_PARSE_CACHE_ENTRIES = int(os.getenv('DATA_PARSE_CACHE_ENTRIES', '64'))  # Parsed cities kept per worker
+        self.INGEST_MODE = os.getenv('INGEST_MODE', 'thread').lower()  # 'thread' or 'process'
+        self.INGEST_JOIN_TIMEOUT = float(os.getenv('INGEST_JOIN_TIMEOUT', '30'))
+        # Forecast models requested upstream, in order of preference for the generic fields
+        self.FORECAST_MODELS = [
+            model.strip()
+            for model in os.getenv('FORECAST_MODELS', 'ecmwf_ifs025,ncep_gfs025,meteofrance_arpege_world025').split(',')
+            if model.strip()
+        ]
+        self.KEEP_MODEL_FIELDS = os.getenv('KEEP_MODEL_FIELDS', 'false').lower() == 'true'
+        self.ENSEMBLE_STATS_ENABLED = os.getenv('ENSEMBLE_STATS_ENABLED', 'false').lower() == 'true'
+        
+        # Upstream admission control
+        self.UPSTREAM_MAX_CONCURRENCY = int(os.getenv('UPSTREAM_MAX_CONCURRENCY', '8'))
+        self.UPSTREAM_QUEUE_SIZE = int(os.getenv('UPSTREAM_QUEUE_SIZE', '64'))
+        self.UPSTREAM_QUEUE_TIMEOUT = float(os.getenv('UPSTREAM_QUEUE_TIMEOUT', '10'))
+        
+        # Upstream circuit breaker and adaptive timeouts
+        self.CIRCUIT_ERROR_THRESHOLD = float(os.getenv('CIRCUIT_ERROR_THRESHOLD', '0.5'))
+        self.CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', '10'))
+        self.CIRCUIT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))
+        self.CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv('CIRCUIT_SLOW_CALL_SECONDS', '4'))
+        self.UPSTREAM_MIN_TIMEOUT = float(os.getenv('UPSTREAM_MIN_TIMEOUT', '1'))
+        
+        # Cache configuration
+        self.CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory').lower()  # 'memory' or 'redis'
+        self.CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+        self.CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'weatherstation:')
+        self.CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '2048'))
+        self.LIVE_CACHE_TTL = float(os.getenv('LIVE_CACHE_TTL', '300'))
+        self.LIVE_CACHE_MAX_STALE = float(os.getenv('LIVE_CACHE_MAX_STALE', '3600'))
+        self.RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+        self.RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        self.STATUS_CACHE_TTL = float(os.getenv('STATUS_CACHE_TTL', '30'))
+        
+        # Event stream configuration
+        self.EVENTS_HEARTBEAT_INTERVAL = float(os.getenv('EVENTS_HEARTBEAT_INTERVAL', '15'))
+        self.EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', '32'))
+        self.EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', '5000'))
+        self.EVENTS_RETRY_MS = int(os.getenv('EVENTS_RETRY_MS', '5000'))
+        
+        # Observability
+        self.METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+        
+        # Event loop protection
+        self.BLOCKING_POOL_SIZE = int(os.getenv('BLOCKING_POOL_SIZE', '40'))
+        self.LOOP_STALL_THRESHOLD_MS = float(os.getenv('LOOP_STALL_THRESHOLD_MS', '100'))
         
         # File paths
         self.ASSETS_DIR = os.path.join(os.path.dirname(__file__), 'assets')
         self.UPDATERS_DIR = os.path.join(os.path.dirname(__file__), 'updaters')
-        self.LOCATIONS_FILE = os.path.join(self.UPDATERS_DIR, 'geolocations.json')
-        self.OUTPUT_DATA_FILE = os.path.join(self.ASSETS_DIR, 'output_data.json')
+        self.LOCATIONS_FILE = os.getenv('LOCATIONS_FILE', os.path.join(self.UPDATERS_DIR, 'geolocations.json'))
+        # Generated data files; defaults to the assets directory
+        self.DATA_DIR = os.getenv('DATA_DIR', self.ASSETS_DIR)
+        self.OUTPUT_DATA_FILE = os.path.join(self.DATA_DIR, 'output_data.json')
+        self.ROLLUPS_DATA_FILE = os.path.join(self.DATA_DIR, 'output_rollups.json')
+        self.QUALITY_DATA_FILE = os.path.join(self.DATA_DIR, 'output_quality.json')
+        self.DATASET_VERSION_FILE = os.path.join(self.DATA_DIR, 'dataset_versions.json')
+        self.LEADER_LOCK_FILE = os.path.join(self.DATA_DIR, '.updater.lock')
+        self.LIVE_CACHE_SNAPSHOT_FILE = os.path.join(self.DATA_DIR, 'live_cache_snapshot.json')
+        # Day-partitioned hourly history (refreshes and archive backfills)
+        self.HISTORY_ENABLED = os.getenv('HISTORY_ENABLED', 'true').lower() == 'true'
+        self.HISTORY_DIR = os.getenv('HISTORY_DIR', os.path.join(self.DATA_DIR, 'history'))
+        self.HISTORY_MAINTENANCE_INTERVAL = float(os.getenv('HISTORY_MAINTENANCE_INTERVAL', '3600'))
+        self.HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', '365'))  # Days of history kept; 0 keeps all
+        self.LIVE_CACHE_SNAPSHOT_ENABLED = os.getenv('LIVE_CACHE_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+        self.LEADER_POLL_INTERVAL = float(os.getenv('LEADER_POLL_INTERVAL', '5'))
         
         # Logging configuration
         self.LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+        self.ACCESS_LOG_CAPACITY = int(os.getenv('ACCESS_LOG_CAPACITY', '1000'))
+        self.ACCESS_LOG_DIR = os.getenv('ACCESS_LOG_DIR', '')  # empty keeps the access log in memory only
+        self.ACCESS_LOG_MAX_BYTES = int(os.getenv('ACCESS_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+        self.ACCESS_LOG_BACKUPS = int(os.getenv('ACCESS_LOG_BACKUPS', '5'))
+        self.ACCESS_LOG_FLUSH_INTERVAL = float(os.getenv('ACCESS_LOG_FLUSH_INTERVAL', '2'))
         self.LOG_FORMAT = os.getenv(
             'LOG_FORMAT', 
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -77,25 +160,68 @@ class WeatherStationConfig:
         """Get the effective Open-Meteo API URL based on configuration"""
         return self.OPEN_METEO_BASE_URL
     
+    @property
+    def effective_past_days(self) -> int:
+        """Past days fetched into the data file: PAST_DAYS, capped at DATA_RETENTION_DAYS"""
+        return min(self.PAST_DAYS, self.DATA_RETENTION_DAYS)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert configuration to dictionary for logging/debugging"""
         return {
             'server': {
                 'host': self.HOST,
                 'port': self.PORT,
-                'debug': self.DEBUG
+                'debug': self.DEBUG,
+                'workers': self.WORKERS,
+                'blocking_pool_size': self.BLOCKING_POOL_SIZE,
+                'loop_stall_threshold_ms': self.LOOP_STALL_THRESHOLD_MS,
+                'metrics_enabled': self.METRICS_ENABLED,
+                'access_log_capacity': self.ACCESS_LOG_CAPACITY,
+                'access_log_dir': self.ACCESS_LOG_DIR
             },
             'api': {
                 'open_meteo_url': self.effective_open_meteo_url,
                 'use_self_hosted': self.USE_SELF_HOSTED,
                 'self_hosted_port': self.SELF_HOSTED_PORT,
-                'live_data_enabled': self.LIVE_DATA_ENABLED
+                'live_data_enabled': self.LIVE_DATA_ENABLED,
+                'data_mode': self.DATA_MODE,
+                'upstream_max_concurrency': self.UPSTREAM_MAX_CONCURRENCY,
+                'upstream_queue_size': self.UPSTREAM_QUEUE_SIZE,
+                'upstream_queue_timeout': self.UPSTREAM_QUEUE_TIMEOUT,
+                'circuit_error_threshold': self.CIRCUIT_ERROR_THRESHOLD,
+                'circuit_open_seconds': self.CIRCUIT_OPEN_SECONDS
             },
             'data': {
                 'update_interval': self.DATA_UPDATE_INTERVAL,
+                'model_run_hours': self.MODEL_RUN_HOURS,
+                'model_run_lag_minutes': self.MODEL_RUN_LAG_MINUTES,
+                'refresh_window_minutes': self.REFRESH_WINDOW_MINUTES,
+                'refresh_batches': self.REFRESH_BATCHES,
+                'refresh_idle_hours': self.REFRESH_IDLE_HOURS,
+                'model_sync_command': self.MODEL_SYNC_COMMAND,
+                'model_sync_timeout': self.MODEL_SYNC_TIMEOUT,
                 'past_days': self.PAST_DAYS,
                 'max_retries': self.MAX_RETRIES,
-                'retry_delay': self.RETRY_DELAY
+                'retry_delay': self.RETRY_DELAY,
+                'ingest_mode': self.INGEST_MODE,
+                'forecast_models': self.FORECAST_MODELS,
+                'keep_model_fields': self.KEEP_MODEL_FIELDS,
+                'ensemble_stats_enabled': self.ENSEMBLE_STATS_ENABLED,
+                'retention_days': self.DATA_RETENTION_DAYS,
+                'history_enabled': self.HISTORY_ENABLED,
+                'history_dir': self.HISTORY_DIR,
+                'history_retention_days': self.HISTORY_RETENTION_DAYS,
+                'parse_cache_entries': self.DATA_PARSE_CACHE_ENTRIES,
+                'history_maintenance_interval': self.HISTORY_MAINTENANCE_INTERVAL
+            },
+            'cache': {
+                'backend': self.CACHE_BACKEND,
+                'max_entries': self.CACHE_MAX_ENTRIES,
+                'live_ttl': self.LIVE_CACHE_TTL,
+                'live_max_stale': self.LIVE_CACHE_MAX_STALE,
+                'response_ttl': self.RESPONSE_CACHE_TTL,
+                'response_max_bytes': self.RESPONSE_CACHE_MAX_BYTES,
+                'status_ttl': self.STATUS_CACHE_TTL
             },
             'app': {
                 'name': self.APP_NAME,
@@ -119,16 +245,89 @@ class WeatherStationConfig:
         if self.PAST_DAYS < 1 or self.PAST_DAYS > 365:
             errors.append(f"Invalid past_days: {self.PAST_DAYS} (must be 1-365)")
         
+        if self.DATA_RETENTION_DAYS < 1:
+            errors.append(f"Invalid data_retention_days: {self.DATA_RETENTION_DAYS}")
+        
         if self.MAX_RETRIES < 0:
             errors.append(f"Invalid max_retries: {self.MAX_RETRIES}")
         
         if self.RETRY_DELAY < 0:
             errors.append(f"Invalid retry_delay: {self.RETRY_DELAY}")
         
+        if not self.MODEL_RUN_HOURS or not all(0 <= hour <= 23 for hour in self.MODEL_RUN_HOURS):
+            errors.append(f"Invalid model_run_hours: {self.MODEL_RUN_HOURS} (UTC hours 0-23)")
+        
+        if not (0 <= self.MODEL_RUN_LAG_MINUTES < 1440):
+            errors.append(f"Invalid model_run_lag_minutes: {self.MODEL_RUN_LAG_MINUTES} (must be 0-1439)")
+        
+        if self.REFRESH_WINDOW_MINUTES <= 0:
+            errors.append(f"Invalid refresh_window_minutes: {self.REFRESH_WINDOW_MINUTES}")
+        
+        if self.REFRESH_BATCHES < 1:
+            errors.append(f"Invalid refresh_batches: {self.REFRESH_BATCHES}")
+        
+        if self.REFRESH_IDLE_HOURS < 0:
+            errors.append(f"Invalid refresh_idle_hours: {self.REFRESH_IDLE_HOURS}")
+        
+        if not (0 < self.MODEL_SYNC_TIMEOUT <= 6 * 3600):
+            errors.append(f"Invalid model_sync_timeout: {self.MODEL_SYNC_TIMEOUT} (must be 1-21600 seconds)")
+        
+        if self.DATA_PARSE_CACHE_ENTRIES < 1:
+            errors.append(f"Invalid data_parse_cache_entries: {self.DATA_PARSE_CACHE_ENTRIES}")
+        
+        if self.HISTORY_RETENTION_DAYS < 0:
+            errors.append(f"Invalid history_retention_days: {self.HISTORY_RETENTION_DAYS} (0 keeps all history)")
+        
+        if self.HISTORY_MAINTENANCE_INTERVAL <= 0:
+            errors.append(f"Invalid history_maintenance_interval: {self.HISTORY_MAINTENANCE_INTERVAL}")
+        
+        if self.INGEST_MODE not in ('thread', 'process'):
+            errors.append(f"Invalid ingest_mode: {self.INGEST_MODE} (must be 'thread' or 'process')")
+        
+        if not self.FORECAST_MODELS:
+            errors.append("Invalid forecast_models: at least one model is required")
+        
+        if self.DATA_MODE not in ('live', 'file', 'hybrid'):
+            errors.append(f"Invalid data_mode: {self.DATA_MODE} (must be 'live', 'file' or 'hybrid')")
+        
+        if self.HYBRID_REFRESH_WORKERS < 1:
+            errors.append(f"Invalid hybrid_refresh_workers: {self.HYBRID_REFRESH_WORKERS}")
+        
+        if self.UPSTREAM_MAX_CONCURRENCY < 1:
+            errors.append(f"Invalid upstream_max_concurrency: {self.UPSTREAM_MAX_CONCURRENCY}")
+        
+        if self.UPSTREAM_QUEUE_SIZE < 0:
+            errors.append(f"Invalid upstream_queue_size: {self.UPSTREAM_QUEUE_SIZE}")
+        
+        if not (0 < self.CIRCUIT_ERROR_THRESHOLD <= 1):
+            errors.append(f"Invalid circuit_error_threshold: {self.CIRCUIT_ERROR_THRESHOLD} (must be in (0, 1])")
+        
+        if self.ACCESS_LOG_CAPACITY < 1:
+            errors.append(f"Invalid access_log_capacity: {self.ACCESS_LOG_CAPACITY}")
+        
+        if self.BLOCKING_POOL_SIZE < 1:
+            errors.append(f"Invalid blocking_pool_size: {self.BLOCKING_POOL_SIZE}")
+        
+        if self.CACHE_BACKEND not in ('memory', 'redis'):
+            errors.append(f"Invalid cache_backend: {self.CACHE_BACKEND} (must be 'memory' or 'redis')")
+        
+        if self.CACHE_MAX_ENTRIES < 1:
+            errors.append(f"Invalid cache_max_entries: {self.CACHE_MAX_ENTRIES}")
+        
+        if self.RESPONSE_CACHE_MAX_BYTES < 0:
+            errors.append(f"Invalid response_cache_max_bytes: {self.RESPONSE_CACHE_MAX_BYTES}")
+        
+        if self.WORKERS < 1:
+            errors.append(f"Invalid workers: {self.WORKERS}")
+        
+        if self.WORKERS > 1 and self.DEBUG:
+            errors.append("Multiple workers cannot be used with DEBUG (auto-reload)")
+        
         # Validate directories exist or can be created
         try:
             os.makedirs(self.ASSETS_DIR, exist_ok=True)
             os.makedirs(self.UPDATERS_DIR, exist_ok=True)
+            os.makedirs(self.DATA_DIR, exist_ok=True)
         except Exception as e:
             errors.append(f"Cannot create directories: {e}")
         
@@ -167,7 +366,7 @@ def print_config_summary(cfg: Optional[WeatherStationConfig] = None) -> None:
     print(f"Open-Meteo API: {cfg.effective_open_meteo_url}")
     print(f"Self-hosted: {cfg.USE_SELF_HOSTED}")
     print(f"Data update interval: {cfg.DATA_UPDATE_INTERVAL}s")
-    print(f"Historical data: {cfg.PAST_DAYS} days")
+    print(f"Historical data: {cfg.effective_past_days} days")
     print(f"Assets directory: {cfg.ASSETS_DIR}")
     print(f"Updaters directory: {cfg.UPDATERS_DIR}")
     print()
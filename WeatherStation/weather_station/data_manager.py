@@ -4,18 +4,33 @@ Weather Data Manager
 Handles automatic data updates, validation, and retention policies.
 """
 
-import json
 import os
 import time
 import asyncio
 import threading
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Dict, Optional, Tuple, List
 import logging
+import shlex
 import subprocess
 
 from .config import get_config
+from .cache import get_cache
+from .serialization import dump_file, dump_object_lines, dumps, load_file
+from .mapped_dataset import MappedDataset, open_dataset
+from .rollups import compute_rollups
+from .quality import check_city, compute_quality, summarize_quality
+from .history_store import get_history_store
+from .scheduler import get_refresh_scheduler
+from .versioning import diff_datasets, get_version_tracker
+from .events import get_broadcaster
+from .leader import LeaderElection, file_lock
+from .admission import get_upstream_breaker
+from .circuit_breaker import OPEN, CircuitOpenError
+from .profiling import timed
+from .normalization import WEATHER_VARIABLES, get_normalizer
+from .metrics import REFRESH_BYTES, REFRESH_FAILED, REFRESH_LOCATIONS, REFRESH_OK, UpstreamRecorder
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +45,18 @@ class WeatherDataManager:
         self._last_update_check = 0
         self._data_cache = None
         self._cache_timestamp = 0
+        self.version_tracker = get_version_tracker()
+        self._api_accessible: Optional[bool] = None
+        self.progress_callback = None
+        self.cache = get_cache()
+        self.breaker = get_upstream_breaker('refresh')
+        self.upstream_metrics = UpstreamRecorder('file')
+        self.normalizer = get_normalizer()
+        self.history = get_history_store()
+        self.scheduler = get_refresh_scheduler()
+        self.leader = LeaderElection(self.config.LEADER_LOCK_FILE)
+        self._cache_lock = threading.Lock()
+        self._sync_thread: Optional[threading.Thread] = None
         
     def start_background_updates(self):
         """Start background thread for automatic data updates"""
@@ -40,10 +67,18 @@ class WeatherDataManager:
         if self.update_thread and self.update_thread.is_alive():
             logger.warning("Background update thread already running")
             return
-            
-        logger.info(f"Starting automatic data file updates (every {self.config.DATA_UPDATE_INTERVAL} seconds)")
+        
         self.should_stop.clear()
-        self.update_thread = threading.Thread(target=self._update_loop, daemon=True)
+        
+        # Only one worker process refreshes; the others follow its dataset
+        if self.leader.try_acquire():
+            logger.info(f"Starting automatic data file updates (model runs at "
+                        f"{', '.join(f'{hour:02d}Z' for hour in self.config.MODEL_RUN_HOURS)} "
+                        f"+ {self.config.MODEL_RUN_LAG_MINUTES:.0f} min)")
+            self.update_thread = threading.Thread(target=self._update_loop, daemon=True)
+        else:
+            logger.info(f"Another worker (pid {self.leader.leader_pid()}) runs data updates - following its dataset")
+            self.update_thread = threading.Thread(target=self._follow_loop, daemon=True)
         self.update_thread.start()
     
     def stop_background_updates(self):
@@ -52,68 +87,115 @@ class WeatherDataManager:
             logger.info("Stopping background data updates")
             self.should_stop.set()
             self.update_thread.join(timeout=10)
+        self.leader.release()
+    
+    def _follow_loop(self):
+        """Follower loop: pick up datasets written by the leader and take over if it exits"""
+        logger.info("Follower loop started")
+        known_version = self.version_tracker.current_version
+        
+        while not self.should_stop.is_set():
+            self.should_stop.wait(self.config.LEADER_POLL_INTERVAL)
+            if self.should_stop.is_set():
+                break
+            
+            try:
+                # Version state is reloaded from disk whenever the leader records a refresh
+                version = self.version_tracker.current_version
+                if version != known_version:
+                    changes = self.version_tracker.changes_since(known_version) or {}
+                    known_version = version
+                    logger.info(f"Picked up dataset version {version} from leader")
+                    get_broadcaster().publish('dataset_version', {
+                        'version': version,
+                        'locations': list(changes.get('changes', {}).keys())
+                    })
+                
+                if self.leader.try_acquire():
+                    logger.info("Previous leader exited - taking over data updates")
+                    self._update_loop()
+                    return
+                    
+            except Exception as e:
+                logger.error(f"Error in follower loop: {e}")
     
     def _update_loop(self):
-        """Background update loop for periodic data file updates"""        
+        """Background update loop: refresh cities as upstream model runs become available"""
         logger.info("Background update loop started")
         
         # Wait 30 seconds after startup before first check
         self.should_stop.wait(30)
         
-        # Check immediately on startup if data needs updating
-        if not self.should_stop.is_set() and self.should_update_data():
-            logger.info("Data file needs updating on startup")
-            success = self._perform_update()
-            if success:
+        output_file = Path(self.config.OUTPUT_DATA_FILE)
+        if not self.should_stop.is_set() and not output_file.exists():
+            logger.info("Data file does not exist, performing full update on startup")
+            if self._perform_update():
                 logger.info("✅ Startup data update completed successfully")
             else:
-                logger.warning("⚠️ Startup data update failed, will retry in next cycle")
+                logger.warning("⚠️ Startup data update failed, scheduled refreshes will retry")
+        
+        # Cities in the current file count as fetched when the file was written
+        data = self.load_weather_data()
+        if data and output_file.exists():
+            self.scheduler.seed(data.keys(), datetime.fromtimestamp(output_file.stat().st_mtime, timezone.utc))
         
+        synced_run = None
         while not self.should_stop.is_set():
             try:
-                # Check every 6 hours if data needs updating
-                check_interval = 21600  # 6 hours
-                self.should_stop.wait(check_interval)
+                now = datetime.now(timezone.utc)
+                batch, delay = self.scheduler.plan(self._load_locations().keys(), now)
+                if not batch:
+                    # Re-plan at least hourly so edits to the locations file are picked up
+                    self.should_stop.wait(min(delay, 3600))
+                    continue
                 
-                if not self.should_stop.is_set() and self.should_update_data():
-                    logger.info("Performing scheduled background data update")
-                    success = self._perform_update()
-                    
-                    if success:
-                        logger.info("✅ Background data update completed successfully")
-                    else:
-                        logger.warning("⚠️ Background data update failed, will retry in next cycle")
+                run = self.scheduler.latest_run(now)
+                if self.config.MODEL_SYNC_COMMAND and run != synced_run:
+                    synced_run = run
+                    self._start_model_sync()
+                
+                logger.info(f"Refreshing {len(batch)} locations for the {run:%Y-%m-%d %H}Z model run")
+                if self._perform_update(batch):
+                    logger.info("✅ Scheduled data update completed successfully")
+                else:
+                    logger.warning("⚠️ Scheduled data update failed, will retry in the next batch")
                 
             except Exception as e:
                 logger.error(f"Error in background update loop: {e}")
                 # Wait 10 minutes on error before retrying
                 self.should_stop.wait(600)
     
-    def should_update_data(self) -> bool:
-        """Check if data file needs updating (every 7 days)"""
+    def _start_model_sync(self):
+        """Run MODEL_SYNC_COMMAND on its own thread so refresh batches are not held up"""
+        if self._sync_thread and self._sync_thread.is_alive():
+            logger.warning("⚠️ Previous model data sync still running, skipping this run's sync")
+            return
+        self._sync_thread = threading.Thread(target=self._sync_models, name='model-sync', daemon=True)
+        self._sync_thread.start()
+    
+    def _sync_models(self):
+        """Run MODEL_SYNC_COMMAND (e.g. init-weather-data.sh for a self-hosted Open-Meteo)"""
+        command = shlex.split(self.config.MODEL_SYNC_COMMAND)
+        logger.info(f"Syncing upstream model data: {self.config.MODEL_SYNC_COMMAND}")
         try:
-            output_file = Path(self.config.OUTPUT_DATA_FILE)
-            
-            if not output_file.exists():
-                logger.info("Data file does not exist, update needed")
-                return True
-            
-            # Check file age
-            file_mtime = output_file.stat().st_mtime
-            current_time = time.time()
-            file_age_seconds = current_time - file_mtime
-            
-            # Update every 7 days (604800 seconds)
-            needs_update = file_age_seconds >= self.config.DATA_UPDATE_INTERVAL
-            
-            if needs_update:
-                logger.info(f"Data file update needed - {file_age_seconds/3600:.1f}h since last update")
-            
-            return needs_update
-            
-        except Exception as e:
-            logger.error(f"Error checking if update needed: {e}")
-            return True  # Update on error to be safe
+            result = subprocess.run(command, capture_output=True, text=True,
+                                    timeout=self.config.MODEL_SYNC_TIMEOUT)
+            if result.returncode == 0:
+                logger.info("✓ Model data sync finished")
+            else:
+                logger.warning(f"⚠️ Model data sync exited with {result.returncode}: {result.stderr.strip()[-500:]}")
+        except subprocess.TimeoutExpired:
+            logger.warning(f"⚠️ Model data sync timed out after {self.config.MODEL_SYNC_TIMEOUT:.0f}s")
+        except OSError as e:
+            logger.error(f"Model data sync could not be started: {e}")
+    
+    def should_update_data(self) -> bool:
+        """Check if the data file is missing (regular refreshes follow the model run schedule)"""
+        output_file = Path(self.config.OUTPUT_DATA_FILE)
+        if not output_file.exists():
+            logger.info("Data file does not exist, update needed")
+            return True
+        return False
     
     def get_data_info(self) -> Dict:
         """Get information about data file system"""
@@ -145,20 +227,13 @@ class WeatherDataManager:
                 
                 # Count locations in file
                 try:
-                    with open(output_file, 'r') as f:
-                        data = json.load(f)
-                        location_count = len(data)
+                    data = self.load_weather_data()
+                    location_count = len(data)
                 except:
                     location_count = 0
             
-            # Check API accessibility for updates
-            is_api_accessible = True
-            try:
-                import requests
-                response = requests.get(f"{self.config.effective_open_meteo_url}/v1/forecast?latitude=0&longitude=0", timeout=5)
-                is_api_accessible = response.status_code == 200
-            except:
-                is_api_accessible = False
+            # Check API accessibility for updates (probed at most once per STATUS_CACHE_TTL)
+            is_api_accessible = self.cache.get_or_set('api_status:file', self._probe_api, self.config.STATUS_CACHE_TTL)
             
             return {
                 'exists': file_exists,
@@ -171,8 +246,7 @@ class WeatherDataManager:
                 'record_count': location_count,
                 'file_size_mb': file_size_mb,
                 'data_age': data_age,
-                'retention_days': self.config.DATA_RETENTION_DAYS,
-                'update_interval_hours': self.config.DATA_UPDATE_INTERVAL / 3600
+                'retention_days': self.config.DATA_RETENTION_DAYS
             }
             
         except Exception as e:
@@ -188,44 +262,200 @@ class WeatherDataManager:
                 'record_count': 0,
                 'file_size_mb': 0.0,
                 'data_age': 'Unknown',
-                'retention_days': self.config.DATA_RETENTION_DAYS,
-                'update_interval_hours': self.config.DATA_UPDATE_INTERVAL / 3600
+                'retention_days': self.config.DATA_RETENTION_DAYS
             }
     
     
-    def _perform_update(self):
-        """Update the data file by fetching fresh data from API"""
+    def _probe_api(self) -> bool:
+        """Check whether the Open-Meteo API answers a minimal forecast request"""
+        is_api_accessible = True
+        try:
+            import requests
+            with self.breaker.guard(timed=False):
+                response = requests.get(f"{self.config.effective_open_meteo_url}/v1/forecast?latitude=0&longitude=0",
+                                        timeout=self.breaker.timeout(5))
+                response.raise_for_status()
+            is_api_accessible = response.status_code == 200
+        except:
+            is_api_accessible = False
+        self._report_api_health(is_api_accessible)
+        return is_api_accessible
+    
+    def _report_api_health(self, accessible: bool):
+        """Announce upstream health changes to event subscribers"""
+        if accessible != self._api_accessible:
+            self._api_accessible = accessible
+            get_broadcaster().publish('upstream_health', {
+                'accessible': accessible,
+                'api_url': self.config.effective_open_meteo_url,
+                'source': 'data_manager'
+            })
+    
+    def _publish_progress(self, stage: str, completed: int = 0, failed: int = 0, total: int = 0):
+        """Announce refresh job progress to event subscribers"""
+        progress = {
+            'stage': stage,
+            'completed': completed,
+            'failed': failed,
+            'total': total
+        }
+        # Inside an ingest process, progress is relayed to the server process
+        if self.progress_callback is not None:
+            self.progress_callback(progress)
+            return
+        get_broadcaster().publish('refresh_progress', progress)
+    
+    def _perform_update(self, cities: Optional[List[str]] = None):
+        """Update the data file by fetching fresh data from API (only `cities` when given)"""
+        # Serialize refreshes across worker processes (e.g. a manual update on a follower)
+        with file_lock(self.config.LEADER_LOCK_FILE + '.refresh'):
+            return self._perform_update_locked(cities)
+    
+    def _perform_update_locked(self, cities: Optional[List[str]] = None):
+        """Fetch, write and version a fresh data file (caller holds the refresh lock)"""
+        started = time.monotonic()
         try:
             logger.info("Starting data file update...")
             
-            # Load locations
-            locations = self._load_locations()
-            if not locations:
-                logger.error("No locations to fetch data for")
-                return False
-            
-            # Fetch fresh data with rate limiting
-            logger.info(f"Fetching data for {len(locations)} locations...")
-            fresh_data = self._fetch_data_with_rate_limiting(locations)
+            if self.config.INGEST_MODE == 'process':
+                # Parsing, normalization and serialization run in a child process
+                # so they don't contend for the GIL with request handling
+                from .ingest import run_ingest_subprocess
+                staged = run_ingest_subprocess(self._publish_progress, cities)
+            else:
+                staged = self.stage_update(cities)
             
-            if not fresh_data:
-                logger.error("Failed to fetch any data")
+            if not staged:
+                if cities:
+                    self.scheduler.record_result(cities, [], datetime.now(timezone.utc))
+                self._publish_progress('failed')
+                REFRESH_FAILED.observe(time.monotonic() - started)
                 return False
             
-            # Save to output_data.json
-            output_file = Path(self.config.OUTPUT_DATA_FILE)
-            output_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(output_file, 'w') as f:
-                json.dump(fresh_data, f, indent=2)
+            self.commit_update(staged)
+            self.scheduler.record_result(staged['requested'], staged['refreshed'], datetime.now(timezone.utc))
             
-            logger.info(f"✅ Data file updated successfully with {len(fresh_data)} locations ({output_file.stat().st_size / 1024 / 1024:.1f} MB)")
+            # Map the new dataset here rather than in the first request after the swap
+            self.load_weather_data()
+            REFRESH_OK.observe(time.monotonic() - started)
+            REFRESH_LOCATIONS.labels('fetched').set(len(staged['refreshed']))
+            REFRESH_LOCATIONS.labels('failed').set(staged['total_locations'] - len(staged['refreshed']))
             return True
             
         except Exception as e:
             logger.error(f"Error updating data file: {e}")
+            if cities:
+                self.scheduler.record_result(cities, [], datetime.now(timezone.utc))
+            self._publish_progress('failed')
+            REFRESH_FAILED.observe(time.monotonic() - started)
             return False
     
+    def stage_update(self, cities: Optional[List[str]] = None) -> Optional[Dict]:
+        """Fetch fresh data and write it to temporary files next to the live ones
+
+        With `cities`, only those are fetched and merged into the current
+        dataset. Returns a small summary for `commit_update`, or None on
+        failure. This is the part of a refresh that may run in a separate
+        ingest process.
+        """
+        # Load locations
+        all_locations = self._load_locations()
+        locations = all_locations
+        if cities is not None:
+            locations = {city: all_locations[city] for city in cities if city in all_locations}
+        if not locations:
+            logger.error("No locations to fetch data for")
+            return None
+        
+        # Fetch fresh data with rate limiting; QC reports are collected while validating
+        logger.info(f"Fetching data for {len(locations)} locations...")
+        quality_reports = {}
+        fresh_data = self._fetch_data_with_rate_limiting(locations, quality_reports)
+        
+        if not fresh_data:
+            logger.error("Failed to fetch any data")
+            return None
+        
+        self._append_history(fresh_data)
+        
+        output_file = Path(self.config.OUTPUT_DATA_FILE)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = output_file.with_suffix(output_file.suffix + '.tmp')
+        previous = self.load_weather_data()
+        rollups = compute_rollups(fresh_data)
+        
+        if cities is not None and previous:
+            # A batch refresh replaces its own cities; the others keep their data, rollups and reports
+            # and are copied from the current file without being parsed, serialized or diffed again.
+            # Cities no longer in the locations file are dropped.
+            changes = diff_datasets({city: previous[city] for city in fresh_data if city in previous}, fresh_data)
+            output = [city for city in previous if city in all_locations]
+            output += [city for city in fresh_data if city not in previous]
+            for city in previous:
+                if city not in all_locations:
+                    changes[city] = {'removed': True}
+            members = (
+                (city, dumps(fresh_data[city]) if city in fresh_data else previous.raw(city))
+                for city in output
+            )
+            kept = set(output)
+            rollups = {city: value for city, value in {**(self.load_rollups() or {}), **rollups}.items()
+                       if city in kept}
+            quality_reports = {city: report for city, report in {**(self.load_quality() or {}), **quality_reports}.items()
+                               if city in kept}
+        else:
+            # Diff against the previous file so clients can sync only what changed
+            output = fresh_data
+            changes = diff_datasets(previous, output)
+            members = ((city, dumps(city_data)) for city, city_data in output.items())
+        
+        # Write to temporary files so readers never see a partial dataset; one city per line
+        # lets the next batch copy unchanged cities verbatim
+        dump_object_lines(members, tmp_file)
+        
+        # Materialize daily/weekly rollups next to the hourly data
+        rollups_file = Path(self.config.ROLLUPS_DATA_FILE)
+        rollups_tmp_file = rollups_file.with_suffix(rollups_file.suffix + '.tmp')
+        self._save_rollups(rollups, rollups_tmp_file)
+        
+        quality_file = Path(self.config.QUALITY_DATA_FILE)
+        quality_tmp_file = quality_file.with_suffix(quality_file.suffix + '.tmp')
+        self._save_quality(quality_reports, quality_tmp_file)
+        
+        return {
+            'data_file': str(tmp_file),
+            'rollups_file': str(rollups_tmp_file),
+            'quality_file': str(quality_tmp_file),
+            'changes': changes,
+            'location_count': len(output),
+            'refreshed': list(fresh_data),
+            'requested': list(locations),
+            'total_locations': len(locations)
+        }
+    
+    def commit_update(self, staged: Dict) -> None:
+        """Atomically swap staged files into place and record the new dataset version"""
+        output_file = Path(self.config.OUTPUT_DATA_FILE)
+        tmp_file = Path(staged['data_file'])
+        
+        # Version before the swap (os.replace keeps the mtime) so followers never
+        # mistake the new file for an external update; the commit lock keeps
+        # `_sync_external_update` from looking in between
+        with file_lock(self.config.LEADER_LOCK_FILE + '.commit'):
+            self.version_tracker.record(staged['changes'], source_mtime=tmp_file.stat().st_mtime_ns)
+            
+            rollups_tmp_file = Path(staged['rollups_file'])
+            if rollups_tmp_file.exists():
+                os.replace(rollups_tmp_file, self.config.ROLLUPS_DATA_FILE)
+            quality_tmp_file = Path(staged['quality_file'])
+            if quality_tmp_file.exists():
+                os.replace(quality_tmp_file, self.config.QUALITY_DATA_FILE)
+            os.replace(tmp_file, output_file)
+        REFRESH_BYTES.set(output_file.stat().st_size)
+        
+        logger.info(f"✅ Data file updated successfully with {staged['location_count']} locations ({output_file.stat().st_size / 1024 / 1024:.1f} MB)")
+        self._publish_progress('completed', completed=len(staged['refreshed']), total=staged['total_locations'])
+    
     def force_update(self) -> bool:
         """Force an immediate data file update"""
         logger.info("Forcing immediate data file update")
@@ -235,8 +465,15 @@ class WeatherDataManager:
         """Alias for force_update to maintain compatibility"""
         return self.force_update()
     
-    def load_weather_data(self) -> Optional[Dict]:
-        """Load weather data from output_data.json file"""
+    @timed('file_load')
+    def load_weather_data(self) -> Optional[MappedDataset]:
+        """Load weather data from output_data.json file
+
+        The file is memory-mapped rather than parsed, so worker processes
+        share one copy of it; cities are parsed on access. The mapping is
+        kept until the file changes and shared by all callers, so it must be
+        treated as read-only.
+        """
         try:
             output_file = Path(self.config.OUTPUT_DATA_FILE)
             
@@ -244,25 +481,165 @@ class WeatherDataManager:
                 logger.warning(f"Data file not found: {output_file}")
                 return None
             
-            with open(output_file, 'r') as f:
-                data = json.load(f)
-            
-            logger.info(f"✓ Loaded weather data from file ({len(data)} locations)")
+            file_mtime = output_file.stat().st_mtime_ns
+            with self._cache_lock:
+                if self._data_cache is not None and self._cache_timestamp == file_mtime:
+                    return self._data_cache
+                
+                data = open_dataset(output_file, self.config.DATA_PARSE_CACHE_ENTRIES)
+                if data is None:
+                    logger.error(f"Data file does not hold a JSON object: {output_file}")
+                    return None
+                self._data_cache = data
+                self._cache_timestamp = data.mtime_ns
+            
+            if data.shared:
+                logger.info(f"✓ Mapped weather data file ({len(data)} locations, shared between workers)")
+            else:
+                logger.warning(f"⚠️ Loaded weather data file ({len(data)} locations) into private memory; "
+                               f"files in the one-city-per-line layout are shared between workers instead")
             return data
             
         except Exception as e:
             logger.error(f"Error loading weather data from file: {e}")
             return None
     
-    def _fetch_data_with_rate_limiting(self, locations: Dict) -> Dict:
-        """Fetch data with proper rate limiting and ensure minimum 100 valid locations"""
+    def get_data_etag(self) -> str:
+        """Identify the current data file contents (version and modification time)"""
+        version = self.get_data_version()
+        try:
+            return f"{version}-{Path(self.config.OUTPUT_DATA_FILE).stat().st_mtime_ns}"
+        except OSError:
+            return str(version)
+    
+    def get_data_version(self) -> int:
+        """Get the dataset version of the current data file"""
+        self._sync_external_update()
+        return self.version_tracker.current_version
+    
+    def _sync_external_update(self):
+        """Assign a version to a data file written outside this manager (e.g. the CLI updater)"""
+        try:
+            output_file = Path(self.config.OUTPUT_DATA_FILE)
+            if not output_file.exists():
+                return
+            
+            if output_file.stat().st_mtime_ns == self.version_tracker.source_mtime:
+                return
+            
+            # A commit records its version just before swapping the file in; wait for it and look again
+            with file_lock(self.config.LEADER_LOCK_FILE + '.commit'):
+                file_mtime = output_file.stat().st_mtime_ns
+                if file_mtime == self.version_tracker.source_mtime:
+                    return
+                
+                # Without the previous contents every city counts as fully changed
+                data = self.load_weather_data()
+                if data is None:
+                    return
+                self.version_tracker.record(diff_datasets(None, data), source_mtime=file_mtime)
+        except Exception as e:
+            logger.error(f"Error versioning external data file update: {e}")
+    
+    def get_changes_since(self, since: int) -> Optional[Dict]:
+        """Get cities and hour ranges changed after the given dataset version"""
+        self._sync_external_update()
+        return self.version_tracker.changes_since(since)
+    
+    def _save_rollups(self, rollups: Dict, path: Optional[Path] = None) -> None:
+        """Save precomputed rollups next to the data file"""
+        try:
+            rollups_file = Path(path or self.config.ROLLUPS_DATA_FILE)
+            rollups_file.parent.mkdir(parents=True, exist_ok=True)
+            
+            dump_file(rollups, rollups_file)
+            
+            logger.info(f"✓ Saved rollups for {len(rollups)} locations")
+        except Exception as e:
+            logger.error(f"Error saving rollups: {e}")
+    
+    @timed('file_load')
+    def load_rollups(self) -> Optional[Dict]:
+        """Load precomputed daily/weekly rollups, rebuilding them if missing"""
+        try:
+            rollups_file = Path(self.config.ROLLUPS_DATA_FILE)
+            output_file = Path(self.config.OUTPUT_DATA_FILE)
+            
+            # Rollups written by an older version or by the CLI updater may be missing or stale
+            if output_file.exists() and (
+                not rollups_file.exists() or rollups_file.stat().st_mtime < output_file.stat().st_mtime
+            ):
+                data = self.load_weather_data()
+                if data is None:
+                    return None
+                rollups = compute_rollups(data)
+                self._save_rollups(rollups)
+                return rollups
+            
+            if not rollups_file.exists():
+                return None
+            
+            return load_file(rollups_file)
+            
+        except Exception as e:
+            logger.error(f"Error loading rollups: {e}")
+            return None
+    
+    def _save_quality(self, reports: Dict, path: Optional[Path] = None) -> None:
+        """Save per-city QC reports next to the data file"""
+        try:
+            quality_file = Path(path or self.config.QUALITY_DATA_FILE)
+            quality_file.parent.mkdir(parents=True, exist_ok=True)
+            
+            dump_file(reports, quality_file)
+            
+            summary = summarize_quality(reports)
+            logger.info(f"✓ Saved quality reports for {summary['cities']} locations (mean score {summary['mean_score']})")
+            if summary['flagged_cities']:
+                logger.warning(f"⚠️ {summary['flagged_cities']} locations have low quality scores: {summary['flag_counts']}")
+        except Exception as e:
+            logger.error(f"Error saving quality reports: {e}")
+    
+    @timed('file_load')
+    def load_quality(self) -> Optional[Dict]:
+        """Load per-city QC reports, rebuilding them if missing or older than the data file"""
+        try:
+            quality_file = Path(self.config.QUALITY_DATA_FILE)
+            output_file = Path(self.config.OUTPUT_DATA_FILE)
+            
+            # Data written by an older version or by the CLI updater has no reports yet
+            if output_file.exists() and (
+                not quality_file.exists() or quality_file.stat().st_mtime < output_file.stat().st_mtime
+            ):
+                data = self.load_weather_data()
+                if data is None:
+                    return None
+                reports = compute_quality(data)
+                self._save_quality(reports)
+                return reports
+            
+            if not quality_file.exists():
+                return None
+            
+            return load_file(quality_file)
+            
+        except Exception as e:
+            logger.error(f"Error loading quality reports: {e}")
+            return None
+    
+    def _fetch_data_with_rate_limiting(self, locations: Dict, quality_reports: Optional[Dict] = None) -> Dict:
+        """Fetch data with proper rate limiting and ensure minimum 100 valid locations
+
+        QC reports of accepted cities are added to `quality_reports` when given.
+        """
         live_data = {}
         total_locations = len(locations)
         completed = 0
         failed = 0
-        min_locations_target = 100
+        min_locations_target = min(100, total_locations)
         
         logger.info(f"Starting data fetch for {total_locations} locations (target: min {min_locations_target} valid)")
+        self._publish_progress('started', total=total_locations)
         
         for city, coordinates in locations.items():
             try:
@@ -271,13 +648,17 @@ class WeatherDataManager:
                     time.sleep(1.1)  # Slightly over 1 second to be safe
                 
                 data = self._fetch_live_weather_data(city, coordinates)
-                if data and self._has_valid_weather_data(data):
+                report = check_city(data) if data else None
+                if report is not None and report['valid']:
                     live_data[city] = data
+                    if quality_reports is not None:
+                        quality_reports[city] = report
                     completed += 1
                     
                     # Log progress every 20 locations
                     if completed % 20 == 0:
                         logger.info(f"Progress: {completed}/{total_locations} locations fetched ({completed/total_locations*100:.1f}%)")
+                        self._publish_progress('fetching', completed, failed, total_locations)
                     
                     # Stop early if we have enough valid data (optional optimization)
                     # if completed >= 150:  # Allow up to 150 for better coverage
@@ -291,6 +672,12 @@ class WeatherDataManager:
                     else:
                         logger.warning(f"No data received for {city}")
                     
+                    # A partial dataset would replace a complete one, so give up and keep the current file
+                    if self.breaker.state == OPEN:
+                        logger.error(f"Upstream circuit open after {completed} locations - aborting refresh, keeping current data file")
+                        self._publish_progress('aborted', completed, failed, total_locations)
+                        return {}
+                    
             except Exception as e:
                 failed += 1
                 logger.warning(f"Failed to fetch data for {city}: {e}")
@@ -307,31 +694,46 @@ class WeatherDataManager:
         
         return live_data
     
-    def _has_valid_weather_data(self, data: Dict) -> bool:
-        """Check if weather data contains valid (non-null) values"""
-        if not data or 'hourly' not in data:
-            return False
-        
-        hourly = data['hourly']
+    def _append_history(self, data: Dict) -> None:
+        """Append the past hours of a refresh to the history store (in UTC)"""
+        if not self.config.HISTORY_ENABLED:
+            return
         
-        # Check key weather parameters for any non-null values
-        key_params = ['temperature_2m', 'pressure_msl', 'relative_humidity_2m', 'wind_speed_10m']
+        now = datetime.now(timezone.utc)
+        # Forecast hours are left out; the next refresh stores them once they are past
+        until = now.strftime('%Y-%m-%dT%H:%M')
+        retention = self.config.HISTORY_RETENTION_DAYS
+        since = (now.date() - timedelta(days=retention)).isoformat() if retention > 0 else None
         
-        for param in key_params:
-            if param in hourly and isinstance(hourly[param], list):
-                # Check if at least 25% of values are non-null
-                values = hourly[param]
-                non_null_count = sum(1 for v in values if v is not None)
-                if non_null_count > len(values) * 0.25:  # At least 25% non-null
-                    return True
+        cities = {}
+        for city, city_data in data.items():
+            hourly = city_data.get('hourly') or {}
+            times = hourly.get('time') or []
+            offset = city_data.get('utc_offset_seconds') or 0
+            if offset:
+                shift = timedelta(seconds=offset)
+                try:
+                    times = [(datetime.fromisoformat(value) - shift).strftime('%Y-%m-%dT%H:%M') for value in times]
+                except (TypeError, ValueError):
+                    logger.debug(f"Unparseable times for {city}; not stored in history")
+                    continue
+            cities[city] = dict(hourly, time=times)
         
-        return False
+        try:
+            partitions = self.history.write(cities, since=since, until=until)
+            logger.info(f"✓ Appended {len(cities)} locations to history ({partitions} days)")
+        except OSError as e:
+            logger.warning(f"⚠️ Failed to append refresh to history store: {e}")
+    
+    def _has_valid_weather_data(self, data: Dict) -> bool:
+        """Check if weather data has enough non-null values in a key parameter"""
+        report = check_city(data)
+        return report is not None and report['valid']
     
     def _load_locations(self) -> Dict:
         """Load locations from geolocations.json"""
         try:
-            with open(self.config.LOCATIONS_FILE, 'r') as f:
-                locations = json.load(f)
+            locations = load_file(self.config.LOCATIONS_FILE)
             logger.info(f"Loaded {len(locations)} locations")
             return locations
         except Exception as e:
@@ -345,37 +747,35 @@ class WeatherDataManager:
             
             latitude, longitude = coordinates
             
-            # Weather parameters for official Open-Meteo API
-            weather_params = [
-                'temperature_2m', 'relative_humidity_2m', 'dew_point_2m', 
-                'apparent_temperature', 'precipitation_probability', 'precipitation',
-                'rain', 'showers', 'snowfall', 'snow_depth', 'pressure_msl',
-                'surface_pressure', 'cloud_cover', 'visibility', 'uv_index',
-                'wind_speed_10m', 'wind_direction_10m', 'wind_gusts_10m',
-                'soil_temperature_0cm', 'soil_moisture_0_to_1cm'
-            ]
-            
             # Build API URL for configured Open-Meteo API
             params = {
                 'latitude': latitude,
                 'longitude': longitude,
-                'hourly': ','.join(weather_params),
-                'past_days': self.config.PAST_DAYS,
+                'hourly': ','.join(WEATHER_VARIABLES),
+                'past_days': self.config.effective_past_days,  # DATA_RETENTION_DAYS bounds the file
                 'forecast_days': 7,  # Get 7 days of forecast
                 'timezone': 'auto'
             }
             
             # Add models parameter if using self-hosted API
             if 'localhost' in self.config.effective_open_meteo_url:
-                params['models'] = 'ecmwf_ifs025,ncep_gfs025,meteofrance_arpege_world025'
+                params['models'] = ','.join(self.config.FORECAST_MODELS)
             
             # Use configured backend API for data updates
             api_url = f"{self.config.effective_open_meteo_url}/v1/forecast"
             
-            response = requests.get(api_url, params=params, timeout=10)
-            response.raise_for_status()
+            model = params.get('models', 'best_match')
+            started = time.perf_counter()
+            try:
+                with self.breaker.guard():
+                    response = requests.get(api_url, params=params, timeout=self.breaker.timeout(10))
+                    response.raise_for_status()
+            except Exception as e:
+                self.upstream_metrics.record(city, model, time.perf_counter() - started, type(e).__name__)
+                raise
+            self.upstream_metrics.record(city, model, time.perf_counter() - started, 'ok')
             
-            data = response.json()
+            data = loads(response.content)
             
             # Normalize field names from model-specific to generic
             data = self._normalize_field_names(data)
@@ -405,60 +805,36 @@ class WeatherDataManager:
             
             return data
             
+        except CircuitOpenError as e:
+            logger.debug(f"Skipping fetch for {city}: {e}")
+            return None
         except Exception as e:
             logger.warning(f"Failed to fetch live data for {city}: {e}")
             return None
     
+    @timed('normalize')
     def _normalize_field_names(self, data):
         """Normalize model-specific field names to generic field names"""
-        if not data or 'hourly' not in data:
-            return data
-        
-        hourly = data['hourly']
-        normalized_hourly = {}
-        
-        # Field name mapping patterns - from model-specific to generic
-        field_mappings = {
-            'temperature_2m': ['temperature_2m_ecmwf_ifs025', 'temperature_2m_ncep_gfs025', 'temperature_2m_meteofrance_arpege_world025'],
-            'relative_humidity_2m': ['relative_humidity_2m_ecmwf_ifs025', 'relative_humidity_2m_ncep_gfs025', 'relative_humidity_2m_meteofrance_arpege_world025'],
-            'pressure_msl': ['pressure_msl_ecmwf_ifs025', 'pressure_msl_ncep_gfs025', 'pressure_msl_meteofrance_arpege_world025'],
-            'wind_speed_10m': ['wind_speed_10m_ecmwf_ifs025', 'wind_speed_10m_ncep_gfs025', 'wind_speed_10m_meteofrance_arpege_world025'],
-            'wind_direction_10m': ['wind_direction_10m_ecmwf_ifs025', 'wind_direction_10m_ncep_gfs025', 'wind_direction_10m_meteofrance_arpege_world025'],
-            'precipitation': ['precipitation_ecmwf_ifs025', 'precipitation_ncep_gfs025', 'precipitation_meteofrance_arpege_world025'],
-            'dew_point_2m': ['dew_point_2m_ecmwf_ifs025', 'dew_point_2m_ncep_gfs025', 'dew_point_2m_meteofrance_arpege_world025'],
-            'apparent_temperature': ['apparent_temperature_ecmwf_ifs025', 'apparent_temperature_ncep_gfs025', 'apparent_temperature_meteofrance_arpege_world025']
-        }
-        
-        # Copy time field
-        if 'time' in hourly:
-            normalized_hourly['time'] = hourly['time']
-        
-        # Normalize field names
-        for generic_name, model_specific_names in field_mappings.items():
-            for model_specific_name in model_specific_names:
-                if model_specific_name in hourly:
-                    normalized_hourly[generic_name] = hourly[model_specific_name]
-                    break  # Use first available model
-        
-        # Copy any fields that don't need normalization
-        for field_name, field_data in hourly.items():
-            if field_name not in normalized_hourly and not any(field_name in models for models in field_mappings.values()):
-                normalized_hourly[field_name] = field_data
-        
-        data['hourly'] = normalized_hourly
-        return data
+        return self.normalizer.normalize(data)
     
     def get_status(self) -> Dict:
         """Get current status of data manager"""
         data_info = self.get_data_info()
+        next_refresh, pending = self.scheduler.next_refresh()
         
         return {
             'live_fetch_enabled': False,
             'auto_update_enabled': self.config.AUTO_UPDATE_ENABLED,
-            'update_interval_hours': self.config.DATA_UPDATE_INTERVAL / 3600,
+            'next_refresh_at': next_refresh.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'pending_refresh': pending,
             'background_thread_running': self.update_thread and self.update_thread.is_alive(),
+            'worker_role': 'leader' if self.leader.is_leader else 'follower',
+            'worker_pid': os.getpid(),
+            'leader_pid': self.leader.leader_pid(),
+            'dataset_version': self.version_tracker.current_version,
+            'dataset_memory': self._data_cache.get_status() if self._data_cache is not None else None,
+            'refresh_schedule': self.scheduler.get_status(),
             'data_info': data_info,
-            'needs_update': self.should_update_data(),
             'api_accessible': data_info.get('api_accessible', False),
             'location_count': data_info.get('location_count', 0),
             'file_based': True,
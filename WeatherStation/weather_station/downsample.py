@@ -0,0 +1,168 @@
+"""
+Series Downsampling
+===================
+Largest-Triangle-Three-Buckets (LTTB) downsampling of hourly weather series
+for charts, with a small LRU cache keyed by dataset version.
+
+With numpy installed the triangle areas of large buckets are computed in
+one vectorized step; small buckets (and installs without numpy) use a pure
+Python loop, which is faster than numpy's per-call overhead there.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+from .cache import InProcessLRUCache
+from .profiling import timed
+
+MIN_POINTS = 3
+MAX_POINTS = 5000
+
+# Samples per bucket from which the numpy path beats the Python loop
+NUMPY_MIN_BUCKET = 32
+
+
+def lttb_indices(values: List, points: int) -> List[int]:
+    """Select the indices of at most `points` samples that preserve the visual shape
+
+    Null samples are skipped; the x axis is the sample index, which matches
+    evenly spaced hourly data.
+    """
+    valid = [i for i, v in enumerate(values) if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    count = len(valid)
+    if points >= count or points < MIN_POINTS:
+        return valid
+    if np is not None and count >= NUMPY_MIN_BUCKET * points:
+        return _lttb_numpy(valid, values, points)
+
+    selected = [valid[0]]
+    bucket_size = (count - 2) / (points - 2)
+    a = valid[0]
+
+    for bucket in range(points - 2):
+        # Average point of the next bucket is the third triangle vertex
+        next_start = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        next_slice = valid[next_start:next_end] or [valid[-1]]
+        avg_x = sum(next_slice) / len(next_slice)
+        avg_y = sum(values[i] for i in next_slice) / len(next_slice)
+
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        ax, ay = a, values[a]
+
+        best_index = valid[start]
+        best_area = -1.0
+        for i in valid[start:end]:
+            area = abs((ax - avg_x) * (values[i] - ay) - (ax - i) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best_index = i
+
+        selected.append(best_index)
+        a = best_index
+
+    selected.append(valid[-1])
+    return selected
+
+
+def _lttb_numpy(valid: List[int], values: List, points: int) -> List[int]:
+    """`lttb_indices` with each bucket's triangle areas and argmax computed by numpy
+
+    Averages and areas use the same operations in the same order as the
+    Python loop, so both paths select the same indices.
+    """
+    count = len(valid)
+    ys = [values[i] for i in valid]
+    x = np.array(valid, dtype=float)
+    y = np.array(ys, dtype=float)
+    bucket_size = (count - 2) / (points - 2)
+
+    selected = [valid[0]]
+    a = 0
+    for bucket in range(points - 2):
+        next_start = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        if next_start < next_end:
+            avg_x = sum(valid[next_start:next_end]) / (next_end - next_start)
+            avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+        else:
+            avg_x, avg_y = valid[-1], ys[-1]
+
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        ax, ay = valid[a], ys[a]
+        areas = np.abs((ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay))
+        a = start + int(areas.argmax())
+        selected.append(valid[a])
+
+    selected.append(valid[-1])
+    return selected
+
+
+class SeriesDownsampler:
+    """Downsamples city series and caches results per (city, variable, points, version)"""
+
+    def __init__(self, max_entries: int = 4096):
+        # Versions are local to this process, so results are never shared between nodes
+        self._cache = InProcessLRUCache(max_entries=max_entries)
+
+    def _downsample_variable(self, key: str, times: List, values: List, points: int) -> Tuple[List, List]:
+        """Downsample one variable, using the cache when possible"""
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        indices = lttb_indices(values, points)
+        result = ([times[i] for i in indices], [values[i] for i in indices])
+        self._cache.set(key, result)
+        return result
+
+    @timed('downsample')
+    def downsample_city(self, city: str, city_data: Dict, points: int, version) -> Dict:
+        """Replace a city's hourly arrays with per-variable downsampled series"""
+        hourly = city_data.get('hourly') if city_data else None
+        if not hourly or not isinstance(hourly.get('time'), list):
+            return city_data
+
+        times = hourly['time']
+        series = {}
+        for variable, values in hourly.items():
+            if variable == 'time' or not isinstance(values, list) or len(values) != len(times):
+                continue
+            key = f"{city}:{variable}:{points}:{version}"
+            series_times, series_values = self._downsample_variable(key, times, values, points)
+            series[variable] = {'time': series_times, 'values': series_values}
+
+        result = {k: v for k, v in city_data.items() if k != 'hourly'}
+        result['series'] = series
+        result['downsampled'] = {
+            'method': 'lttb',
+            'points': points,
+            'original_points': len(times)
+        }
+        return result
+
+    def clear(self):
+        """Drop all cached series"""
+        self._cache.clear()
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics for downsampled series"""
+        return self._cache.get_stats()
+
+
+# Global instance
+_downsampler: Optional[SeriesDownsampler] = None
+
+
+def get_downsampler() -> SeriesDownsampler:
+    """Get global series downsampler instance"""
+    global _downsampler
+    if _downsampler is None:
+        _downsampler = SeriesDownsampler()
+    return _downsampler
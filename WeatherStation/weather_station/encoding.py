@@ -0,0 +1,280 @@
+"""
+Response Encoding
+=================
+Content negotiation for data endpoints. JSON stays the default; clients may
+ask for MessagePack or an Apache Arrow IPC stream, encoded directly from the
+stored hourly arrays.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi.responses import JSONResponse, Response
+
+from .cache import CacheBackend
+from .mapped_dataset import MappedDataset
+from .serialization import dumps
+from .profiling import timed
+
+try:
+    import msgpack
+except ImportError:  # Optional dependency
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Optional dependency
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+JSON_MEDIA_TYPE = 'application/json'
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+# Alternative spellings clients send for MessagePack
+_MEDIA_TYPE_ALIASES = {
+    'application/x-msgpack': MSGPACK_MEDIA_TYPE,
+    'application/vnd.msgpack': MSGPACK_MEDIA_TYPE,
+}
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered through the fast serializer (orjson when installed)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def available_media_types() -> List[str]:
+    """Media types this server can produce with the installed libraries"""
+    types = [JSON_MEDIA_TYPE]
+    if msgpack is not None:
+        types.append(MSGPACK_MEDIA_TYPE)
+    if pa is not None:
+        types.append(ARROW_MEDIA_TYPE)
+    return types
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """Pick the best supported media type from an Accept header (JSON by default)"""
+    if not accept:
+        return JSON_MEDIA_TYPE
+
+    available = available_media_types()
+    best_type = JSON_MEDIA_TYPE
+    best_quality = -1.0
+
+    for part in accept.split(','):
+        pieces = [p.strip() for p in part.split(';')]
+        media_type = _MEDIA_TYPE_ALIASES.get(pieces[0].lower(), pieces[0].lower())
+        quality = 1.0
+        for param in pieces[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+
+        if media_type in ('*/*', 'application/*'):
+            media_type = JSON_MEDIA_TYPE
+        if media_type not in available or quality <= 0:
+            continue
+        # Earlier entries win ties, as listed by the client
+        if quality > best_quality:
+            best_type = media_type
+            best_quality = quality
+
+    return best_type
+
+
+# Arrays under these keys hold weather values (and their times); only they are packed as float32
+SERIES_KEYS = ('hourly', 'series')
+
+
+def encode_msgpack(payload: Any) -> bytes:
+    """MessagePack encoding with float32 hourly value arrays
+
+    Everything outside the hourly arrays (fetch timestamps, coordinates,
+    metadata) keeps double precision; a float32 Unix timestamp is only good
+    to about two minutes.
+    """
+    double = msgpack.Packer(use_bin_type=True, default=str)
+    single = msgpack.Packer(use_bin_type=True, use_single_float=True, default=str)
+    parts = []
+
+    def pack(value: Any, in_series: bool) -> None:
+        if isinstance(value, dict):
+            parts.append(double.pack_map_header(len(value)))
+            for key, item in value.items():
+                parts.append(double.pack(key))
+                pack(item, in_series or key in SERIES_KEYS)
+        elif in_series and isinstance(value, list):
+            parts.append(single.pack(value))
+        elif isinstance(value, list) and value and isinstance(value[0], dict):
+            parts.append(double.pack_array_header(len(value)))
+            for item in value:
+                pack(item, in_series)
+        else:
+            parts.append(double.pack(value))
+
+    pack(payload, False)
+    return b''.join(parts)
+
+
+def _column(values: List, length: int):
+    """Build an Arrow column from a stored array, preferring float32 for weather values"""
+    if len(values) != length:
+        values = (list(values) + [None] * length)[:length]
+    try:
+        return pa.array(values, type=pa.float32())
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(values)
+
+
+def _hourly_batches(cities: Dict[str, Dict]):
+    """Yield a unified schema and one record batch per city of hourly data"""
+    variables = []
+    seen = set()
+    for city_data in cities.values():
+        for variable, values in (city_data.get('hourly') or {}).items():
+            if variable != 'time' and isinstance(values, list) and variable not in seen:
+                seen.add(variable)
+                variables.append(variable)
+
+    fields = [pa.field('city', pa.string()), pa.field('time', pa.string())]
+    fields += [pa.field(variable, pa.float32()) for variable in variables]
+    schema = pa.schema(fields)
+
+    batches = []
+    for city, city_data in cities.items():
+        hourly = city_data.get('hourly') or {}
+        times = hourly.get('time') or []
+        length = len(times)
+        columns = [pa.array([city] * length, type=pa.string()), pa.array(times, type=pa.string())]
+        for variable in variables:
+            values = hourly.get(variable)
+            if isinstance(values, list):
+                column = _column(values, length)
+                if column.type != pa.float32():
+                    column = pa.nulls(length, pa.float32())
+            else:
+                column = pa.nulls(length, pa.float32())
+            columns.append(column)
+        batches.append(pa.RecordBatch.from_arrays(columns, schema=schema))
+
+    return schema, batches
+
+
+def _series_batches(cities: Dict[str, Dict]):
+    """Yield a long-format schema and batches for downsampled per-variable series"""
+    schema = pa.schema([
+        pa.field('city', pa.string()),
+        pa.field('variable', pa.string()),
+        pa.field('time', pa.string()),
+        pa.field('value', pa.float32()),
+    ])
+
+    batches = []
+    for city, city_data in cities.items():
+        for variable, series in (city_data.get('series') or {}).items():
+            times = series.get('time') or []
+            length = len(times)
+            batches.append(pa.RecordBatch.from_arrays([
+                pa.array([city] * length, type=pa.string()),
+                pa.array([variable] * length, type=pa.string()),
+                pa.array(times, type=pa.string()),
+                _column(series.get('values') or [], length).cast(pa.float32()),
+            ], schema=schema))
+
+    return schema, batches
+
+
+def encode_arrow(payload: Dict, cities: Dict[str, Dict]) -> bytes:
+    """Encode city arrays as an Arrow IPC stream; other payload fields go into schema metadata"""
+    if any('series' in city_data for city_data in cities.values()):
+        schema, batches = _series_batches(cities)
+    else:
+        schema, batches = _hourly_batches(cities)
+
+    city_metadata = {
+        city: {k: v for k, v in city_data.items() if k not in ('hourly', 'series')}
+        for city, city_data in cities.items()
+    }
+    envelope = {k: v for k, v in payload.items() if k != 'data'}
+    schema = schema.with_metadata({
+        'weatherstation.response': dumps(envelope),
+        'weatherstation.cities': dumps(city_metadata),
+    })
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch.replace_schema_metadata(schema.metadata))
+    return sink.getvalue().to_pybytes()
+
+
+@timed('serialize')
+def serialize_cities(cities: Dict[str, Dict], tokens: Dict[str, str], cache: CacheBackend,
+                     ttl: Optional[float] = None, variant: str = '') -> bytes:
+    """Serialize city data to a JSON object, reusing cached per-city fragments
+
+    `tokens` maps each city to a value identifying its data (dataset etag or
+    fetch time), so fragments are invalidated when the data changes and can
+    be shared between nodes. Cities of a mapped dataset are copied from the
+    mapping as they are, with nothing to serialize or cache.
+    """
+    if isinstance(cities, MappedDataset):
+        parts = []
+        for city in cities:
+            parts += (b',' if parts else b'{', dumps(city), b':', cities.raw(city))
+        return b''.join(parts) + (b'}' if parts else b'{}')
+
+    keys = {city: f"json:{city}:{tokens.get(city, '')}:{variant}" for city in cities}
+    cached = cache.get_many(keys.values())
+
+    parts = []
+    for city, city_data in cities.items():
+        fragment = cached.get(keys[city])
+        if fragment is None:
+            fragment = dumps(city_data)
+            cache.set(keys[city], fragment, ttl)
+        parts.append(dumps(city) + b':' + fragment)
+    return b'{' + b','.join(parts) + b'}'
+
+
+@timed('serialize')
+def json_response_with_data(data_json: bytes, payload: Dict, status_code: int = 200,
+                            headers: Optional[Dict[str, str]] = None) -> Response:
+    """Build a JSON response whose `data` field is already serialized"""
+    headers = dict(headers or {})
+    headers['Vary'] = 'Accept'
+    rest = dumps({k: v for k, v in payload.items() if k != 'data'})
+    body = b'{"data":' + data_json + (b',' + rest[1:] if len(rest) > 2 else b'}')
+    return Response(body, status_code=status_code, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+
+@timed('serialize')
+def encode_response(payload: Dict, media_type: str, cities: Optional[Dict[str, Dict]] = None,
+                    status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Encode a payload in the negotiated media type
+
+    `cities` maps city names to stored city data (with `hourly` or `series`
+    arrays); it is required for the Arrow encoding, which otherwise falls
+    back to JSON.
+    """
+    headers = dict(headers or {})
+    headers['Vary'] = 'Accept'
+
+    try:
+        if media_type == MSGPACK_MEDIA_TYPE and msgpack is not None:
+            body = encode_msgpack(payload)
+            return Response(body, status_code=status_code, media_type=MSGPACK_MEDIA_TYPE, headers=headers)
+
+        if media_type == ARROW_MEDIA_TYPE and pa is not None and cities:
+            body = encode_arrow(payload, cities)
+            return Response(body, status_code=status_code, media_type=ARROW_MEDIA_TYPE, headers=headers)
+    except Exception as e:
+        logger.error(f"Error encoding response as {media_type}, falling back to JSON: {e}")
+
+    return FastJSONResponse(payload, status_code=status_code, headers=headers)
@@ -0,0 +1,153 @@
+"""
+Event Broadcaster
+=================
+Fans out dataset, refresh and upstream health events to Server-Sent Events
+subscribers, so clients only fetch data when something actually changed.
+"""
+
+import asyncio
+import time
+import logging
+from typing import AsyncIterator, Dict, Optional, Set
+
+from .config import get_config
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    """Encode one Server-Sent Events frame"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {dumps(data).decode('utf-8')}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventSubscriber:
+    """A single connected client with a bounded outgoing queue"""
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.connected_at = time.time()
+        self.dropped = 0
+
+    def offer(self, frame: str) -> int:
+        """Queue a frame without blocking; slow clients get a resync notice instead
+
+        Returns the number of frames discarded (0 when the frame was queued).
+        """
+        try:
+            self.queue.put_nowait(frame)
+            return 0
+        except asyncio.QueueFull:
+            # Backpressure: discard the backlog and tell the client to refetch
+            self.dropped += 1
+            discarded = 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                discarded += 1
+            self.queue.put_nowait(format_sse('resync', {'reason': 'client too slow', 'dropped': self.dropped}))
+            return discarded
+
+
+class EventBroadcaster:
+    """Process-wide fan-out of events to SSE subscribers on the event loop"""
+
+    def __init__(self):
+        self.config = get_config()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Set[EventSubscriber] = set()
+        self._next_id = 0
+        self._published = 0
+        self._rejected = 0
+        self._resyncs = 0
+        self._frames_dropped = 0
+
+    def attach_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Bind the broadcaster to the server event loop (call on startup)"""
+        self._loop = loop
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: Dict) -> None:
+        """Publish an event from any thread; a no-op until the loop is attached"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._fan_out, event, data)
+        except RuntimeError:
+            # Loop is shutting down
+            pass
+
+    def _fan_out(self, event: str, data: Dict) -> None:
+        """Encode once and offer the frame to every subscriber (runs on the loop)"""
+        self._next_id += 1
+        self._published += 1
+        frame = format_sse(event, data, self._next_id)
+        for subscriber in list(self._subscribers):
+            discarded = subscriber.offer(frame)
+            if discarded:
+                self._resyncs += 1
+                self._frames_dropped += discarded
+
+    def subscribe(self) -> Optional[EventSubscriber]:
+        """Register a new subscriber, or None when the connection limit is reached"""
+        if len(self._subscribers) >= self.config.EVENTS_MAX_SUBSCRIBERS:
+            self._rejected += 1
+            return None
+        subscriber = EventSubscriber(self.config.EVENTS_QUEUE_SIZE)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: EventSubscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    async def stream(self, subscriber: EventSubscriber, initial: Dict[str, Dict],
+                     is_disconnected) -> AsyncIterator[str]:
+        """Yield SSE frames for one subscriber, with heartbeats while idle"""
+        heartbeat = self.config.EVENTS_HEARTBEAT_INTERVAL
+        try:
+            yield f"retry: {self.config.EVENTS_RETRY_MS}\n\n"
+            for event, data in initial.items():
+                yield format_sse(event, data)
+
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        break
+                    frame = f": heartbeat {int(time.time())}\n\n"
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    def get_status(self) -> Dict:
+        """Get broadcaster statistics"""
+        return {
+            'subscribers': len(self._subscribers),
+            'events_published': self._published,
+            'subscribers_rejected': self._rejected,
+            'resyncs': self._resyncs,
+            'frames_dropped': self._frames_dropped,
+            'max_subscribers': self.config.EVENTS_MAX_SUBSCRIBERS,
+            'heartbeat_interval': self.config.EVENTS_HEARTBEAT_INTERVAL
+        }
+
+
+# Global instance
+_broadcaster: Optional[EventBroadcaster] = None
+
+
+def get_broadcaster() -> EventBroadcaster:
+    """Get global event broadcaster instance"""
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = EventBroadcaster()
+    return _broadcaster
@@ -0,0 +1,364 @@
+"""
+Historical Data Store
+=====================
+Hourly history partitioned by UTC day on disk:
+
+    <root>/2025-01-01/compacted.json          merged data of earlier segments
+    <root>/2025-01-01/seg-<ns>-<pid>-<n>.json  data appended since
+
+Every file holds one day for any number of cities. Its first line is an
+index of `{city: [offset, length]}` and each following line is one city's
+columns (`{"time": [...], "<variable>": [...]}`), so a range read for one
+city parses only that city's line per file.
+
+Writers only ever add segment files (written to a temporary name and renamed
+into place), so backfill threads, the refresh job and several processes never
+lock or rewrite each other's data. Within a day, later files win for the same
+city, hour and variable. A maintenance pass merges each day's segments into
+its compacted file and drops days past the retention period.
+
+This module only depends on the standard library and the serialization
+layer so the standalone CLI updater can import it as well.
+"""
+
+import os
+import time
+import shutil
+import logging
+import itertools
+import threading
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .serialization import dumps, loads
+    from .leader import file_lock
+except ImportError:  # Imported by the standalone CLI updater
+    from serialization import dumps, loads
+    from leader import file_lock
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'seg-'
+COMPACTED_NAME = 'compacted.json'
+
+
+def _day_slices(times: List[str]) -> Iterator[Tuple[str, int, int]]:
+    """(day, start, end) index ranges of consecutive timestamps on the same day"""
+    start = 0
+    for index in range(1, len(times) + 1):
+        if index == len(times) or times[index][:10] != times[start][:10]:
+            yield times[start][:10], start, index
+            start = index
+
+
+def _is_day(name: str) -> bool:
+    try:
+        date.fromisoformat(name)
+        return True
+    except ValueError:
+        return False
+
+
+def _encode(payload: Dict[str, Dict]) -> bytes:
+    """Index line followed by one line per city"""
+    lines = [dumps(columns) for columns in payload.values()]
+    index = {}
+    offset = 0
+    for city, line in zip(payload, lines):
+        index[city] = [offset, len(line)]
+        offset += len(line) + 1
+    return dumps(index) + b'\n' + b''.join(line + b'\n' for line in lines)
+
+
+def _read_file(path: Path, cities: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+    """Columns of the requested cities (all by default) in one day file"""
+    with open(path, 'rb') as f:
+        index = loads(f.readline())
+        base = f.tell()
+        if cities is None:
+            return {city: loads(line) for city, line in zip(index, f.read().splitlines())}
+        result = {}
+        for city in cities:
+            entry = index.get(city)
+            if entry is not None:
+                f.seek(base + entry[0])
+                result[city] = loads(f.read(entry[1]))
+        return result
+
+
+def _merge(parts: List[Dict]) -> Dict:
+    """Combine one city's columns from several files; later parts win per hour and variable"""
+    if len(parts) == 1:
+        return parts[0]
+    if all(part.get('time') == parts[0].get('time') for part in parts):
+        # Same hours in every file (the usual case): later columns replace earlier ones
+        merged = {}
+        for part in parts:
+            merged.update(part)
+        return merged
+    rows: Dict[str, Dict] = {}
+    names: Dict[str, None] = {}
+    for part in parts:
+        times = part.get('time') or []
+        for time_ in times:
+            rows.setdefault(time_, {})
+        for name, values in part.items():
+            if name == 'time':
+                continue
+            names[name] = None
+            for time_, value in zip(times, values):
+                rows[time_][name] = value
+    times = sorted(rows)
+    merged = {'time': times}
+    for name in names:
+        merged[name] = [rows[time_].get(name) for time_ in times]
+    return merged
+
+
+def _select(columns: Dict, variables: Optional[Iterable[str]]) -> Dict:
+    if not variables:
+        return columns
+    return {name: values for name, values in columns.items() if name == 'time' or name in variables}
+
+
+class HistoryStore:
+    """Append-only, day-partitioned store of hourly weather data"""
+
+    def __init__(self, root: str, retention_days: int = 0, maintenance_interval: float = 3600):
+        self.root = Path(root)
+        self.retention_days = retention_days
+        self.maintenance_interval = maintenance_interval
+        self._sequence = itertools.count()
+        self._stopping = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self.last_maintenance: Optional[Dict] = None
+
+    def write(self, cities: Dict[str, Dict], since: Optional[str] = None, until: Optional[str] = None) -> int:
+        """Append hourly data (`{city: hourly}`, UTC times) split by day; returns partitions written
+
+        Only hours with `since <= time < until` are kept when the bounds are given.
+        """
+        by_day: Dict[str, Dict[str, Dict]] = {}
+        for city, hourly in cities.items():
+            times = hourly.get('time') or []
+            columns = {
+                name: values for name, values in hourly.items()
+                if name != 'time' and isinstance(values, list) and len(values) == len(times)
+            }
+            for day, start, end in _day_slices(times):
+                if not _is_day(day):
+                    continue
+                # Timestamps sort as strings, so bounds only trim the slice ends
+                while start < end and since is not None and times[start] < since:
+                    start += 1
+                while end > start and until is not None and times[end - 1] >= until:
+                    end -= 1
+                if start == end:
+                    continue
+                day_data = by_day.setdefault(day, {}).get(city)
+                if day_data is None:
+                    by_day[day][city] = day_data = {'time': [], **{name: [] for name in columns}}
+                day_data['time'].extend(times[start:end])
+                for name, values in columns.items():
+                    day_data[name].extend(values[start:end])
+
+        for day, payload in by_day.items():
+            self._write_file(self.root / day, self._segment_name(), payload)
+        return len(by_day)
+
+    def _segment_name(self) -> str:
+        # Names sort by write time, which decides precedence within the day
+        return f"{SEGMENT_PREFIX}{time.time_ns():020d}-{os.getpid()}-{next(self._sequence)}.json"
+
+    def _write_file(self, partition: Path, name: str, payload: Dict[str, Dict]) -> Path:
+        partition.mkdir(parents=True, exist_ok=True)
+        path = partition / name
+        tmp_path = partition / f".{name}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_encode(payload))
+        os.replace(tmp_path, path)
+        return path
+
+    def _files(self, day: str) -> List[Path]:
+        """Files of one partition in precedence order (compacted first)"""
+        partition = self.root / day
+        try:
+            names = sorted(name for name in os.listdir(partition) if name.startswith(SEGMENT_PREFIX)
+                           and name.endswith('.json'))
+        except FileNotFoundError:
+            return []
+        files = [partition / name for name in names]
+        compacted = partition / COMPACTED_NAME
+        return [compacted] + files if compacted.exists() else files
+
+    def partitions(self) -> List[str]:
+        """Days with stored data, oldest first"""
+        if not self.root.is_dir():
+            return []
+        return sorted(entry.name for entry in self.root.iterdir() if entry.is_dir() and _is_day(entry.name))
+
+    def read_day(self, day: str, cities: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """Merged columns of one day for the requested cities (all by default)"""
+        cities = None if cities is None else list(cities)
+        for attempt in range(3):
+            parts: Dict[str, List[Dict]] = {}
+            try:
+                for path in self._files(day):
+                    for city, columns in _read_file(path, cities).items():
+                        parts.setdefault(city, []).append(columns)
+            except FileNotFoundError:
+                # A compaction removed merged segments after we listed them; list again
+                continue
+            return {city: _merge(city_parts) for city, city_parts in parts.items()}
+        logger.warning(f"History partition {day} kept changing while reading")
+        return {}
+
+    def read(self, start: date, end: date, cities: Optional[Iterable[str]] = None,
+             variables: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """Hourly columns per city from `start` to `end` (inclusive UTC days)"""
+        cities = None if cities is None else list(cities)
+        variables = set(variables) if variables else None
+        first, last = start.isoformat(), end.isoformat()
+        result: Dict[str, Dict] = {}
+        for day in self.partitions():
+            if day < first or day > last:
+                continue
+            for city, columns in self.read_day(day, cities).items():
+                columns = _select(columns, variables)
+                target = result.get(city)
+                if target is None:
+                    result[city] = {name: list(values) for name, values in columns.items()}
+                    continue
+                hours = len(target['time'])
+                for name in target.keys() | columns.keys():
+                    if name not in target:
+                        target[name] = [None] * hours
+                    target[name].extend(columns.get(name) or [None] * len(columns['time']))
+        return result
+
+    def compact(self, day: str) -> bool:
+        """Merge a day's segments into its compacted file; False if there was nothing to merge"""
+        files = self._files(day)
+        segments = [path for path in files if path.name != COMPACTED_NAME]
+        if not segments:
+            return False
+
+        parts: Dict[str, List[Dict]] = {}
+        for path in files:
+            for city, columns in _read_file(path).items():
+                parts.setdefault(city, []).append(columns)
+        merged = {city: _merge(city_parts) for city, city_parts in parts.items()}
+
+        # Readers see either the old compacted file plus segments or the new one
+        # (plus segments it already contains), never a day with data missing
+        self._write_file(self.root / day, COMPACTED_NAME, merged)
+        for path in segments:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        return True
+
+    def drop_expired(self, today: Optional[date] = None) -> List[str]:
+        """Remove partitions older than the retention period (0 keeps everything)"""
+        if self.retention_days <= 0:
+            return []
+        today = today or datetime.now(timezone.utc).date()
+        cutoff = (today - timedelta(days=self.retention_days)).isoformat()
+        dropped = [day for day in self.partitions() if day < cutoff]
+        for day in dropped:
+            shutil.rmtree(self.root / day, ignore_errors=True)
+        return dropped
+
+    def maintain(self) -> Dict:
+        """Drop expired partitions and compact the rest (one process at a time)"""
+        started = time.monotonic()
+        with file_lock(self.root / '.maintenance.lock'):
+            dropped = self.drop_expired()
+            compacted = 0
+            for day in self.partitions():
+                if self._stopping.is_set():
+                    break
+                try:
+                    compacted += self.compact(day)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Failed to compact history partition {day}: {e}")
+        self.last_maintenance = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'dropped_partitions': len(dropped),
+            'compacted_partitions': compacted,
+            'duration_seconds': round(time.monotonic() - started, 3)
+        }
+        if dropped or compacted:
+            logger.info(f"✓ History maintenance: compacted {compacted}, dropped {len(dropped)} partitions")
+        return self.last_maintenance
+
+    def start(self) -> None:
+        """Start the background maintenance thread"""
+        if self._worker is not None:
+            return
+        self._stopping.clear()
+        self._worker = threading.Thread(target=self._maintenance_loop, name='history-maintenance', daemon=True)
+        self._worker.start()
+        retention = f"{self.retention_days} days" if self.retention_days > 0 else 'unlimited'
+        logger.info(f"✓ History store at {self.root} (retention: {retention})")
+
+    def stop(self) -> None:
+        """Stop the background maintenance thread"""
+        if self._worker is None:
+            return
+        self._stopping.set()
+        self._worker.join(timeout=10)
+        self._worker = None
+
+    def _maintenance_loop(self):
+        while not self._stopping.is_set():
+            try:
+                self.maintain()
+            except Exception as e:
+                logger.error(f"Error in history maintenance: {e}")
+            self._stopping.wait(self.maintenance_interval)
+
+    def get_status(self) -> Dict:
+        """Partition count, date range, pending segments and on-disk size"""
+        partitions = self.partitions()
+        segments = 0
+        size = 0
+        for day in partitions:
+            for path in self._files(day):
+                try:
+                    size += path.stat().st_size
+                except FileNotFoundError:
+                    continue
+                segments += path.name != COMPACTED_NAME
+        return {
+            'root': str(self.root),
+            'partitions': len(partitions),
+            'oldest': partitions[0] if partitions else None,
+            'newest': partitions[-1] if partitions else None,
+            'pending_segments': segments,
+            'size_mb': round(size / 1024 / 1024, 2),
+            'retention_days': self.retention_days,
+            'maintenance_running': self._worker is not None and self._worker.is_alive(),
+            'last_maintenance': self.last_maintenance
+        }
+
+
+# Global instance
+_history_store: Optional[HistoryStore] = None
+
+
+def get_history_store() -> HistoryStore:
+    """Get global history store from configuration"""
+    global _history_store
+    if _history_store is None:
+        from .config import get_config  # Not needed (or importable) in the CLI updater
+        config = get_config()
+        _history_store = HistoryStore(
+            config.HISTORY_DIR,
+            retention_days=config.HISTORY_RETENTION_DAYS,
+            maintenance_interval=config.HISTORY_MAINTENANCE_INTERVAL
+        )
+    return _history_store
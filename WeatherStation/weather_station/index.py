@@ -5,16 +5,37 @@ A modern weather data visualization platform with enhanced features
 
 import time
 import os
+import asyncio
 import logging
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
 from pathlib import Path
+from typing import Optional
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+import anyio.to_thread
 
 from .config import get_config
 from .data_manager import get_data_manager, start_data_manager, stop_data_manager
 from .live_data_manager import get_live_data_manager
+from .rollups import ROLLUP_PERIODS, select_rollups
+from .quality import FLAG_SCORE, select_quality, summarize_quality
+from .history_store import get_history_store
+from .scheduler import get_refresh_scheduler
+from .downsample import get_downsampler, MIN_POINTS, MAX_POINTS
+from .events import get_broadcaster
+from .cache import get_cache, get_response_cache
+from .admission import UPSTREAM_CALL_CLASSES, UpstreamOverloaded, get_upstream_breaker, get_upstream_budget
+from .tiered import get_tiered_reader, summarize_tiers
+from .loop_monitor import get_loop_monitor
+from .access_log import get_access_log
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, MetricsMiddleware, render_metrics
+from .profiling import ProfilerMiddleware, ServerTimingMiddleware, profiled
+from .encoding import (FastJSONResponse, JSON_MEDIA_TYPE, encode_response, json_response_with_data,
+                       negotiate_media_type, serialize_cities)
 
 # Setup logging
 config = get_config()
@@ -30,16 +51,27 @@ class WeatherStationApp:
     
     def __init__(self):
         self.config = get_config()
-        self.logs = []
+        self.access_log = get_access_log()
         self.data_manager = get_data_manager()
         self.live_data_manager = get_live_data_manager()
+        self.history_store = get_history_store()
+        self.scheduler = get_refresh_scheduler()
+        self.downsampler = get_downsampler()
+        self.broadcaster = get_broadcaster()
+        self.cache = get_cache()
+        self.response_cache = get_response_cache()
+        self.upstream_budget = get_upstream_budget()
+        self.upstream_breakers = {call_class: get_upstream_breaker(call_class) for call_class in UPSTREAM_CALL_CLASSES}
+        self.tiered_reader = get_tiered_reader() if self.config.DATA_MODE == 'hybrid' else None
+        self.loop_monitor = get_loop_monitor()
         
         # Initialize FastAPI app with configuration
         self.app = FastAPI(
             title=self.config.APP_NAME,
             description=self.config.APP_DESCRIPTION,
             version=self.config.APP_VERSION,
-            debug=self.config.DEBUG
+            debug=self.config.DEBUG,
+            default_response_class=FastJSONResponse
         )
         
         # Setup lifecycle events
@@ -50,6 +82,11 @@ class WeatherStationApp:
         
         # Setup routes
         self._setup_routes()
+        self.loop_monitor.register_routes(self.app.routes)
+        
+        # Setup scrape-time metrics
+        if self.config.METRICS_ENABLED:
+            self._setup_metrics()
         
         logger.info(f"{self.config.APP_NAME} v{self.config.APP_VERSION} initialized successfully")
         if self.config.DEBUG:
@@ -66,10 +103,29 @@ class WeatherStationApp:
             """Application startup"""
             logger.info("Starting Weather Station application")
             
-            if self.config.LIVE_DATA_ENABLED:
+            # Let background threads push events to SSE subscribers
+            self.broadcaster.attach_loop(asyncio.get_running_loop())
+            
+            # Blocking handlers run in this pool; bound it so a slow upstream can't spawn unlimited threads
+            anyio.to_thread.current_default_thread_limiter().total_tokens = self.config.BLOCKING_POOL_SIZE
+            self.loop_monitor.start(asyncio.get_running_loop())
+            self.access_log.start()
+            if self.config.HISTORY_ENABLED:
+                self.history_store.start()
+            
+            # Warm the live cache from the last shutdown before serving traffic
+            if self.config.DATA_MODE != 'file' and self.config.LIVE_CACHE_SNAPSHOT_ENABLED:
+                await run_in_threadpool(self.live_data_manager.restore_cache_snapshot)
+            
+            if self.config.DATA_MODE == 'hybrid':
+                logger.info("Hybrid data mode enabled - serving memory → snapshot → upstream")
+                # The snapshot tier is kept current by the regular file updates
+                start_data_manager()
+                logger.info("Data manager started")
+            elif self.config.LIVE_DATA_ENABLED:
                 logger.info("Live data mode enabled - using self-hosted Open-Meteo API")
                 # Check API accessibility
-                api_status = self.live_data_manager.get_api_status()
+                api_status = await run_in_threadpool(self.live_data_manager.get_api_status)
                 if api_status['accessible']:
                     logger.info(f"✓ Self-hosted API accessible ({api_status['response_time_ms']}ms)")
                 else:
@@ -89,11 +145,29 @@ class WeatherStationApp:
         async def shutdown_event():
             """Application shutdown"""
             logger.info("Shutting down Weather Station application")
+            self.loop_monitor.stop()
+            await run_in_threadpool(self.access_log.stop)
+            await run_in_threadpool(self.history_store.stop)
+            if self.tiered_reader:
+                self.tiered_reader.shutdown()
+            if self.config.DATA_MODE != 'file':
+                # Record changes still batched for delta sync before they are lost
+                await run_in_threadpool(self.live_data_manager._flush_changes)
+                if self.config.LIVE_CACHE_SNAPSHOT_ENABLED:
+                    await run_in_threadpool(self.live_data_manager.save_cache_snapshot)
             stop_data_manager()
             logger.info("Data manager stopped")
     
     def _setup_middleware(self):
         """Setup FastAPI middleware"""
+        # Request latency by route
+        if self.config.METRICS_ENABLED:
+            self.app.add_middleware(MetricsMiddleware)
+        
+        # ?profile=1 on data endpoints (API key required), inside Server-Timing so both apply
+        self.app.add_middleware(ProfilerMiddleware, authorize=lambda scope: self._check_api_key(Request(scope)))
+        self.app.add_middleware(ServerTimingMiddleware)
+        
         # CORS middleware
         if self.config.CORS_ORIGINS:
             self.app.add_middleware(
@@ -109,6 +183,84 @@ class WeatherStationApp:
         if assets_path.exists():
             self.app.mount("/assets", StaticFiles(directory=str(assets_path)), name="assets")
     
+    def _setup_metrics(self):
+        """Expose cache, dataset, upstream and event loop state on /metrics"""
+        caches = {'data': self.cache, 'response': self.response_cache, 'downsample': self.downsampler}
+        
+        def cache_stat(stat):
+            return lambda: [((name, stats['backend']), stats.get(stat))
+                            for name, stats in ((name, cache.get_stats()) for name, cache in caches.items())]
+        
+        for stat in ('hits', 'misses', 'evictions', 'expirations'):
+            REGISTRY.add_callback(f'weatherstation_cache_{stat}_total', 'counter', f'Cache {stat}',
+                                  ('cache', 'backend'), cache_stat(stat))
+        REGISTRY.add_callback('weatherstation_cache_entries', 'gauge', 'Entries held by in-process caches',
+                              ('cache', 'backend'), cache_stat('entries'))
+        
+        def dataset_version():
+            if self.config.LIVE_DATA_ENABLED:
+                return [(('live',), self.live_data_manager.get_data_version())]
+            return [(('file',), self.data_manager.get_data_version())]
+        
+        def dataset_age():
+            try:
+                return [((), time.time() - Path(self.config.OUTPUT_DATA_FILE).stat().st_mtime)]
+            except OSError:
+                return []
+        
+        REGISTRY.add_callback('weatherstation_dataset_version', 'gauge', 'Current dataset version',
+                              ('source',), dataset_version)
+        REGISTRY.add_callback('weatherstation_dataset_age_seconds', 'gauge', 'Age of the data file',
+                              (), dataset_age)
+        def dataset_bytes():
+            data = self.data_manager._data_cache
+            if data is None:
+                return []
+            status = data.get_status()
+            return [(('shared',), status['mapped_bytes']), (('private',), status['private_bytes'])]
+        
+        REGISTRY.add_callback('weatherstation_dataset_bytes', 'gauge',
+                              'Data file memory: mapped pages shared by all workers, and this worker\'s own',
+                              ('memory',), dataset_bytes)
+        
+        circuit_states = {'closed': 0, 'half_open': 1, 'open': 2}
+        
+        def circuit_state():
+            return [((breaker.name,), circuit_states[breaker.state]) for breaker in self.upstream_breakers.values()]
+        
+        def upstream_slots():
+            status = self.upstream_budget.get_status()
+            return [(('in_use',), status['in_use']), (('waiting',), status['waiting'])]
+        
+        REGISTRY.add_callback('weatherstation_upstream_circuit_state', 'gauge',
+                              'Upstream circuit state (0 closed, 1 half-open, 2 open)', ('name',), circuit_state)
+        REGISTRY.add_callback('weatherstation_upstream_slots', 'gauge', 'Upstream concurrency budget usage',
+                              ('state',), upstream_slots)
+        
+        def loop_stalls():
+            return [((route,), count) for route, count in self.loop_monitor.get_status()['stalls_by_route'].items()]
+        
+        REGISTRY.add_callback('weatherstation_event_loop_stalls_total', 'counter',
+                              'Event loop stalls over the threshold by blocking route', ('route',), loop_stalls)
+        REGISTRY.add_callback('weatherstation_event_loop_stall_seconds_total', 'counter',
+                              'Total time the event loop was stalled', (),
+                              lambda: [((), self.loop_monitor.stall_seconds_total)])
+        REGISTRY.add_callback('weatherstation_event_loop_max_lag_seconds', 'gauge',
+                              'Largest event loop lag observed', (),
+                              lambda: [((), self.loop_monitor.max_lag)])
+    
+        
+        def event_counters():
+            status = self.broadcaster.get_status()
+            return [(('published',), status['events_published']), (('rejected',), status['subscribers_rejected']),
+                    (('resync',), status['resyncs']), (('frame_dropped',), status['frames_dropped'])]
+        
+        REGISTRY.add_callback('weatherstation_events_subscribers', 'gauge', 'Connected event stream clients', (),
+                              lambda: [((), self.broadcaster.subscriber_count)])
+        REGISTRY.add_callback('weatherstation_events_total', 'counter',
+                              'Event stream events published, subscribers rejected, resyncs and dropped frames',
+                              ('kind',), event_counters)
+    
     def generate_log(self, request: Request, page: str) -> dict:
         """Generate access log entry with enhanced information"""
         log_entry = {
@@ -129,6 +281,11 @@ class WeatherStationApp:
         
         return log_entry
     
+    def _check_api_key(self, request: Request) -> bool:
+        """Check the X-API-Key or Bearer token of an administrative request"""
+        api_key = request.headers.get('X-API-Key') or request.headers.get('Authorization', '').replace('Bearer ', '')
+        return bool(api_key) and api_key == self.config.API_KEY
+    
     def _get_file_path(self, filename: str) -> Path:
         """Get safe file path within assets directory"""
         assets_path = Path(self.config.ASSETS_DIR)
@@ -142,14 +299,56 @@ class WeatherStationApp:
         
         return file_path
     
+    def _validate_points(self, points: Optional[int]) -> Optional[FastJSONResponse]:
+        """Validate the optional `points` downsampling parameter"""
+        if points is None or MIN_POINTS <= points <= MAX_POINTS:
+            return None
+        
+        return FastJSONResponse({
+            "error": "Invalid points parameter",
+            "message": f"points must be between {MIN_POINTS} and {MAX_POINTS}",
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        }, status_code=400)
+    
+    def _record_demand(self, cities) -> None:
+        """Count requests for known cities; demand moves them up the scheduled refresh order"""
+        locations = self.live_data_manager.load_locations()
+        self.scheduler.record_requests(city for city in cities if city in locations)
+    
+    def _overloaded_response(self, error: UpstreamOverloaded) -> FastJSONResponse:
+        """Shed a request the upstream budget cannot serve in time"""
+        logger.warning(f"Shedding request: {error}")
+        return FastJSONResponse({
+            "error": "Too many requests" if error.status_code == 429 else "Upstream overloaded",
+            "message": f"{error} - retry in {error.retry_after}s",
+            "retry_after": error.retry_after,
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        }, status_code=error.status_code, headers={"Retry-After": str(error.retry_after)})
+    
+    def _encode_weather_response(self, payload: dict, tokens: dict, points: Optional[int],
+                                 media_type: str, headers: Optional[dict] = None):
+        """Encode a multi-city response, reusing cached JSON fragments for unchanged cities"""
+        if media_type != JSON_MEDIA_TYPE:
+            # Other encoders need plain dicts; the file dataset is a lazily parsed mapping
+            payload = dict(payload, data=dict(payload['data']))
+            return encode_response(payload, media_type, cities=payload['data'], headers=headers)
+        
+        data_json = serialize_cities(payload['data'], tokens, self.response_cache,
+                                     ttl=self.config.RESPONSE_CACHE_TTL, variant=f"p{points or 0}")
+        return json_response_with_data(data_json, payload, headers=headers)
+    
     def _setup_routes(self):
-        """Setup all application routes"""
+        """Setup all application routes
+        
+        Handlers that read data files or call the upstream are plain `def`, so
+        FastAPI runs them in the bounded threadpool instead of on the event loop.
+        """
         
         @self.app.get("/health")
-        async def health_check():
+        def health_check():
             """Health check endpoint"""
             data_status = self.data_manager.get_status()
-            return JSONResponse({
+            return FastJSONResponse({
                 "status": "healthy",
                 "version": self.config.APP_VERSION,
                 "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
@@ -157,7 +356,8 @@ class WeatherStationApp:
             })
         
         @self.app.get("/api/data/status")
-        async def data_status():
+        @profiled
+        def data_status():
             """Get data manager status"""
             status = self.data_manager.get_status()
             # Add additional debug information
@@ -167,17 +367,15 @@ class WeatherStationApp:
                 'cache_timestamp': self.data_manager._cache_timestamp,
                 'last_update_check': self.data_manager._last_update_check
             }
-            return JSONResponse(status)
+            return FastJSONResponse(status)
         
         @self.app.post("/api/data/force-update")
-        async def force_data_update(request: Request):
+        def force_data_update(request: Request):
             """Manually trigger a data update (requires API key)"""
             try:
                 # Check API key
-                api_key = request.headers.get('X-API-Key') or request.headers.get('Authorization', '').replace('Bearer ', '')
-                
-                if not api_key or api_key != self.config.API_KEY:
-                    return JSONResponse({
+                if not self._check_api_key(request):
+                    return FastJSONResponse({
                         "success": False,
                         "error": "Unauthorized",
                         "message": "Valid API key required for manual updates",
@@ -188,13 +386,13 @@ class WeatherStationApp:
                 success = self.data_manager.force_update()
                 
                 if success:
-                    return JSONResponse({
+                    return FastJSONResponse({
                         "success": True,
                         "message": "Data update completed successfully",
                         "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
                     })
                 else:
-                    return JSONResponse({
+                    return FastJSONResponse({
                         "success": False,
                         "message": "Data update failed - check logs for details",
                         "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
@@ -202,7 +400,7 @@ class WeatherStationApp:
                     
             except Exception as e:
                 logger.error(f"Error in manual update: {e}")
-                return JSONResponse({
+                return FastJSONResponse({
                     "success": False,
                     "message": f"Update failed: {str(e)}",
                     "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
@@ -210,19 +408,64 @@ class WeatherStationApp:
         
         
         @self.app.get("/api/data/weather")
-        async def get_weather_data(limit: int = 300):
+        @profiled
+        def get_weather_data(request: Request, limit: int = 300, points: int = None):
             """Get live weather data for multiple locations"""
             start_time = time.time()
             
             # Validate and sanitize limit
             limit = max(1, min(limit, 300))  # Between 1 and 300
             
+            points_error = self._validate_points(points)
+            if points_error:
+                return points_error
+            
             try:
-                if self.config.LIVE_DATA_ENABLED:
+                if self.config.DATA_MODE == 'hybrid':
+                    locations = self.live_data_manager.load_locations()
+                    data, tiers = self.tiered_reader.get_cities(locations, limit)
+                    if not data:
+                        return FastJSONResponse({
+                            "error": "Weather data not available",
+                            "message": "No cached, snapshot or live data available",
+                            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                            "request_id": f"req_{int(start_time)}"
+                        }, status_code=503)
+                    
+                    self._record_demand(data)
+                    
+                    # Snapshot cities share the file etag, live cities their fetch time
+                    etag = self.data_manager.get_data_etag()
+                    tokens = {
+                        city: etag if tiers[city] == 'snapshot' else city_data.get('fetch_time', '')
+                        for city, city_data in data.items()
+                    }
+                    version = self.data_manager.get_data_version()
+                    if points:
+                        data = {
+                            city: self.downsampler.downsample_city(city, city_data, points, tokens[city])
+                            for city, city_data in data.items()
+                        }
+                    
+                    return self._encode_weather_response({
+                        "data": data,
+                        "locations": list(data.keys()),
+                        "total_available": len(locations),
+                        "fetched": len(data),
+                        "live_data": True,
+                        "source": "hybrid",
+                        "tiers": tiers,
+                        "fetch_time_seconds": round(time.time() - start_time, 2),
+                        "version": version,
+                        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                        "request_id": f"req_{int(start_time)}"
+                    }, tokens, points, negotiate_media_type(request.headers.get('accept')),
+                        headers={"X-Data-Tier": summarize_tiers(tiers)})
+                elif self.config.LIVE_DATA_ENABLED:
                     # Get live data for limited number of cities
                     locations = self.live_data_manager.load_locations()
                     if not locations:
-                        return JSONResponse({
+                        return FastJSONResponse({
                             "error": "No locations available",
                             "message": "Location data could not be loaded. Check geolocations.json file.",
                             "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
@@ -241,7 +484,7 @@ class WeatherStationApp:
                         if not api_status.get('accessible', False):
                             error_msg += f" - API not accessible: {api_status.get('error', 'Unknown error')}"
                         
-                        return JSONResponse({
+                        return FastJSONResponse({
                             "error": "Weather data not available",
                             "message": error_msg,
                             "api_status": api_status,
@@ -249,10 +492,18 @@ class WeatherStationApp:
                             "request_id": f"req_{int(start_time)}"
                         }, status_code=503)
                     
+                    self._record_demand(data)
                     fetch_time = time.time() - start_time
                     logger.info(f"Successfully fetched {len(data)}/{len(limited_locations)} cities in {fetch_time:.2f}s")
                     
-                    return JSONResponse({
+                    if points:
+                        data = {
+                            city: self.downsampler.downsample_city(city, city_data, points, city_data.get('fetch_time'))
+                            for city, city_data in data.items()
+                        }
+                    
+                    tokens = {city: city_data.get('fetch_time', '') for city, city_data in data.items()}
+                    return self._encode_weather_response({
                         "data": data,
                         "locations": list(data.keys()),
                         "total_available": len(locations),
@@ -260,15 +511,16 @@ class WeatherStationApp:
                         "fetched": len(data),
                         "live_data": True,
                         "fetch_time_seconds": round(fetch_time, 2),
+                        "version": self.live_data_manager.get_data_version(),
                         "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
                         "request_id": f"req_{int(start_time)}"
-                    })
+                    }, tokens, points, negotiate_media_type(request.headers.get('accept')))
                 else:
                     # Fallback to file-based data
                     data = self.data_manager.load_weather_data()
                     if data is None:
                         file_status = self.data_manager.get_data_info()
-                        return JSONResponse({
+                        return FastJSONResponse({
                             "error": "Weather data not available",
                             "message": "Data file may be outdated, missing, or failed to load",
                             "file_status": file_status,
@@ -279,22 +531,34 @@ class WeatherStationApp:
                     
                     # Limit file data as well
                     if limit < len(data):
-                        data = dict(list(data.items())[:limit])
+                        data = data.select(islice(data, limit))
+                    
+                    self._record_demand(data)
+                    version = self.data_manager.get_data_version()
+                    if points:
+                        data = {
+                            city: self.downsampler.downsample_city(city, city_data, points, version)
+                            for city, city_data in data.items()
+                        }
                     
-                    return JSONResponse({
+                    etag = self.data_manager.get_data_etag()
+                    return self._encode_weather_response({
                         "data": data,
                         "locations": list(data.keys()),
                         "total": len(data),
                         "live_data": False,
                         "source": "file_cache",
+                        "version": version,
                         "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
                         "request_id": f"req_{int(start_time)}"
-                    })
+                    }, dict.fromkeys(data, etag), points, negotiate_media_type(request.headers.get('accept')))
                     
+            except UpstreamOverloaded as e:
+                return self._overloaded_response(e)
             except Exception as e:
                 fetch_time = time.time() - start_time
                 logger.error(f"Error getting weather data after {fetch_time:.2f}s: {e}")
-                return JSONResponse({
+                return FastJSONResponse({
                     "error": "Internal server error",
                     "message": f"Failed to process weather data request: {str(e)[:100]}",
                     "fetch_time_seconds": round(fetch_time, 2),
@@ -302,80 +566,334 @@ class WeatherStationApp:
                     "request_id": f"req_{int(start_time)}"
                 }, status_code=500)
         
+        @self.app.get("/api/data/rollups")
+        @profiled
+        def get_weather_rollups(city: str = None, period: str = None, variable: str = None):
+            """Get precomputed daily/weekly rollups (min, max, mean, sum, valid counts)"""
+            try:
+                if period and period not in ROLLUP_PERIODS:
+                    return FastJSONResponse({
+                        "error": "Invalid period",
+                        "message": f"Period must be one of: {', '.join(ROLLUP_PERIODS)}",
+                        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                    }, status_code=400)
+
+                if self.config.DATA_MODE == 'hybrid':
+                    # Cities refreshed live override their snapshot rollups
+                    rollups = dict(self.data_manager.load_rollups() or {})
+                    rollups.update(self.live_data_manager.get_rollups())
+                elif self.config.LIVE_DATA_ENABLED:
+                    rollups = self.live_data_manager.get_rollups()
+                else:
+                    rollups = self.data_manager.load_rollups()
+
+                if not rollups:
+                    return FastJSONResponse({
+                        "error": "Rollups not available",
+                        "message": "No weather data has been ingested yet",
+                        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                    }, status_code=404)
+
+                if city and city not in rollups:
+                    return FastJSONResponse({
+                        "error": "City not found",
+                        "message": f"No rollups available for {city}",
+                        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                    }, status_code=404)
+
+                if city:
+                    self._record_demand([city])
+                selected = select_rollups(rollups, city=city, period=period, variable=variable)
+                return FastJSONResponse({
+                    "rollups": selected,
+                    "locations": list(selected.keys()),
+                    "periods": [period] if period else list(ROLLUP_PERIODS),
+                    "live_data": self.config.LIVE_DATA_ENABLED,
+                    "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                })
+
+            except Exception as e:
+                logger.error(f"Error getting rollups: {e}")
+                return FastJSONResponse({
+                    "error": "Internal server error",
+                    "message": str(e),
+                    "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                }, status_code=500)
+
+        @self.app.get("/api/data/quality")
+        @profiled
+        def get_data_quality(city: str = None, variable: str = None, max_score: float = None):
+            """Get ingest-time QC reports (null ratio, range violations, spikes, flat-lines, score)"""
+            try:
+                if self.config.DATA_MODE == 'hybrid':
+                    # Cities refreshed live override their snapshot reports
+                    reports = dict(self.data_manager.load_quality() or {})
+                    reports.update(self.live_data_manager.get_quality())
+                elif self.config.LIVE_DATA_ENABLED:
+                    reports = self.live_data_manager.get_quality()
+                else:
+                    reports = self.data_manager.load_quality()
+
+                if not reports:
+                    return FastJSONResponse({
+                        "error": "Quality reports not available",
+                        "message": "No weather data has been ingested yet",
+                        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                    }, status_code=404)
+
+                if city and city not in reports:
+                    return FastJSONResponse({
+                        "error": "City not found",
+                        "message": f"No quality report available for {city}",
+                        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                    }, status_code=404)
+
+                selected = select_quality(reports, city=city, variable=variable, max_score=max_score)
+                return FastJSONResponse({
+                    "summary": summarize_quality(reports),
+                    "flag_score": FLAG_SCORE,
+                    "quality": selected,
+                    "locations": list(selected.keys()),
+                    "live_data": self.config.LIVE_DATA_ENABLED,
+                    "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                })
+
+            except Exception as e:
+                logger.error(f"Error getting quality reports: {e}")
+                return FastJSONResponse({
+                    "error": "Internal server error",
+                    "message": str(e),
+                    "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                }, status_code=500)
+
+        @self.app.get("/api/data/history")
+        @profiled
+        def get_data_history(city: str = None, start: str = None, end: str = None, variable: str = None):
+            """Get stored hourly history for one city between two UTC days (default: the last 7 days)"""
+            try:
+                if not city:
+                    return FastJSONResponse({
+                        "error": "Missing city",
+                        "message": "The city parameter is required",
+                        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                    }, status_code=400)
+
+                try:
+                    end_day = date.fromisoformat(end) if end else datetime.now(timezone.utc).date()
+                    start_day = date.fromisoformat(start) if start else end_day - timedelta(days=6)
+                except ValueError:
+                    return FastJSONResponse({
+                        "error": "Invalid date",
+                        "message": "start and end must be dates in YYYY-MM-DD format",
+                        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                    }, status_code=400)
+                if start_day > end_day:
+                    return FastJSONResponse({
+                        "error": "Invalid range",
+                        "message": "start must not be after end",
+                        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                    }, status_code=400)
+
+                variables = [name for name in variable.split(',') if name] if variable else None
+                history = self.history_store.read(start_day, end_day, cities=[city], variables=variables)
+                if city not in history:
+                    return FastJSONResponse({
+                        "error": "No history",
+                        "message": f"No stored history for {city} between {start_day} and {end_day}",
+                        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                    }, status_code=404)
+
+                self._record_demand([city])
+                return FastJSONResponse({
+                    "city": city,
+                    "start": start_day.isoformat(),
+                    "end": end_day.isoformat(),
+                    "timezone": "UTC",
+                    "hours": len(history[city]['time']),
+                    "hourly": history[city],
+                    "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                })
+
+            except Exception as e:
+                logger.error(f"Error reading history for {city}: {e}")
+                return FastJSONResponse({
+                    "error": "Internal server error",
+                    "message": str(e),
+                    "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                }, status_code=500)
+
+        @self.app.get("/api/data/changes")
+        @profiled
+        def get_data_changes(since: int):
+            """Get cities and hour ranges changed since a dataset version (204 if none)"""
+            try:
+                if self.config.LIVE_DATA_ENABLED:
+                    changes = self.live_data_manager.get_changes_since(since)
+                else:
+                    changes = self.data_manager.get_changes_since(since)
+                
+                if changes is None:
+                    return Response(status_code=204)
+                
+                return FastJSONResponse({
+                    "since": since,
+                    "version": changes['version'],
+                    "full_refresh": changes['full_refresh'],
+                    "changes": changes['changes'],
+                    "locations": list(changes['changes'].keys()),
+                    "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                })
+                
+            except Exception as e:
+                logger.error(f"Error getting data changes since {since}: {e}")
+                return FastJSONResponse({
+                    "error": "Internal server error",
+                    "message": str(e),
+                    "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                }, status_code=500)
+        
+        @self.app.get("/api/events")
+        async def event_stream(request: Request):
+            """Server-Sent Events stream of dataset versions, refresh progress and upstream health"""
+            subscriber = self.broadcaster.subscribe()
+            if subscriber is None:
+                return FastJSONResponse({
+                    "error": "Too many subscribers",
+                    "message": "Event stream connection limit reached, fall back to polling",
+                    "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                }, status_code=503, headers={"Retry-After": "30"})
+            
+            # The lookup may sync an external refresh or flush pending changes; keep it off the loop
+            manager = self.live_data_manager if self.config.LIVE_DATA_ENABLED else self.data_manager
+            try:
+                version = await run_in_threadpool(manager.get_data_version)
+            except Exception:
+                self.broadcaster.unsubscribe(subscriber)
+                raise
+            
+            initial = {'dataset_version': {'version': version, 'locations': []}}
+            return StreamingResponse(
+                self.broadcaster.stream(subscriber, initial, request.is_disconnected),
+                media_type="text/event-stream",
+                headers={
+                    "Cache-Control": "no-cache",
+                    "X-Accel-Buffering": "no"
+                }
+            )
+        
         @self.app.get("/api/data/live/{city}")
-        async def get_live_city_weather(city: str):
+        @profiled
+        def get_live_city_weather(request: Request, city: str, points: int = None):
             """Get live weather data for a specific city"""
+            points_error = self._validate_points(points)
+            if points_error:
+                return points_error
+            
+            # Counted even when live data is off: the scheduled file refresh orders cities by demand
+            self._record_demand([city])
             try:
-                if not self.config.LIVE_DATA_ENABLED:
-                    return JSONResponse({
+                if self.config.DATA_MODE == 'file':
+                    return FastJSONResponse({
                         "error": "Live data not enabled",
                         "message": "Live data fetching is disabled in configuration",
                         "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
                     }, status_code=503)
                 
-                data = self.live_data_manager.get_weather_data(city)
+                headers = {}
+                if self.tiered_reader:
+                    data, tier = self.tiered_reader.get_city(city)
+                    headers['X-Data-Tier'] = tier or 'none'
+                else:
+                    data = self.live_data_manager.get_weather_data(city)
                 if data is None:
-                    return JSONResponse({
+                    return FastJSONResponse({
                         "error": "City not found or data unavailable",
                         "message": f"Could not fetch weather data for {city}",
                         "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
                     }, status_code=404)
                 
-                return JSONResponse({
+                if points:
+                    data = self.downsampler.downsample_city(city, data, points, data.get('fetch_time'))
+                
+                payload = {
                     "city": city,
                     "data": data,
                     "live_data": True,
                     "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
-                })
+                }
+                if headers:
+                    payload["tier"] = headers['X-Data-Tier']
+                return encode_response(payload, negotiate_media_type(request.headers.get('accept')),
+                                       cities={city: data}, headers=headers)
                 
+            except UpstreamOverloaded as e:
+                return self._overloaded_response(e)
             except Exception as e:
                 logger.error(f"Error getting live weather data for {city}: {e}")
-                return JSONResponse({
+                return FastJSONResponse({
                     "error": "Internal server error",
                     "message": str(e),
                     "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
                 }, status_code=500)
         
         @self.app.get("/api/data/current/{city}")
-        async def get_current_conditions(city: str):
+        @profiled
+        def get_current_conditions(request: Request, city: str):
             """Get current weather conditions for a specific city"""
+            # Counted even when live data is off: the scheduled file refresh orders cities by demand
+            self._record_demand([city])
             try:
-                if not self.config.LIVE_DATA_ENABLED:
-                    return JSONResponse({
+                if self.config.DATA_MODE == 'file':
+                    return FastJSONResponse({
                         "error": "Live data not enabled",
                         "message": "Live data fetching is disabled in configuration",
                         "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
                     }, status_code=503)
                 
-                data = self.live_data_manager.get_current_conditions(city)
+                headers = {}
+                if self.tiered_reader:
+                    city_data, tier = self.tiered_reader.get_city(city)
+                    headers['X-Data-Tier'] = tier or 'none'
+                    data = self.live_data_manager.get_current_conditions(city, city_data) if city_data else None
+                else:
+                    data = self.live_data_manager.get_current_conditions(city)
                 if data is None:
-                    return JSONResponse({
+                    return FastJSONResponse({
                         "error": "City not found or data unavailable",
                         "message": f"Could not fetch current conditions for {city}",
                         "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
                     }, status_code=404)
                 
-                return JSONResponse({
+                # Current conditions encode as a single-row table for Arrow clients
+                current_row = {'hourly': {param: [value] for param, value in data.get('current', {}).items()}}
+                payload = {
                     "city": city,
                     "current_conditions": data,
                     "live_data": True,
                     "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
-                })
+                }
+                if headers:
+                    payload["tier"] = headers['X-Data-Tier']
+                return encode_response(payload, negotiate_media_type(request.headers.get('accept')),
+                                       cities={city: current_row}, headers=headers)
                 
+            except UpstreamOverloaded as e:
+                return self._overloaded_response(e)
             except Exception as e:
                 logger.error(f"Error getting current conditions for {city}: {e}")
-                return JSONResponse({
+                return FastJSONResponse({
                     "error": "Internal server error",
                     "message": str(e),
                     "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
                 }, status_code=500)
         
         @self.app.get("/api/data/locations")
-        async def get_available_locations():
+        @profiled
+        def get_available_locations():
             """Get list of available locations"""
             try:
                 locations = self.live_data_manager.load_locations()
-                return JSONResponse({
+                return FastJSONResponse({
                     "locations": list(locations.keys()),
                     "coordinates": locations,
                     "total": len(locations),
@@ -383,34 +901,54 @@ class WeatherStationApp:
                 })
             except Exception as e:
                 logger.error(f"Error getting locations: {e}")
-                return JSONResponse({
+                return FastJSONResponse({
                     "error": "Internal server error",
                     "message": str(e),
                     "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
                 }, status_code=500)
         
         @self.app.get("/api/status")
-        async def get_api_status():
+        def get_api_status():
             """Get API and self-hosted Open-Meteo status"""
             try:
                 api_status = self.live_data_manager.get_api_status()
                 data_status = self.data_manager.get_status()
                 
-                return JSONResponse({
+                return FastJSONResponse({
                     "api_status": api_status,
                     "data_manager_status": data_status,
+                    "cache": self.cache.get_stats(),
+                    "response_cache": self.response_cache.get_stats(),
+                    "tiers": self.tiered_reader.get_status() if self.tiered_reader else None,
+                    "upstream_budget": self.upstream_budget.get_status(),
+                    "circuit_breaker": {call_class: breaker.get_status()
+                                        for call_class, breaker in self.upstream_breakers.items()},
+                    "event_loop": self.loop_monitor.get_status(),
+                    "access_log": self.access_log.get_status(),
+                    "events": self.broadcaster.get_status(),
+                    "history": self.cache.get_or_set('history_status', self.history_store.get_status,
+                                                     self.config.STATUS_CACHE_TTL),
                     "live_data_enabled": self.config.LIVE_DATA_ENABLED,
+                    "data_mode": self.config.DATA_MODE,
                     "self_hosted": self.config.USE_SELF_HOSTED,
                     "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
                 })
             except Exception as e:
                 logger.error(f"Error getting API status: {e}")
-                return JSONResponse({
+                return FastJSONResponse({
                     "error": "Internal server error",
                     "message": str(e),
                     "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
                 }, status_code=500)
         
+        @self.app.get("/metrics")
+        def get_metrics():
+            """Prometheus metrics for routes, upstream calls, caches, refreshes and the event loop"""
+            if not self.config.METRICS_ENABLED:
+                raise HTTPException(status_code=404, detail="Not found")
+            
+            return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+        
         @self.app.get("/config")
         async def get_app_config():
             """Get application configuration (public settings only)"""
@@ -420,7 +958,7 @@ class WeatherStationApp:
                 "api_url": self.config.effective_open_meteo_url,
                 "self_hosted": self.config.USE_SELF_HOSTED
             }
-            return JSONResponse(public_config)
+            return FastJSONResponse(public_config)
         
         @self.app.get("/admin/api-key")
         async def get_api_key():
@@ -428,7 +966,7 @@ class WeatherStationApp:
             if not self.config.DEBUG:
                 raise HTTPException(status_code=404, detail="Not found")
             
-            return JSONResponse({
+            return FastJSONResponse({
                 "api_key": self.config.API_KEY,
                 "usage": "Use with X-API-Key header or Authorization: Bearer <key>",
                 "example": f"curl -X POST http://localhost:8110/api/data/force-update -H 'X-API-Key: {self.config.API_KEY}'"
@@ -440,9 +978,10 @@ class WeatherStationApp:
             if not self.config.DEBUG:
                 raise HTTPException(status_code=404, detail="Not found")
             
-            return JSONResponse({
-                "logs": self.logs[-limit:],
-                "total": len(self.logs)
+            return FastJSONResponse({
+                "logs": self.access_log.recent(limit),
+                "total": self.access_log.total,
+                "buffered": len(self.access_log)
             })
         
         @self.app.get("/assets/{filename:path}")
@@ -465,7 +1004,7 @@ class WeatherStationApp:
         @self.app.get("/")
         async def home(request: Request):
             """Main dashboard page"""
-            self.logs.append(self.generate_log(request, "home"))
+            self.access_log.append(self.generate_log(request, "home"))
             file_path = self._get_file_path("index.html")
             
             if not file_path.exists():
@@ -476,7 +1015,7 @@ class WeatherStationApp:
         @self.app.get("/comparison")
         async def comparison_page(request: Request):
             """Weather data comparison page"""
-            self.logs.append(self.generate_log(request, "comparison"))
+            self.access_log.append(self.generate_log(request, "comparison"))
             file_path = self._get_file_path("comparison_quick.html")
             
             if not file_path.exists():
@@ -487,7 +1026,7 @@ class WeatherStationApp:
         @self.app.get("/intmap")
         async def interactive_map_page(request: Request):
             """Interactive pressure map page"""
-            self.logs.append(self.generate_log(request, "interactive_map"))
+            self.access_log.append(self.generate_log(request, "interactive_map"))
             file_path = self._get_file_path("interactive_pressure_map.html")
             
             if not file_path.exists():
@@ -498,7 +1037,7 @@ class WeatherStationApp:
         @self.app.get("/weatherstat")
         async def weather_statistics_page(request: Request):
             """Weather statistics page"""
-            self.logs.append(self.generate_log(request, "weather_statistics"))
+            self.access_log.append(self.generate_log(request, "weather_statistics"))
             file_path = self._get_file_path("weather_statistics.html")
             
             if not file_path.exists():
@@ -509,7 +1048,7 @@ class WeatherStationApp:
         @self.app.get("/license")
         async def license_page(request: Request):
             """License information page"""
-            self.logs.append(self.generate_log(request, "license"))
+            self.access_log.append(self.generate_log(request, "license"))
             file_path = self._get_file_path("LICENSE.txt")
             
             if not file_path.exists():
@@ -547,6 +1086,7 @@ def main():
     logger.info(f"Starting {config.APP_NAME} v{config.APP_VERSION}")
     logger.info(f"Server will run on {config.HOST}:{config.PORT}")
     logger.info(f"Debug mode: {config.DEBUG}")
+    logger.info(f"Workers: {config.WORKERS}")
     logger.info(f"Open-Meteo API: {config.effective_open_meteo_url}")
     
     # Run the server
@@ -556,6 +1096,7 @@ def main():
         port=config.PORT,
         log_level=config.LOG_LEVEL.lower(),
         reload=config.DEBUG,
+        workers=config.WORKERS,
         access_log=True
     )
 
@@ -0,0 +1,84 @@
+"""
+Ingest Worker
+=============
+Runs the data file refresh outside the server process. The child fetches,
+normalizes and serializes the dataset into temporary files; the server
+process only swaps them into place, so refreshes don't hold the GIL while
+requests are being served. The child runs `ingest_child`, a small entry
+module, so it doesn't import the server application.
+
+Can also be run standalone, e.g. from cron or a sidecar container:
+
+    python -m WeatherStation.weather_station.ingest
+"""
+
+import os
+import sys
+import logging
+import subprocess
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .config import get_config
+from .serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+# Directory holding the top-level package, so the child can import it with `-m`
+_IMPORT_ROOT = Path(__file__).resolve().parents[len(__package__.split('.'))]
+
+
+def run_ingest_subprocess(on_progress: Callable[..., None], cities: Optional[List[str]] = None) -> Optional[Dict]:
+    """Stage a refresh (of only `cities` when given) in a child process and return its summary (None on failure)
+
+    `on_progress` is called in this process with the child's progress
+    keyword arguments (stage, completed, failed, total).
+    """
+    config = get_config()
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(_IMPORT_ROOT), env.get('PYTHONPATH')]))
+    process = subprocess.Popen(
+        [sys.executable, '-m', f'{__package__}.ingest_child'],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env
+    )
+    logger.info(f"Started ingest worker process (pid {process.pid})")
+
+    staged = None
+    try:
+        process.stdin.write(dumps(cities))
+        process.stdin.close()
+        for line in process.stdout:
+            message = loads(line)
+            if 'progress' in message:
+                on_progress(**message['progress'])
+            elif 'result' in message:
+                staged = message['result']
+                break
+        else:
+            logger.error(f"Ingest worker exited unexpectedly (exit code {process.wait()})")
+    finally:
+        try:
+            process.wait(timeout=config.INGEST_JOIN_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            logger.warning("Ingest worker did not exit, terminating it")
+            process.terminate()
+            process.wait()
+        process.stdout.close()
+
+    return staged
+
+
+def main() -> int:
+    """Run one full refresh in this process and swap the result into place"""
+    config = get_config()
+    logging.basicConfig(level=getattr(logging, config.LOG_LEVEL), format=config.LOG_FORMAT)
+
+    from .data_manager import WeatherDataManager
+
+    manager = WeatherDataManager()
+    return 0 if manager.force_update() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Ingest Child Entry Point
+========================
+Entry module of the process started by `ingest.run_ingest_subprocess`. It is
+launched with `python -m` rather than multiprocessing's spawn, so the child
+never re-imports the server's `__main__` (under `python main.py` that would
+build the whole application and its managers a second time).
+
+Protocol: the parent writes the cities to refresh to stdin as a JSON list
+(or `null` for all of them). The child answers on stdout with one JSON
+message per line: `{"progress": {...}}` while fetching, then a final
+`{"result": {...}}` (`null` on failure). Logs go to stderr.
+"""
+
+import os
+import sys
+import logging
+
+from .config import get_config
+from .serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> int:
+    """Stage one refresh and report progress and the staged summary to the parent"""
+    # Protocol messages get their own copy of stdout; anything else printed goes to stderr
+    messages = os.fdopen(os.dup(sys.stdout.fileno()), 'wb', buffering=0)
+    sys.stdout = sys.stderr
+
+    config = get_config()
+    logging.basicConfig(level=getattr(logging, config.LOG_LEVEL), format=config.LOG_FORMAT)
+
+    def send(kind: str, payload) -> None:
+        messages.write(dumps({kind: payload}) + b'\n')
+
+    from .data_manager import WeatherDataManager
+
+    manager = WeatherDataManager()
+    manager.progress_callback = lambda progress: send('progress', progress)
+    try:
+        staged = manager.stage_update(loads(sys.stdin.buffer.read() or b'null'))
+    except Exception as e:
+        logger.error(f"Ingest worker failed: {e}")
+        staged = None
+    send('result', staged)
+    return 0 if staged else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Leader Election
+===============
+File-lock based coordination between uvicorn workers: exactly one worker
+holds the updater lock and runs refreshes, the others follow its dataset.
+"""
+
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive inter-process lock on `path` for the duration of the block"""
+    if fcntl is None:
+        yield
+        return
+
+    lock_path = Path(path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class LeaderElection:
+    """Non-blocking leader election on an exclusive lock file
+
+    The lock is released by the OS when the holding process exits, so a
+    follower can take over by calling `try_acquire` again.
+    """
+
+    def __init__(self, lock_path: str):
+        self.lock_path = Path(lock_path)
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._file is not None
+
+    def try_acquire(self) -> bool:
+        """Try to become leader; returns True if this process holds the lock"""
+        with self._lock:
+            if self._file is not None:
+                return True
+
+            if fcntl is None:
+                logger.warning("File locking unavailable - assuming a single worker and acting as leader")
+                self._file = True
+                return True
+
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            f = open(self.lock_path, 'a+')
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+
+            f.seek(0)
+            f.truncate()
+            f.write(str(os.getpid()))
+            f.flush()
+            self._file = f
+            logger.info(f"Worker {os.getpid()} elected as updater leader")
+            return True
+
+    def release(self) -> None:
+        """Give up leadership"""
+        with self._lock:
+            if self._file is None:
+                return
+            if fcntl is not None:
+                try:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+                finally:
+                    self._file.close()
+            self._file = None
+            logger.info(f"Worker {os.getpid()} released updater leadership")
+
+    def leader_pid(self) -> Optional[int]:
+        """PID recorded by the current leader, if any"""
+        try:
+            return int(self.lock_path.read_text().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
@@ -4,17 +4,33 @@ Live Weather Data Manager
 Handles live data fetching from self-hosted Open-Meteo API.
 """
 
-import json
+import os
 import time
 import logging
+import threading
 from typing import Dict, Optional, List
+from pathlib import Path
 import requests
 from datetime import datetime
 
 from .config import get_config
+from .cache import get_cache
+from .admission import UpstreamOverloaded, get_upstream_breaker, get_upstream_budget
+from .circuit_breaker import CircuitOpenError
+from .serialization import dump_file, load_file, loads
+from .rollups import compute_city_rollups
+from .quality import check_city
+from .versioning import diff_city_hourly, get_version_tracker
+from .events import get_broadcaster
+from .metrics import UpstreamRecorder
+from .profiling import timed
+from .normalization import WEATHER_VARIABLES, get_normalizer
 
 logger = logging.getLogger(__name__)
 
+# Single-city requests batch their changes into one dataset version per interval
+CHANGE_FLUSH_INTERVAL = 5.0
+
 
 class LiveWeatherDataManager:
     """Manages live weather data fetching from self-hosted Open-Meteo API"""
@@ -23,6 +39,21 @@ class LiveWeatherDataManager:
         self.config = get_config()
         self._locations_cache = None
         self._locations_cache_time = 0
+        self._rollups = {}
+        self._quality = {}
+        self._last_data = {}
+        self._pending_changes = {}
+        # Guards _last_data, _pending_changes, _rollups and _quality across request and refresh threads
+        self._state_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flush_timer: Optional[threading.Timer] = None
+        self.version_tracker = get_version_tracker()
+        self._api_accessible: Optional[bool] = None
+        self.cache = get_cache()
+        self.upstream_budget = get_upstream_budget()
+        self.breaker = get_upstream_breaker('live')
+        self.upstream_metrics = UpstreamRecorder('live')
+        self.normalizer = get_normalizer()
         
     def load_locations(self) -> Dict:
         """Load locations from geolocations.json with caching"""
@@ -33,8 +64,7 @@ class LiveWeatherDataManager:
             current_time - self._locations_cache_time > 300):
             
             try:
-                with open(self.config.LOCATIONS_FILE, 'r') as f:
-                    self._locations_cache = json.load(f)
+                self._locations_cache = load_file(self.config.LOCATIONS_FILE)
                 self._locations_cache_time = current_time
                 logger.info(f"Loaded {len(self._locations_cache)} locations")
             except Exception as e:
@@ -58,7 +88,9 @@ class LiveWeatherDataManager:
                 return None
             
             coordinates = locations[city]
-            return self._fetch_live_weather_data(city, coordinates)
+            data = self._fetch_live_weather_data(city, coordinates)
+            self._flush_changes(force=False)
+            return data
         
         # Get data for all cities (this could be expensive, so limit concurrent requests)
         return self._fetch_multiple_cities_data(locations)
@@ -72,72 +104,134 @@ class LiveWeatherDataManager:
         
         logger.info(f"Starting batch fetch for up to {min(limit, len(locations))} cities")
         
-        for city, coordinates in locations.items():
-            if limit and count >= limit:
-                logger.info(f"Reached limit of {limit} cities for batch request")
-                break
-            
-            try:
-                data = self._fetch_live_weather_data(city, coordinates)
-                if data:
-                    result[city] = data
+        # One round trip for every city already cached (possibly by another node)
+        cached = self.cache.get_many(f"live:{city}" for city in locations)
+        
+        # One queue deadline for the whole request, however many cities miss the cache
+        with self.upstream_budget.deadline():
+            for city, coordinates in locations.items():
+                if limit and count >= limit:
+                    logger.info(f"Reached limit of {limit} cities for batch request")
+                    break
+                
+                stale = cached.get(f"live:{city}")
+                if stale is not None and self._is_fresh(stale):
+                    self._track_city_data(city, stale)
+                    result[city] = stale
+                    count += 1
+                    continue
+                
+                try:
+                    data = self._refresh_city_data(city, coordinates) or self._serve_stale(city, stale)
+                    if data:
+                        result[city] = data
+                        count += 1
+                    else:
+                        errors += 1
+                        logger.warning(f"No data returned for {city}")
+                except UpstreamOverloaded:
+                    if stale is None:
+                        # Shed the request rather than queueing more upstream calls
+                        self._flush_changes(force=False)
+                        raise
+                    result[city] = self._serve_stale(city, stale)
                     count += 1
-                else:
+                    continue
+                except Exception as e:
                     errors += 1
-                    logger.warning(f"No data returned for {city}")
-            except Exception as e:
-                errors += 1
-                logger.error(f"Error fetching data for {city}: {e}")
-                # Continue with other cities
-                continue
-            
-            # Rate limiting - reduced for self-hosted API
-            if count < len(locations) - 1 and count % 10 != 9:  # No delay every 10th request
-                time.sleep(0.001)  # Much faster for self-hosted API
-            
-            # Progress logging every 10 cities
-            if count > 0 and count % 10 == 0:
-                elapsed = time.time() - start_time
-                rate = count / elapsed
-                logger.info(f"Progress: {count} cities fetched in {elapsed:.1f}s ({rate:.1f} cities/s)")
+                    logger.error(f"Error fetching data for {city}: {e}")
+                    # Continue with other cities
+                    continue
+                
+                # Rate limiting - reduced for self-hosted API
+                if count < len(locations) - 1 and count % 10 != 9:  # No delay every 10th request
+                    time.sleep(0.001)  # Much faster for self-hosted API
+                
+                # Progress logging every 10 cities
+                if count > 0 and count % 10 == 0:
+                    elapsed = time.time() - start_time
+                    rate = count / elapsed
+                    logger.info(f"Progress: {count} cities fetched in {elapsed:.1f}s ({rate:.1f} cities/s)")
         
         elapsed = time.time() - start_time
         logger.info(f"Batch fetch completed: {len(result)} cities in {elapsed:.1f}s, {errors} errors")
+        self._flush_changes()
         return result
     
     def _fetch_live_weather_data(self, city: str, coordinates: List[float]) -> Optional[Dict]:
+        """Get live weather data for a city from the cache, fetching it upstream on a miss
+
+        Raises UpstreamOverloaded when the upstream budget sheds the call and
+        no stale copy is available.
+        """
+        cached = self.cache.get(f"live:{city}")
+        if cached is not None and self._is_fresh(cached):
+            self._track_city_data(city, cached)
+            return cached
+        
+        try:
+            data = self._refresh_city_data(city, coordinates)
+        except UpstreamOverloaded:
+            if cached is None:
+                raise
+            data = None
+        return data or self._serve_stale(city, cached)
+    
+    def _is_fresh(self, data: Dict) -> bool:
+        """Whether cached city data is younger than LIVE_CACHE_TTL"""
+        fetched_at = data.get('fetched_at')
+        return fetched_at is not None and time.time() - fetched_at <= self.config.LIVE_CACHE_TTL
+    
+    def _serve_stale(self, city: str, cached: Optional[Dict]) -> Optional[Dict]:
+        """Fall back to an expired cache entry when the upstream fetch failed"""
+        if cached is None:
+            return None
+        logger.info(f"Serving stale cached data for {city} (upstream unavailable)")
+        self._track_city_data(city, cached)
+        return cached
+    
+    def _refresh_city_data(self, city: str, coordinates: List[float]) -> Optional[Dict]:
+        """Fetch a city from upstream and store it in the shared cache"""
+        data = self._fetch_upstream_city_data(city, coordinates)
+        if data is not None:
+            # Kept past its freshness so it can still be served while revalidating
+            self.cache.set(f"live:{city}", data, self.config.LIVE_CACHE_TTL + self.config.LIVE_CACHE_MAX_STALE)
+            self._track_city_data(city, data)
+        return data
+    
+    def _fetch_upstream_city_data(self, city: str, coordinates: List[float]) -> Optional[Dict]:
         """Fetch live weather data for a specific city from self-hosted API"""
         try:
             latitude, longitude = coordinates
             
-            # Weather parameters for self-hosted Open-Meteo API
-            weather_params = [
-                'temperature_2m', 'relative_humidity_2m', 'dew_point_2m', 
-                'apparent_temperature', 'precipitation_probability', 'precipitation',
-                'rain', 'showers', 'snowfall', 'snow_depth', 'pressure_msl',
-                'surface_pressure', 'cloud_cover', 'visibility', 'uv_index',
-                'wind_speed_10m', 'wind_direction_10m', 'wind_gusts_10m',
-                'soil_temperature_0cm', 'soil_moisture_0_to_1cm'
-            ]
-            
             # Build API URL for self-hosted Open-Meteo API
             params = {
                 'latitude': latitude,
                 'longitude': longitude,
-                'hourly': ','.join(weather_params),
+                'hourly': ','.join(WEATHER_VARIABLES),
                 'past_days': 1,  # Only get recent data for live fetching
                 'forecast_days': 7,  # Get 7 days of forecast
                 'timezone': 'auto',
-                'models': 'ecmwf_ifs025,ncep_gfs025,meteofrance_arpege_world025'  # Specify available models
+                'models': ','.join(self.config.FORECAST_MODELS)  # Specify available models
             }
             
             api_url = f"{self.config.effective_open_meteo_url}/v1/forecast"
             
-            # Shorter timeout for live data
-            response = requests.get(api_url, params=params, timeout=5)
-            response.raise_for_status()
+            started = time.perf_counter()
+            try:
+                # Fail fast while the upstream is down, before queueing for a slot
+                self.breaker.check()
+                with timed('upstream_fetch'), self.upstream_budget.slot(), self.breaker.guard():
+                    # Shorter timeout for live data, tightened to the observed upstream latency
+                    response = requests.get(api_url, params=params, timeout=self.breaker.timeout(5))
+                    response.raise_for_status()
+            except Exception as e:
+                self.upstream_metrics.record(city, params['models'], time.perf_counter() - started, type(e).__name__)
+                raise
+            self.upstream_metrics.record(city, params['models'], time.perf_counter() - started, 'ok')
             
-            data = response.json()
+            with timed('normalize'):
+                data = loads(response.content)
             
             # Normalize field names from model-specific to generic
             data = self._normalize_field_names(data)
@@ -148,9 +242,15 @@ class LiveWeatherDataManager:
             data['latitude'] = latitude
             data['longitude'] = longitude
             data['fetch_time'] = datetime.now().isoformat()
+            data['fetched_at'] = time.time()
             
             return data
             
+        except UpstreamOverloaded:
+            raise
+        except CircuitOpenError as e:
+            logger.debug(f"Skipping live fetch for {city}: {e}")
+            return None
         except requests.exceptions.Timeout:
             logger.warning(f"Timeout fetching live data for {city}")
             return None
@@ -161,48 +261,189 @@ class LiveWeatherDataManager:
             logger.warning(f"Failed to fetch live data for {city}: {e}")
             return None
     
-    def _normalize_field_names(self, data):
-        """Normalize model-specific field names to generic field names"""
-        if not data or 'hourly' not in data:
-            return data
+    def _track_city_data(self, city: str, data: Dict):
+        """Refresh rollups, QC report and delta-sync state when a city's data is new to this process"""
+        with self._state_lock:
+            previous = self._last_data.get(city)
+            if previous is not None and previous.get('fetch_time') == data.get('fetch_time'):
+                return
+            
+            # Claimed under the lock so concurrent callers diff and announce it once
+            self._last_data[city] = data
+            change = diff_city_hourly(previous, data)
+            if change is not None:
+                pending = self._pending_changes.get(city)
+                if pending is not None and 'start' in pending:
+                    change = {'start': min(pending['start'], change['start']),
+                              'end': max(pending['end'], change['end'])}
+                self._pending_changes[city] = change
         
-        hourly = data['hourly']
-        normalized_hourly = {}
+        # Rollups and the QC report for the same data, computed outside the lock
+        city_rollups = compute_city_rollups(data)
+        report = check_city(data)
         
-        # Field name mapping patterns - from model-specific to generic
-        field_mappings = {
-            'temperature_2m': ['temperature_2m_ecmwf_ifs025', 'temperature_2m_ncep_gfs025', 'temperature_2m_meteofrance_arpege_world025'],
-            'relative_humidity_2m': ['relative_humidity_2m_ecmwf_ifs025', 'relative_humidity_2m_ncep_gfs025', 'relative_humidity_2m_meteofrance_arpege_world025'],
-            'pressure_msl': ['pressure_msl_ecmwf_ifs025', 'pressure_msl_ncep_gfs025', 'pressure_msl_meteofrance_arpege_world025'],
-            'wind_speed_10m': ['wind_speed_10m_ecmwf_ifs025', 'wind_speed_10m_ncep_gfs025', 'wind_speed_10m_meteofrance_arpege_world025'],
-            'wind_direction_10m': ['wind_direction_10m_ecmwf_ifs025', 'wind_direction_10m_ncep_gfs025', 'wind_direction_10m_meteofrance_arpege_world025'],
-            'precipitation': ['precipitation_ecmwf_ifs025', 'precipitation_ncep_gfs025', 'precipitation_meteofrance_arpege_world025'],
-            'dew_point_2m': ['dew_point_2m_ecmwf_ifs025', 'dew_point_2m_ncep_gfs025', 'dew_point_2m_meteofrance_arpege_world025'],
-            'apparent_temperature': ['apparent_temperature_ecmwf_ifs025', 'apparent_temperature_ncep_gfs025', 'apparent_temperature_meteofrance_arpege_world025']
-        }
+        with self._state_lock:
+            if self._last_data.get(city) is not data:
+                # Newer data was tracked meanwhile and owns the derived state
+                return
+            if city_rollups is not None:
+                self._rollups[city] = city_rollups
+                self.cache.set(f"rollups:{city}", city_rollups, self.config.LIVE_CACHE_TTL)
+            if report is not None:
+                self._quality[city] = report
+                self.cache.set(f"quality:{city}", report, self.config.LIVE_CACHE_TTL)
         
-        # Copy time field
-        if 'time' in hourly:
-            normalized_hourly['time'] = hourly['time']
+        # Bad upstream values are logged so they are visible before users notice
+        if report is not None and not report['valid']:
+            logger.warning(f"⚠️ Live data for {city} failed quality checks: {', '.join(report['flags'])}")
+    
+    def seed_baseline(self, city: str, data: Dict) -> bool:
+        """Set the data a city's next fetch is diffed against, unless it is already tracked
+
+        Used to diff background refreshes against the snapshot clients were
+        served instead of an empty history. Returns whether the baseline was set.
+        """
+        with self._state_lock:
+            if city in self._last_data:
+                return False
+            self._last_data[city] = data
+            return True
+    
+    @timed('normalize')
+    def _normalize_field_names(self, data):
+        """Normalize model-specific field names to generic field names"""
+        return self.normalizer.normalize(data)
+    
+    def _flush_changes(self, force: bool = True) -> Optional[int]:
+        """Record accumulated city changes as one new dataset version
+
+        Recording takes a file lock and rewrites the version file, so unless
+        `force` is set changes are only recorded once per CHANGE_FLUSH_INTERVAL;
+        a timer records whatever is still pending after that. Returns the new
+        version, or None when nothing was recorded.
+        """
+        with self._state_lock:
+            if not self._pending_changes:
+                return None
+            if not force and time.monotonic() - self._last_flush < CHANGE_FLUSH_INTERVAL:
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(CHANGE_FLUSH_INTERVAL, self._flush_changes)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return None
+            
+            # Swapped under the lock, so no tracker can write to the dict being recorded
+            changes, self._pending_changes = self._pending_changes, {}
+            self._last_flush = time.monotonic()
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
         
-        # Normalize field names
-        for generic_name, model_specific_names in field_mappings.items():
-            for model_specific_name in model_specific_names:
-                if model_specific_name in hourly:
-                    normalized_hourly[generic_name] = hourly[model_specific_name]
-                    break  # Use first available model
+        return self.version_tracker.record(changes)
+    
+    def get_data_version(self) -> int:
+        """Get the current live dataset version, including changes still batched"""
+        self._flush_changes()
+        return self.version_tracker.current_version
+    
+    def get_changes_since(self, since: int) -> Optional[Dict]:
+        """Get cities and hour ranges changed after the given dataset version"""
+        self._flush_changes()
+        return self.version_tracker.changes_since(since)
+    
+    def get_rollups(self) -> Dict:
+        """Get daily/weekly rollups for cities fetched so far (by this or another node)"""
+        rollups = {}
+        cached = self.cache.get_many(f"rollups:{city}" for city in self.load_locations())
+        for key, city_rollups in cached.items():
+            rollups[key[len('rollups:'):]] = city_rollups
+        with self._state_lock:
+            rollups.update(self._rollups)
+        return rollups
+    
+    def get_quality(self) -> Dict:
+        """Get QC reports for cities fetched so far (by this or another node)"""
+        reports = {}
+        cached = self.cache.get_many(f"quality:{city}" for city in self.load_locations())
+        for key, report in cached.items():
+            reports[key[len('quality:'):]] = report
+        with self._state_lock:
+            reports.update(self._quality)
+        return reports
+    
+    def save_cache_snapshot(self) -> int:
+        """Persist cached live city data and rollups so the next start is warm
+
+        Returns the number of entries written. Nothing is written for
+        backends that outlive the process (e.g. Redis).
+        """
+        now = time.time()
+        entries = []
+        for prefix in ('live:', 'rollups:', 'quality:'):
+            for key, value, ttl in self.cache.snapshot(prefix):
+                city = key.split(':', 1)[1]
+                fetched_at = (self._last_data.get(city) or value).get('fetched_at', now)
+                entries.append({'key': key, 'age': round(now - fetched_at, 1), 'ttl': ttl, 'value': value})
         
-        # Copy any fields that don't need normalization
-        for field_name, field_data in hourly.items():
-            if field_name not in normalized_hourly and not any(field_name in models for models in field_mappings.values()):
-                normalized_hourly[field_name] = field_data
+        if not entries:
+            return 0
         
-        data['hourly'] = normalized_hourly
-        return data
+        try:
+            snapshot_file = Path(self.config.LIVE_CACHE_SNAPSHOT_FILE)
+            snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = snapshot_file.with_suffix(snapshot_file.suffix + '.tmp')
+            dump_file({'saved_at': now, 'entries': entries}, tmp_file)
+            os.replace(tmp_file, snapshot_file)
+            logger.info(f"✓ Saved live cache snapshot ({len(entries)} entries, {snapshot_file.stat().st_size / 1024 / 1024:.1f} MB)")
+            return len(entries)
+        except Exception as e:
+            logger.error(f"Error saving live cache snapshot: {e}")
+            return 0
     
-    def get_current_conditions(self, city: str) -> Optional[Dict]:
-        """Get current weather conditions for a specific city"""
-        data = self.get_weather_data(city)
+    def restore_cache_snapshot(self) -> int:
+        """Load the snapshot written on shutdown; returns the number of restored entries
+
+        Entries keep their original fetch time, so data that aged past
+        LIVE_CACHE_TTL during the downtime is served stale and revalidated.
+        """
+        snapshot_file = Path(self.config.LIVE_CACHE_SNAPSHOT_FILE)
+        if not snapshot_file.exists():
+            return 0
+        
+        try:
+            snapshot = load_file(snapshot_file)
+            downtime = time.time() - snapshot.get('saved_at', 0)
+            entries = [
+                (entry['key'], entry['value'], entry['ttl'] - downtime if entry['ttl'] is not None else None)
+                for entry in snapshot.get('entries', [])
+            ]
+            restored = self.cache.restore(entries)
+            
+            # Seed rollups, QC reports and delta-sync state without announcing a new version
+            with self._state_lock:
+                for key, value, ttl in entries:
+                    if ttl is not None and ttl <= 0:
+                        continue
+                    kind, city = key.split(':', 1)
+                    if kind == 'live':
+                        self._last_data[city] = value
+                    elif kind == 'rollups':
+                        self._rollups[city] = value
+                    elif kind == 'quality':
+                        self._quality[city] = value
+            
+            ages = sorted(entry['age'] + downtime for entry in snapshot.get('entries', []) if entry['key'].startswith('live:'))
+            median_age = ages[len(ages) // 2] if ages else 0
+            logger.info(f"✓ Restored {restored} live cache entries (median data age {median_age / 60:.0f}m)")
+            return restored
+        except Exception as e:
+            logger.error(f"Error restoring live cache snapshot: {e}")
+            return 0
+    
+    def get_current_conditions(self, city: str, data: Optional[Dict] = None) -> Optional[Dict]:
+        """Get current weather conditions for a specific city (from `data` if already loaded)"""
+        if data is None:
+            data = self.get_weather_data(city)
         if not data or 'hourly' not in data:
             return None
         
@@ -229,8 +470,22 @@ class LiveWeatherDataManager:
             logger.error(f"Error extracting current conditions for {city}: {e}")
             return None
     
+    def _report_api_health(self, accessible: bool):
+        """Announce upstream health changes to event subscribers"""
+        if accessible != self._api_accessible:
+            self._api_accessible = accessible
+            get_broadcaster().publish('upstream_health', {
+                'accessible': accessible,
+                'api_url': self.config.effective_open_meteo_url,
+                'source': 'live_data_manager'
+            })
+    
     def get_api_status(self) -> Dict:
-        """Check if the self-hosted Open-Meteo API is accessible"""
+        """Check if the self-hosted Open-Meteo API is accessible (cached for STATUS_CACHE_TTL)"""
+        return self.cache.get_or_set('api_status:live', self._probe_api_status, self.config.STATUS_CACHE_TTL)
+    
+    def _probe_api_status(self) -> Dict:
+        """Probe the self-hosted Open-Meteo API with a small request"""
         try:
             # Test API with a simple request
             test_url = f"{self.config.effective_open_meteo_url}/v1/forecast"
@@ -239,29 +494,41 @@ class LiveWeatherDataManager:
                 'longitude': -74.0,
                 'hourly': 'temperature_2m,relative_humidity_2m,pressure_msl,wind_speed_10m',
                 'forecast_days': 1,
-                'models': 'ecmwf_ifs025,ncep_gfs025,meteofrance_arpege_world025'
+                'models': ','.join(self.config.FORECAST_MODELS)
             }
             
             start_time = time.time()
-            response = requests.get(test_url, params=params, timeout=10)
+            try:
+                # An open circuit answers immediately instead of waiting out the timeout;
+                # the probe's latency is not that of a forecast fetch
+                with self.breaker.guard(timed=False):
+                    response = requests.get(test_url, params=params, timeout=self.breaker.timeout(10))
+                    if response.status_code >= 500:
+                        response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                pass  # Reported below with its status code
             response_time = time.time() - start_time
+            self._report_api_health(response.status_code == 200)
             
             return {
                 'accessible': response.status_code == 200,
                 'response_time_ms': int(response_time * 1000),
                 'api_url': self.config.effective_open_meteo_url,
                 'status_code': response.status_code,
+                'circuit': self.breaker.state,
                 'self_hosted': self.config.USE_SELF_HOSTED,
                 'live_data_enabled': self.config.LIVE_DATA_ENABLED
             }
             
         except Exception as e:
+            self._report_api_health(False)
             return {
                 'accessible': False,
                 'response_time_ms': -1,
                 'api_url': self.config.effective_open_meteo_url,
                 'status_code': -1,
                 'error': str(e),
+                'circuit': self.breaker.state,
                 'self_hosted': self.config.USE_SELF_HOSTED,
                 'live_data_enabled': self.config.LIVE_DATA_ENABLED
             }
@@ -0,0 +1,163 @@
+"""
+Event Loop Monitor
+==================
+Detects event-loop stalls: a heartbeat coroutine measures how late the loop
+wakes it up, and a watchdog thread samples the loop thread's stack while it
+is stuck so each stall is attributed to the route (and line) that blocked it.
+"""
+
+import sys
+import time
+import inspect
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+# Recent stalls kept for /api/status
+STALL_HISTORY_SIZE = 50
+
+
+class LoopMonitor:
+    """Records event-loop stalls longer than `threshold_ms`"""
+
+    def __init__(self, threshold_ms: float = 100, interval: float = 0.05):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self._routes: Dict[object, str] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._last_beat = 0.0
+        self._suspect: Optional[Dict] = None
+        self.stalls = deque(maxlen=STALL_HISTORY_SIZE)
+        self.stall_count = 0
+        self.stall_seconds_total = 0.0
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.stalls_by_route: Dict[str, int] = {}
+
+    def register_routes(self, routes: Iterable) -> None:
+        """Map route handler code objects to "METHOD /path" for stall attribution"""
+        for route in routes:
+            endpoint = getattr(route, 'endpoint', None)
+            # Decorated handlers are matched by their own frame, not the wrapper's
+            code = getattr(inspect.unwrap(endpoint), '__code__', None) if endpoint else None
+            if code is not None:
+                methods = ','.join(sorted(getattr(route, 'methods', None) or []))
+                self._routes[code] = f"{methods} {route.path}".strip()
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start the heartbeat on `loop` (call from inside it) and the watchdog thread"""
+        if self._task is not None:
+            return
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        self._task = loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+        logger.info(f"✓ Event loop monitor started (stall threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self) -> None:
+        """Stop the heartbeat and watchdog"""
+        self._stop_event.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(0.0, now - expected)
+            self.last_lag = lag
+            if lag > self.max_lag:
+                self.max_lag = lag
+            with self._lock:
+                suspect, self._suspect = self._suspect, None
+            if lag >= self.threshold:
+                self._record_stall(lag, suspect)
+
+    def _watch(self):
+        """Capture the loop thread's stack while the heartbeat is overdue"""
+        while not self._stop_event.wait(self.interval):
+            overdue = time.monotonic() - self._last_beat - self.interval
+            # Sample early so stalls just over the threshold are still attributed
+            if overdue < self.threshold / 2:
+                continue
+            with self._lock:
+                if self._suspect is not None:
+                    continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            suspect = self._describe(frame)
+            with self._lock:
+                self._suspect = suspect
+
+    def _describe(self, frame) -> Dict:
+        """Find the innermost frame and the route handler on the blocked stack"""
+        blocked_in = f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        route = None
+        while frame is not None:
+            route = self._routes.get(frame.f_code)
+            if route:
+                break
+            frame = frame.f_back
+        return {'route': route, 'blocked_in': blocked_in}
+
+    def _record_stall(self, lag: float, suspect: Optional[Dict]) -> None:
+        route = (suspect or {}).get('route') or 'unknown'
+        stall = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'duration_ms': int(lag * 1000),
+            'route': route,
+            'blocked_in': (suspect or {}).get('blocked_in')
+        }
+        with self._lock:
+            self.stalls.append(stall)
+            self.stall_count += 1
+            self.stall_seconds_total += lag
+            self.stalls_by_route[route] = self.stalls_by_route.get(route, 0) + 1
+        logger.warning(f"⚠️ Event loop stalled for {stall['duration_ms']}ms in {route} ({stall['blocked_in']})")
+
+    def get_status(self, recent: int = 10) -> Dict:
+        """Get stall counters and the most recent stalls"""
+        with self._lock:
+            return {
+                'running': self._task is not None,
+                'threshold_ms': int(self.threshold * 1000),
+                'stalls': self.stall_count,
+                'stall_seconds_total': round(self.stall_seconds_total, 3),
+                'max_lag_ms': int(self.max_lag * 1000),
+                'last_lag_ms': int(self.last_lag * 1000),
+                'stalls_by_route': dict(self.stalls_by_route),
+                'recent_stalls': list(self.stalls)[-recent:]
+            }
+
+
+# Global instance
+_loop_monitor: Optional[LoopMonitor] = None
+
+
+def get_loop_monitor() -> LoopMonitor:
+    """Get global loop monitor instance"""
+    global _loop_monitor
+    if _loop_monitor is None:
+        _loop_monitor = LoopMonitor(threshold_ms=get_config().LOOP_STALL_THRESHOLD_MS)
+    return _loop_monitor
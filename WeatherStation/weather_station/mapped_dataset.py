@@ -0,0 +1,125 @@
+"""
+Mapped Dataset
+==============
+Read-only view of the data file that all worker processes share. The file
+is memory-mapped, so its pages sit once in the OS page cache however many
+workers serve it. Each worker only keeps an index of where every city's
+JSON starts and ends, plus a small LRU of recently parsed cities; JSON
+responses are assembled from slices of the mapping without parsing them.
+
+Files in any other layout than `dump_object_lines` (e.g. written by the CLI
+updater) are parsed once and laid out in a private buffer instead.
+"""
+
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from .metrics import estimate_size
+from .serialization import dumps, dumps_object_lines, index_object_lines, loads
+
+
+class MappedDataset(Mapping):
+    """City name → parsed city data, backed by one serialized buffer
+
+    Parsed cities are shared by all callers and must be treated as read-only.
+    """
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap], index: Dict[str, Tuple[int, int]],
+                 parse_cache_size: int = 64, shared: bool = True, mtime_ns: int = 0):
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._index = index
+        self._parsed: 'OrderedDict[str, Tuple[Dict, int]]' = OrderedDict()
+        self._parsed_bytes = 0
+        self._parse_cache_size = parse_cache_size
+        self._lock = threading.Lock()
+        self.shared = shared
+        self.mtime_ns = mtime_ns
+
+    def raw(self, city: str) -> memoryview:
+        """Serialized JSON of one city, as a zero-copy slice of the buffer"""
+        start, end = self._index[city]
+        return self._view[start:end]
+
+    def __getitem__(self, city: str) -> Dict:
+        with self._lock:
+            entry = self._parsed.get(city)
+            if entry is not None:
+                self._parsed.move_to_end(city)
+                return entry[0]
+
+        value = loads(self.raw(city))
+        size = estimate_size(value)
+        with self._lock:
+            if city not in self._parsed:
+                self._parsed[city] = (value, size)
+                self._parsed_bytes += size
+            while len(self._parsed) > self._parse_cache_size:
+                _, (_, evicted) = self._parsed.popitem(last=False)
+                self._parsed_bytes -= evicted
+        return value
+
+    def __contains__(self, city) -> bool:
+        return city in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def select(self, cities: Iterable[str]) -> 'MappedDataset':
+        """View of the given cities (in that order) sharing this buffer and parse cache"""
+        view = object.__new__(MappedDataset)
+        view.__dict__.update(self.__dict__)
+        view._index = {city: self._index[city] for city in cities if city in self._index}
+        return view
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the serialized buffer"""
+        return len(self._buffer)
+
+    @property
+    def private_bytes(self) -> int:
+        """Approximate memory held by this process alone (index, parsed cities, private buffer)"""
+        size = estimate_size(self._index) + self._parsed_bytes
+        if not self.shared:
+            size += self.nbytes
+        return size
+
+    def get_status(self) -> Dict:
+        """Get mapping statistics"""
+        return {
+            'shared': self.shared,
+            'locations': len(self._index),
+            'mapped_bytes': self.nbytes if self.shared else 0,
+            'private_bytes': self.private_bytes,
+            'parsed_cities': len(self._parsed),
+            'parse_cache_size': self._parse_cache_size
+        }
+
+
+def open_dataset(path: Union[str, os.PathLike], parse_cache_size: int = 64) -> Optional[MappedDataset]:
+    """Map a data file read-only; None when it does not hold a JSON object"""
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b''
+
+    index = index_object_lines(buffer)
+    if index is not None:
+        return MappedDataset(buffer, index, parse_cache_size, shared=True, mtime_ns=stat.st_mtime_ns)
+
+    # Other layouts are parsed once and re-serialized one city per line in this process only
+    data = loads(buffer[:])
+    if isinstance(buffer, mmap.mmap):
+        buffer.close()
+    if not isinstance(data, dict):
+        return None
+    buffer = dumps_object_lines((city, dumps(city_data)) for city, city_data in data.items())
+    return MappedDataset(buffer, index_object_lines(buffer), parse_cache_size,
+                         shared=False, mtime_ns=stat.st_mtime_ns)
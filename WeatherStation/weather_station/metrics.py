@@ -0,0 +1,370 @@
+"""
+Metrics
+=======
+Minimal Prometheus-compatible metrics (text exposition format 0.0.4) without
+extra dependencies. Hot paths bind label values once with `labels()` and keep
+the returned child, so recording is a lock and a few additions.
+
+Values that already live elsewhere (cache stats, dataset version, loop stalls)
+are read at scrape time through callbacks registered with `add_callback`.
+"""
+
+import sys
+import time
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds, from cached responses to slow upstream calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REFRESH_BUCKETS = (10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base for metrics whose values are recorded by the application"""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Get the child for these label values; keep it to avoid repeated lookups"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        samples = []
+        for key, child in list(self._children.items()):
+            samples.extend(
+                (self.name + suffix, _format_labels(self.labelnames + extra_names, key + extra_values), value)
+                for suffix, extra_names, extra_values, value in child.samples()
+            )
+        return samples
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self._samples())
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('_value', '_lock')
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def samples(self):
+        return [('', (), (), self._value)]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count (name it with a `_total` suffix)"""
+
+    type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ('_value',)
+
+    def __init__(self):
+        self._value = 0.0
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def samples(self):
+        return [('', (), (), self._value)]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down (last write wins)"""
+
+    type = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class _HistogramChild:
+    __slots__ = ('_buckets', '_counts', '_sum', '_count', '_lock')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self):
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        samples = []
+        cumulative = 0
+        for bound, bucket_count in zip(self._buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            samples.append(('_bucket', ('le',), (_format_value(bound),), cumulative))
+        samples.append(('_sum', (), (), total))
+        samples.append(('_count', (), (), count))
+        return samples
+
+
+class _Timer:
+    """Context manager observing the elapsed time of its block"""
+
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+
+class Registry:
+    """Collects metrics and scrape-time callbacks and renders them as text"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._callbacks: List[Tuple[str, str, str, Tuple[str, ...], Callable]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_callback(self, name: str, type: str, help: str, labelnames: Tuple[str, ...],
+                     collect: Callable[[], Iterable[Tuple[Tuple, float]]]) -> None:
+        """Expose values computed at scrape time; `collect` yields (label values, value)"""
+        with self._lock:
+            self._callbacks = [entry for entry in self._callbacks if entry[0] != name]
+            self._callbacks.append((name, type, help, tuple(labelnames), collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+
+        for name, type, help, labelnames, collect in list(self._callbacks):
+            try:
+                samples = list(collect())
+            except Exception:
+                # A failing source must not break the whole scrape
+                continue
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+            for values, value in samples:
+                if value is not None:
+                    lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labelnames))
+
+
+def histogram(name: str, help: str, labelnames: Tuple[str, ...] = (),
+              buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+# Application metrics
+REQUEST_DURATION = histogram(
+    'weatherstation_request_duration_seconds', 'HTTP request latency by route',
+    ('method', 'route', 'status')
+)
+UPSTREAM_DURATION = histogram(
+    'weatherstation_upstream_request_duration_seconds', 'Open-Meteo request latency by model set',
+    ('source', 'model')
+)
+UPSTREAM_LAST_DURATION = gauge(
+    'weatherstation_upstream_last_duration_seconds', 'Latency of the latest Open-Meteo request per city',
+    ('source', 'city', 'model')
+)
+UPSTREAM_REQUESTS = counter(
+    'weatherstation_upstream_requests_total', 'Open-Meteo requests per city, model set and outcome',
+    ('source', 'city', 'model', 'outcome')
+)
+REFRESH_DURATION = histogram(
+    'weatherstation_refresh_duration_seconds', 'Dataset refresh job duration',
+    ('outcome',), buckets=REFRESH_BUCKETS
+)
+REFRESH_LOCATIONS = gauge(
+    'weatherstation_refresh_locations', 'Locations in the latest successful refresh',
+    ('result',)
+)
+REFRESH_BYTES = gauge(
+    'weatherstation_refresh_output_bytes', 'Size of the data file written by the latest refresh'
+)
+
+# Pre-bound children for fixed label values
+REFRESH_OK = REFRESH_DURATION.labels('success')
+REFRESH_FAILED = REFRESH_DURATION.labels('failure')
+
+
+class UpstreamRecorder:
+    """Pre-bound upstream metrics for one caller (e.g. the live or file manager)"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self._children: Dict[Tuple[str, str], Tuple] = {}
+
+    def record(self, city: str, model: str, seconds: float, outcome: str) -> None:
+        key = (city, model)
+        children = self._children.get(key)
+        if children is None:
+            children = self._children[key] = (
+                UPSTREAM_DURATION.labels(self.source, model),
+                UPSTREAM_LAST_DURATION.labels(self.source, city, model),
+                {}
+            )
+        duration, last_duration, outcomes = children
+        counter_child = outcomes.get(outcome)
+        if counter_child is None:
+            counter_child = outcomes[outcome] = UPSTREAM_REQUESTS.labels(self.source, city, model, outcome)
+        counter_child.inc()
+        if outcome == 'ok':
+            duration.observe(seconds)
+            last_duration.set(seconds)
+
+
+def estimate_size(obj) -> int:
+    """Approximate in-memory size of a parsed JSON document in bytes
+
+    Lists of scalars are sized from their first element instead of visiting
+    every value, which keeps this cheap enough to run on every dataset load.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += sys.getsizeof(key) + estimate_size(value)
+    elif isinstance(obj, list) and obj:
+        first = obj[0]
+        if isinstance(first, (dict, list)):
+            size += sum(estimate_size(item) for item in obj)
+        else:
+            size += sys.getsizeof(first) * len(obj)
+    return size
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by route template"""
+
+    def __init__(self, app):
+        self.app = app
+        self._children: Dict[Tuple[str, str, int], _HistogramChild] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            # Templates keep cardinality bounded (/api/data/live/{city}, not one series per city)
+            path = getattr(route, 'path', None) or 'unmatched'
+            key = (scope['method'], path, status[0])
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = REQUEST_DURATION.labels(*key)
+            child.observe(time.perf_counter() - start)
+
+
+def render_metrics() -> str:
+    """Render all registered metrics in the Prometheus text format"""
+    return REGISTRY.render()
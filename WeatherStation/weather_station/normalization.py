@@ -0,0 +1,168 @@
+"""
+Field Normalization
+===================
+Maps Open-Meteo's model-specific hourly fields (`temperature_2m_ecmwf_ifs025`)
+to generic names (`temperature_2m`). The lookup table is built once from the
+requested variables and models, so each field costs one dict lookup.
+
+The generic field takes the first model (in request order) that returned it.
+Optionally every model's series is kept as well, and ensemble mean/spread
+series are added for variables reported by more than one model — the
+upstream already returns all models, so this costs no extra requests.
+"""
+
+import logging
+from itertools import zip_longest
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .config import get_config
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Hourly variables requested from Open-Meteo
+WEATHER_VARIABLES = [
+    'temperature_2m', 'relative_humidity_2m', 'dew_point_2m',
+    'apparent_temperature', 'precipitation_probability', 'precipitation',
+    'rain', 'showers', 'snowfall', 'snow_depth', 'pressure_msl',
+    'surface_pressure', 'cloud_cover', 'visibility', 'uv_index',
+    'wind_speed_10m', 'wind_direction_10m', 'wind_gusts_10m',
+    'soil_temperature_0cm', 'soil_moisture_0_to_1cm'
+]
+
+MEAN_SUFFIX = '_ensemble_mean'
+SPREAD_SUFFIX = '_ensemble_spread'
+
+
+def _ensemble_python(members: Sequence[List]) -> Tuple[List, List]:
+    """Per-hour mean and population standard deviation of one variable, ignoring nulls"""
+    means, spreads = [], []
+    for column in zip_longest(*members):
+        values = [value for value in column if value is not None]
+        if not values:
+            means.append(None)
+            spreads.append(None)
+            continue
+        mean = sum(values) / len(values)
+        variance = sum((value - mean) ** 2 for value in values) / len(values)
+        means.append(round(mean, 2))
+        spreads.append(round(variance ** 0.5, 2))
+    return means, spreads
+
+
+def _to_lists(matrix) -> List[List]:
+    """2-D float array to nested lists with NaN as None"""
+    if np.isnan(matrix).any():
+        return [[None if value != value else value for value in row] for row in matrix.tolist()]
+    return matrix.tolist()
+
+
+def _ensemble_numpy(groups: Sequence[Sequence[List]]) -> List[Tuple[List, List]]:
+    """`_ensemble_python` for all variables at once (variables × models × hours)"""
+    matrix = np.array(groups, dtype=float)  # nulls become NaN
+    valid = ~np.isnan(matrix)
+    count = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Hours where every model is null divide by zero and stay NaN
+        mean = np.where(valid, matrix, 0.0).sum(axis=1) / count
+        deviation = np.where(valid, matrix - mean[:, None, :], 0.0)
+        spread = np.sqrt((deviation * deviation).sum(axis=1) / count)
+    return list(zip(_to_lists(np.round(mean, 2)), _to_lists(np.round(spread, 2))))
+
+
+def ensemble_stats(groups: Sequence[Sequence[List]]) -> List[Tuple[List, List]]:
+    """Mean and spread series for each variable's list of per-model series"""
+    if np is not None:
+        try:
+            return _ensemble_numpy(groups)
+        except ValueError:
+            pass  # Models or variables with different lengths; handled one by one
+    return [_ensemble_python(members) for members in groups]
+
+
+class FieldNormalizer:
+    """Precompiled model-specific → generic field mapping"""
+
+    def __init__(self, variables: Sequence[str] = WEATHER_VARIABLES, models: Sequence[str] = (),
+                 keep_models: bool = False, ensemble: bool = False):
+        self.variables = list(variables)
+        self.models = list(models)
+        self.keep_models = keep_models
+        self.ensemble = ensemble
+        # field name -> (generic name, model rank); lower rank wins
+        self._lookup: Dict[str, Tuple[str, int]] = {
+            f'{variable}_{model}': (variable, rank)
+            for variable in self.variables
+            for rank, model in enumerate(self.models)
+        }
+
+    def normalize(self, data: Optional[Dict]) -> Optional[Dict]:
+        """Replace `data['hourly']` with normalized fields (in place; returns `data`)"""
+        if not data or 'hourly' not in data:
+            return data
+
+        hourly = data['hourly']
+        lookup = self._lookup
+        passthrough = {}
+        model_fields = {}
+        # generic name -> [(rank, series)] in arrival order
+        members: Dict[str, List[Tuple[int, List]]] = {}
+
+        for field, values in hourly.items():
+            entry = lookup.get(field)
+            if entry is None:
+                passthrough[field] = values
+                continue
+            variable, rank = entry
+            members.setdefault(variable, []).append((rank, values))
+            if self.keep_models:
+                model_fields[field] = values
+
+        normalized = {}
+        if 'time' in passthrough:
+            normalized['time'] = passthrough.pop('time')
+        for variable, series in members.items():
+            normalized[variable] = min(series, key=lambda member: member[0])[1]
+        # Plain fields never override a model field with the same generic name
+        for field, values in passthrough.items():
+            normalized.setdefault(field, values)
+        normalized.update(model_fields)
+
+        if self.ensemble:
+            variables, groups = [], []
+            for variable, series in members.items():
+                lists = [values for _, values in series if isinstance(values, list)]
+                if len(lists) > 1:
+                    variables.append(variable)
+                    groups.append(lists)
+            if groups:
+                for variable, (mean, spread) in zip(variables, ensemble_stats(groups)):
+                    normalized[variable + MEAN_SUFFIX] = mean
+                    normalized[variable + SPREAD_SUFFIX] = spread
+
+        data['hourly'] = normalized
+        return data
+
+
+# Global instance
+_normalizer: Optional[FieldNormalizer] = None
+
+
+def get_normalizer() -> FieldNormalizer:
+    """Get global field normalizer built from the configured models"""
+    global _normalizer
+    if _normalizer is None:
+        config = get_config()
+        _normalizer = FieldNormalizer(
+            WEATHER_VARIABLES,
+            config.FORECAST_MODELS,
+            keep_models=config.KEEP_MODEL_FIELDS,
+            ensemble=config.ENSEMBLE_STATS_ENABLED
+        )
+        if config.ENSEMBLE_STATS_ENABLED and np is None:
+            logger.info("numpy not installed; ensemble statistics use the pure Python path")
+    return _normalizer
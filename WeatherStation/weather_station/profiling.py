@@ -0,0 +1,263 @@
+"""
+Request Profiling
+=================
+Per-request phase timings reported in the `Server-Timing` header, and an
+opt-in sampling profiler that produces collapsed stacks (the input format of
+flamegraph.pl, speedscope and similar tools).
+
+Phases are recorded with `timed(name)` anywhere below a request; outside a
+request (background refreshes, the CLI updater) it does nothing.
+"""
+
+import sys
+import json
+import time
+import threading
+import functools
+from urllib.parse import parse_qs
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+# Phases in header order; others are appended as they occur
+PHASES = ('file_load', 'upstream_fetch', 'normalize', 'downsample', 'serialize')
+
+
+class ServerTiming:
+    """Accumulated durations of the phases of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def header(self) -> str:
+        """Render as a Server-Timing header value (durations in milliseconds)"""
+        with self._lock:
+            phases = dict(self.phases)
+        names = [phase for phase in PHASES if phase in phases]
+        names += [phase for phase in phases if phase not in PHASES]
+        entries = [f"{name};dur={phases[name] * 1000:.1f}" for name in names]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ', '.join(entries)
+
+
+_current_timing: ContextVar[Optional[ServerTiming]] = ContextVar('server_timing', default=None)
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the duration of the block to the current request's `phase`"""
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(phase, time.perf_counter() - start)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding a Server-Timing header to responses under `prefixes`"""
+
+    def __init__(self, app, prefixes=('/api/data/',)):
+        self.app = app
+        self.prefixes = tuple(prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        timing = ServerTiming()
+        token = _current_timing.set(timing)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', timing.header().encode('latin-1')))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_timing.reset(token)
+
+
+class SamplingProfiler:
+    """Samples the stacks of watched threads at a fixed interval and counts collapsed stacks
+
+    Each stack is prefixed with the label its thread was watched under (e.g.
+    `event_loop` or `handler`), so one profile covers the event loop,
+    middleware and serialization as well as the threadpool handler.
+    """
+
+    def __init__(self, interval: float = 0.002, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.duration = 0.0
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', code.co_filename)
+        return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+    def _collapse(self, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            names.append(self._frame_name(frame))
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _sample_once(self):
+        with self._lock:
+            threads = list(self._threads.items())
+        frames = sys._current_frames()
+        for thread_id, label in threads:
+            frame = frames.get(thread_id)
+            if frame is not None:
+                self.samples[f"{label};{self._collapse(frame)}"] += 1
+                self.sample_count += 1
+
+    def _run(self):
+        # The first sample is taken right away so short requests are not missed entirely
+        while True:
+            self._sample_once()
+            if self._stop.wait(self.interval):
+                break
+
+    @contextmanager
+    def watch(self, label: str, thread_id: Optional[int] = None):
+        """Include `thread_id` (the calling thread by default) in samples while the block runs"""
+        thread_id = thread_id or threading.get_ident()
+        with self._lock:
+            self._threads[thread_id] = label
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._threads.pop(thread_id, None)
+
+    @contextmanager
+    def running(self):
+        """Sample the watched threads until the block exits"""
+        thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        start = time.perf_counter()
+        thread.start()
+        try:
+            yield self
+        finally:
+            self._stop.set()
+            thread.join()
+            self.duration += time.perf_counter() - start
+
+    def collapsed(self) -> str:
+        """One "frame;frame;frame count" line per distinct stack, most frequent first"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+_current_profiler: ContextVar[Optional[SamplingProfiler]] = ContextVar('request_profiler', default=None)
+
+
+@contextmanager
+def profile_request(profiler: SamplingProfiler):
+    """Make `profiler` sample the `profiled` handler of the request run in this block"""
+    token = _current_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _current_profiler.reset(token)
+
+
+def profiled(handler):
+    """Add a sync route handler's worker thread to the request's samples when profiling was requested"""
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        profiler = _current_profiler.get()
+        if profiler is None:
+            return handler(*args, **kwargs)
+        with profiler.watch('handler'):
+            return handler(*args, **kwargs)
+
+    return wrapper
+
+
+class ProfilerMiddleware:
+    """ASGI middleware answering `?profile=1` requests with collapsed stacks
+
+    The request runs normally under the profiler, then its response body is
+    replaced by the samples. `authorize(scope)` must accept the request
+    (the admin API key) or a 401 is returned without running it.
+    """
+
+    def __init__(self, app, authorize: Callable[[Dict], bool], prefixes=('/api/data/',),
+                 interval: float = 0.002):
+        self.app = app
+        self.authorize = authorize
+        self.prefixes = tuple(prefixes)
+        self.interval = interval
+
+    def _requested(self, scope) -> bool:
+        query = scope.get('query_string', b'')
+        if scope['type'] != 'http' or b'profile=' not in query or not scope['path'].startswith(self.prefixes):
+            return False
+        return parse_qs(query.decode('latin-1')).get('profile') == ['1']
+
+    async def __call__(self, scope, receive, send):
+        if not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not self.authorize(scope):
+            body = json.dumps({
+                "error": "Unauthorized",
+                "message": "Valid API key required for profiling",
+                "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            }).encode()
+            await self._respond(send, 401, body, b'application/json')
+            return
+
+        profiler = SamplingProfiler(interval=self.interval)
+        status = [500]
+
+        async def discard(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+
+        # The event loop thread covers middleware, routing and response encoding
+        with profiler.watch('event_loop'), profiler.running(), profile_request(profiler):
+            await self.app(scope, receive, discard)
+
+        body = profiler.collapsed().encode()
+        if not profiler.sample_count:
+            body = (f"No samples collected: the request finished in {profiler.duration * 1000:.1f} ms, "
+                    f"before the first {self.interval * 1000:.1f} ms sample\n").encode()
+        await self._respond(send, 200, body, b'text/plain; charset=utf-8', [
+            (b'x-profile-samples', str(profiler.sample_count).encode()),
+            (b'x-profile-duration-ms', f"{profiler.duration * 1000:.1f}".encode()),
+            (b'x-profile-response-status', str(status[0]).encode())
+        ])
+
+    @staticmethod
+    async def _respond(send, status: int, body: bytes, content_type: bytes, headers=()):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode())] + list(headers)
+        })
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,219 @@
+"""
+Data Quality Control
+====================
+Per-city QC reports computed once at ingest: null ratio, physical range
+violations, hour-to-hour spikes and flat-lines (a stuck sensor or model
+field) for every checked variable, each rolled into a 0–1 quality score.
+
+With numpy installed all variables of a city are checked in one vectorized
+pass over a (variables × hours) array; otherwise a pure Python pass is used.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+# variable -> (minimum, maximum, largest plausible hourly change, flat-lines are suspicious)
+VARIABLE_LIMITS = {
+    'temperature_2m': (-90.0, 60.0, 10.0, True),
+    'relative_humidity_2m': (0.0, 100.0, 60.0, True),
+    'dew_point_2m': (-90.0, 40.0, 10.0, True),
+    'apparent_temperature': (-100.0, 70.0, 15.0, True),
+    'precipitation_probability': (0.0, 100.0, None, False),
+    'precipitation': (0.0, 500.0, None, False),
+    'rain': (0.0, 500.0, None, False),
+    'showers': (0.0, 500.0, None, False),
+    'snowfall': (0.0, 100.0, None, False),
+    'snow_depth': (0.0, 20.0, None, False),
+    'pressure_msl': (870.0, 1085.0, 10.0, True),
+    'surface_pressure': (500.0, 1085.0, 10.0, True),
+    'cloud_cover': (0.0, 100.0, None, False),
+    'visibility': (0.0, 1000000.0, None, False),
+    'uv_index': (0.0, 20.0, None, False),
+    'wind_speed_10m': (0.0, 400.0, 80.0, False),
+    'wind_direction_10m': (0.0, 360.0, None, False),
+    'wind_gusts_10m': (0.0, 500.0, None, False),
+    'soil_temperature_0cm': (-90.0, 80.0, 15.0, True),
+    'soil_moisture_0_to_1cm': (0.0, 1.0, None, False),
+}
+
+# A city is usable when at least one of these is more than 25% non-null
+KEY_VARIABLES = ('temperature_2m', 'pressure_msl', 'relative_humidity_2m', 'wind_speed_10m')
+MAX_KEY_NULL_RATIO = 0.75
+
+# Identical consecutive values for this many hours count as a flat-line
+FLATLINE_HOURS = 24
+
+# Variables with more nulls than this are flagged
+NULL_FLAG_RATIO = 0.25
+
+# Cities scoring below this are counted as flagged in summaries
+FLAG_SCORE = 0.9
+
+
+def _variable_report(hours: int, nulls: int, out_of_range: int, spikes: int, flatline: int,
+                     flatline_checked: bool) -> Dict:
+    null_ratio = nulls / hours if hours else 1.0
+    present = hours - nulls
+    range_ratio = out_of_range / present if present else 0.0
+    spike_ratio = spikes / max(present - 1, 1)
+    flatlined = flatline_checked and flatline >= FLATLINE_HOURS
+
+    flags = []
+    if null_ratio > NULL_FLAG_RATIO:
+        flags.append('nulls')
+    if out_of_range:
+        flags.append('out_of_range')
+    if spikes:
+        flags.append('spikes')
+    if flatlined:
+        flags.append('flatline')
+
+    penalty = null_ratio + range_ratio + spike_ratio + (flatline / hours if flatlined else 0.0)
+    return {
+        'score': round(max(0.0, 1.0 - penalty), 3),
+        'null_ratio': round(null_ratio, 3),
+        'out_of_range': out_of_range,
+        'spikes': spikes,
+        'flatline_hours': flatline,
+        'flags': flags
+    }
+
+
+def _check_python(values: List, limits) -> Dict:
+    """QC counts for one variable"""
+    low, high, step, flatline_checked = limits
+    nulls = out_of_range = spikes = 0
+    run = longest = 0
+    previous = None
+    for value in values:
+        if value is None or isinstance(value, bool) or not isinstance(value, (int, float)):
+            nulls += 1
+            previous = None
+            run = 0
+            continue
+        if value < low or value > high:
+            out_of_range += 1
+        if previous is not None:
+            if step is not None and abs(value - previous) > step:
+                spikes += 1
+            if value == previous:
+                run += 1
+                longest = max(longest, run)
+            else:
+                run = 0
+        previous = value
+    return _variable_report(len(values), nulls, out_of_range, spikes,
+                            longest + 1 if longest else 0, flatline_checked)
+
+
+def _check_numpy(series: Sequence[List], limits: Sequence) -> List[Dict]:
+    """QC counts for all variables at once; series must have equal lengths"""
+    matrix = np.array(series, dtype=float)  # nulls become NaN
+    hours = matrix.shape[1]
+    low = np.array([limit[0] for limit in limits])[:, None]
+    high = np.array([limit[1] for limit in limits])[:, None]
+    step = np.array([np.nan if limit[2] is None else limit[2] for limit in limits])[:, None]
+
+    nulls = np.isnan(matrix).sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        # Comparisons with NaN are False, so nulls never count as violations
+        out_of_range = ((matrix < low) | (matrix > high)).sum(axis=1)
+        delta = np.diff(matrix, axis=1)
+        spikes = (np.abs(delta) > step).sum(axis=1)
+        # Longest run of unchanged consecutive values per variable
+        same = delta == 0
+    if hours > 1:
+        runs = np.cumsum(same, axis=1)
+        runs -= np.maximum.accumulate(np.where(same, 0, runs), axis=1)
+        longest = runs.max(axis=1)
+    else:
+        longest = np.zeros(len(series), dtype=int)
+
+    return [
+        _variable_report(hours, int(nulls[i]), int(out_of_range[i]), int(spikes[i]),
+                         int(longest[i]) + 1 if longest[i] else 0, limits[i][3])
+        for i in range(len(series))
+    ]
+
+
+def check_city(city_data: Optional[Dict]) -> Optional[Dict]:
+    """QC report for one city's hourly data, or None without hourly data"""
+    if not city_data or 'hourly' not in city_data:
+        return None
+
+    hourly = city_data['hourly']
+    names = [name for name in VARIABLE_LIMITS if isinstance(hourly.get(name), list)]
+    series = [hourly[name] for name in names]
+    limits = [VARIABLE_LIMITS[name] for name in names]
+
+    reports = None
+    if np is not None and series and len({len(values) for values in series}) == 1 and series[0]:
+        try:
+            reports = _check_numpy(series, limits)
+        except (TypeError, ValueError):
+            reports = None  # Non-numeric values; checked one by one below
+    if reports is None:
+        reports = [_check_python(values, limit) for values, limit in zip(series, limits)]
+
+    variables = dict(zip(names, reports))
+    valid = any(
+        name in variables and variables[name]['null_ratio'] < MAX_KEY_NULL_RATIO
+        for name in KEY_VARIABLES
+    )
+    scores = [report['score'] for report in reports]
+    return {
+        'score': round(sum(scores) / len(scores), 3) if scores else 0.0,
+        'valid': valid,
+        'hours': len(hourly.get('time') or []),
+        'flags': sorted({f"{name}:{flag}" for name, report in variables.items() for flag in report['flags']}),
+        'variables': variables
+    }
+
+
+def compute_quality(data: Dict) -> Dict[str, Dict]:
+    """QC reports for every city in a dataset"""
+    reports = {}
+    for city, city_data in data.items():
+        report = check_city(city_data)
+        if report is not None:
+            reports[city] = report
+    return reports
+
+
+def summarize_quality(reports: Dict[str, Dict]) -> Dict:
+    """Dataset-wide counts: cities, mean score, flagged cities and flag occurrences"""
+    flag_counts: Dict[str, int] = {}
+    for report in reports.values():
+        for variable_report in report['variables'].values():
+            for flag in variable_report['flags']:
+                flag_counts[flag] = flag_counts.get(flag, 0) + 1
+
+    scores = [report['score'] for report in reports.values()]
+    return {
+        'cities': len(reports),
+        'mean_score': round(sum(scores) / len(scores), 3) if scores else None,
+        'flagged_cities': sum(1 for score in scores if score < FLAG_SCORE),
+        'invalid_cities': sum(1 for report in reports.values() if not report['valid']),
+        'flag_counts': flag_counts
+    }
+
+
+def select_quality(reports: Dict[str, Dict], city: Optional[str] = None, variable: Optional[str] = None,
+                   max_score: Optional[float] = None) -> Dict[str, Dict]:
+    """Filter QC reports by city, variable and score (cities scoring at most `max_score`)"""
+    selected = {}
+    for name, report in reports.items():
+        if city and name != city:
+            continue
+        if max_score is not None and report['score'] > max_score:
+            continue
+        if variable:
+            if variable not in report['variables']:
+                continue
+            report = dict(report, variables={variable: report['variables'][variable]})
+        selected[name] = report
+    return selected
@@ -0,0 +1,126 @@
+"""
+Weather Data Rollups
+====================
+Daily and weekly aggregates of the hourly weather arrays, computed once at
+ingest so that charts can look them up instead of rescanning raw hours.
+"""
+
+from datetime import date
+from typing import Dict, List, Optional
+
+# Variables whose period total is meaningful (accumulated amounts)
+SUM_VARIABLES = {'precipitation', 'rain', 'showers', 'snowfall'}
+
+ROLLUP_PERIODS = ('daily', 'weekly')
+
+
+def _period_keys(times: List[str]) -> Dict[str, List[str]]:
+    """Map every hourly timestamp to its daily and ISO-week bucket key"""
+    daily_keys = []
+    weekly_keys = []
+    week_for_day = {}
+
+    for timestamp in times:
+        day = str(timestamp)[:10]
+        week = week_for_day.get(day)
+        if week is None:
+            try:
+                iso_year, iso_week, _ = date.fromisoformat(day).isocalendar()
+                week = f"{iso_year}-W{iso_week:02d}"
+            except ValueError:
+                week = day
+            week_for_day[day] = week
+        daily_keys.append(day)
+        weekly_keys.append(week)
+
+    return {'daily': daily_keys, 'weekly': weekly_keys}
+
+
+def _aggregate(keys: List[str], values: List, include_sum: bool) -> Dict[str, Dict]:
+    """Aggregate one variable into buckets in a single pass"""
+    buckets: Dict[str, Dict] = {}
+
+    for key, value in zip(keys, values):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = {'min': None, 'max': None, 'total': 0.0, 'count': 0, 'samples': 0}
+            buckets[key] = bucket
+        bucket['samples'] += 1
+
+        if value is None or isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+
+        bucket['count'] += 1
+        bucket['total'] += value
+        if bucket['min'] is None or value < bucket['min']:
+            bucket['min'] = value
+        if bucket['max'] is None or value > bucket['max']:
+            bucket['max'] = value
+
+    result = {}
+    for key, bucket in buckets.items():
+        count = bucket['count']
+        entry = {
+            'min': bucket['min'],
+            'max': bucket['max'],
+            'mean': round(bucket['total'] / count, 3) if count else None,
+            'count': count,
+            'samples': bucket['samples']
+        }
+        if include_sum:
+            entry['sum'] = round(bucket['total'], 3) if count else None
+        result[key] = entry
+
+    return result
+
+
+def compute_city_rollups(city_data: Dict) -> Optional[Dict]:
+    """Compute daily and weekly rollups for every hourly variable of one city"""
+    if not city_data or 'hourly' not in city_data:
+        return None
+
+    hourly = city_data['hourly']
+    times = hourly.get('time')
+    if not isinstance(times, list) or not times:
+        return None
+
+    period_keys = _period_keys(times)
+    rollups = {period: {} for period in ROLLUP_PERIODS}
+
+    for variable, values in hourly.items():
+        if variable == 'time' or not isinstance(values, list):
+            continue
+        include_sum = variable in SUM_VARIABLES
+        for period in ROLLUP_PERIODS:
+            rollups[period][variable] = _aggregate(period_keys[period], values, include_sum)
+
+    return rollups
+
+
+def compute_rollups(data: Dict) -> Dict[str, Dict]:
+    """Compute rollups for every city in a dataset"""
+    result = {}
+    for city, city_data in data.items():
+        city_rollups = compute_city_rollups(city_data)
+        if city_rollups is not None:
+            result[city] = city_rollups
+    return result
+
+
+def select_rollups(rollups: Dict[str, Dict], city: Optional[str] = None,
+                   period: Optional[str] = None, variable: Optional[str] = None) -> Dict[str, Dict]:
+    """Filter a rollup table by city, period and variable"""
+    cities = {city: rollups[city]} if city else rollups
+    periods = [period] if period else list(ROLLUP_PERIODS)
+
+    result = {}
+    for name, city_rollups in cities.items():
+        selected = {}
+        for period_name in periods:
+            period_data = city_rollups.get(period_name, {})
+            if variable:
+                selected[period_name] = {variable: period_data[variable]} if variable in period_data else {}
+            else:
+                selected[period_name] = period_data
+        result[name] = selected
+    return result
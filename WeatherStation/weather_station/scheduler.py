@@ -0,0 +1,214 @@
+"""
+Refresh Scheduler
+=================
+Aligns data file refreshes with upstream model runs. The global models
+behind Open-Meteo run at fixed UTC hours (00/06/12/18Z) and their output is
+served some time later (`MODEL_RUN_LAG_MINUTES`); refreshing more often only
+fetches the same run again, refreshing on a fixed weekly timer serves runs
+that are days old.
+
+Not every city needs every run. A city requested since its last refresh is
+due as soon as a newer run is available; a city nobody asked for is only due
+once `REFRESH_IDLE_HOURS` of runs have passed since the run it was fetched
+for (daily by default), so upstream cost grows with demand rather than with
+the number of runs. Due cities are refreshed in `REFRESH_BATCHES` batches
+spread evenly over `REFRESH_WINDOW_MINUTES`, most-requested first and then
+longest-unrefreshed first, so the upstream sees a steady trickle instead of
+one burst per run.
+"""
+
+import math
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+# Cities failing this often are left alone until the next model run
+MAX_ATTEMPTS_PER_RUN = 2
+
+_NEVER = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _iso(moment: Optional[datetime]) -> Optional[str]:
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ') if moment else None
+
+
+class RefreshScheduler:
+    """Decides which cities to refresh when, from model run times, staleness and demand"""
+
+    def __init__(self, run_hours: Sequence[int] = (0, 6, 12, 18), lag_minutes: float = 240,
+                 window_minutes: float = 60, batches: int = 6, idle_hours: float = 24):
+        self.run_hours = sorted(set(run_hours))
+        self.lag = timedelta(minutes=lag_minutes)
+        self.idle_interval = timedelta(hours=idle_hours)
+        self.window = timedelta(minutes=window_minutes)
+        self.batches = max(1, batches)
+        self._lock = threading.Lock()
+        self._refreshed: Dict[str, datetime] = {}  # city -> when its data was last fetched
+        self._requests: Dict[str, int] = {}  # city -> requests since its last refresh
+        self._failures: Dict[str, int] = {}  # city -> failed attempts for the current run
+        self._run: Optional[datetime] = None
+        self._next_batch_at: Optional[datetime] = None
+        self._pending: List[str] = []
+        self.active = False
+        self.last_batch: Optional[Dict] = None
+
+    def _runs(self, now: datetime, days: Iterable[int]) -> List[datetime]:
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return [midnight + timedelta(days=day, hours=hour) for day in days for hour in self.run_hours]
+
+    def latest_run(self, now: datetime) -> datetime:
+        """Most recent model run that is already available at `now`"""
+        return max(run for run in self._runs(now, (-2, -1, 0)) if run + self.lag <= now)
+
+    def next_run(self, now: datetime) -> datetime:
+        """First model run that becomes available after `now`"""
+        return min(run for run in self._runs(now, (-1, 0, 1)) if run + self.lag > now)
+
+    def record_request(self, city: str) -> None:
+        """Count a request for a city's data; demand moves it up the refresh order"""
+        self.record_requests((city,))
+
+    def record_requests(self, cities: Iterable[str]) -> None:
+        """Count one request for each of several cities (e.g. one multi-city response)"""
+        with self._lock:
+            for city in cities:
+                self._requests[city] = self._requests.get(city, 0) + 1
+
+    def seed(self, cities: Iterable[str], refreshed_at: datetime) -> None:
+        """Mark cities as fetched at `refreshed_at` (e.g. the data file's mtime) unless known"""
+        with self._lock:
+            for city in cities:
+                self._refreshed.setdefault(city, refreshed_at)
+
+    def record_result(self, batch: Sequence[str], refreshed: Iterable[str], now: datetime) -> None:
+        """Record which cities of a batch were refreshed; the others count as failed attempts"""
+        refreshed = set(refreshed)
+        with self._lock:
+            for city in batch:
+                if city in refreshed:
+                    self._refreshed[city] = now
+                    self._requests.pop(city, None)
+                    self._failures.pop(city, None)
+                else:
+                    self._failures[city] = self._failures.get(city, 0) + 1
+            self.last_batch = {
+                'timestamp': _iso(now),
+                'cities': len(batch),
+                'refreshed': len(refreshed),
+                'failed': len(batch) - len(refreshed & set(batch))
+            }
+
+    def _due(self, cities: Iterable[str], run: datetime) -> List[str]:
+        """Cities that need `run`, in refresh order
+
+        A city is due when it was fetched for an older run and either was
+        requested since, or the run it was fetched for is at least the idle
+        interval older than `run`.
+        """
+        due = []
+        for city in cities:
+            if self._failures.get(city, 0) >= MAX_ATTEMPTS_PER_RUN:
+                continue
+            refreshed = self._refreshed.get(city)
+            if refreshed is None:
+                due.append(city)
+                continue
+            fetched_run = self.latest_run(refreshed)
+            if fetched_run < run and (self._requests.get(city) or run - fetched_run >= self.idle_interval):
+                due.append(city)
+        due.sort(key=lambda city: (-self._requests.get(city, 0), self._refreshed.get(city, _NEVER)))
+        return due
+
+    def plan(self, cities: Iterable[str], now: datetime) -> Tuple[List[str], float]:
+        """The batch to refresh now (possibly empty) and seconds until `plan` should be called again"""
+        with self._lock:
+            self.active = True
+            run = self.latest_run(now)
+            window_start = run + self.lag
+            if run != self._run:
+                self._run = run
+                self._failures.clear()
+                self._next_batch_at = window_start
+
+            self._pending = self._due(cities, run)
+            if not self._pending:
+                # Cities requested later in this run are picked up on the next call
+                self._next_batch_at = None
+                return [], (self.next_run(now) + self.lag - now).total_seconds()
+            if self._next_batch_at is not None and now < self._next_batch_at:
+                return [], (self._next_batch_at - now).total_seconds()
+
+            # Split what is left evenly over the slots left in the window; late starts catch up
+            slot = self.window / self.batches
+            elapsed_slots = int((now - window_start) / slot)
+            remaining_slots = max(1, self.batches - elapsed_slots)
+            size = math.ceil(len(self._pending) / remaining_slots)
+            batch = self._pending[:size]
+
+            if elapsed_slots + 1 < self.batches:
+                self._next_batch_at = window_start + slot * (elapsed_slots + 1)
+            else:
+                # Past the window: only retries of failed cities are left, paced by one slot
+                self._next_batch_at = now + slot
+            return batch, 0.0
+
+    def next_refresh(self, now: Optional[datetime] = None) -> Tuple[datetime, int]:
+        """When the next refresh batch is expected and how many cities are waiting for one"""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            return self._next_refresh_at(now), len(self._pending)
+
+    def _next_refresh_at(self, now: datetime) -> datetime:
+        if not self._pending:
+            return self.next_run(now) + self.lag
+        return max(now, self._next_batch_at or now)
+
+    def get_status(self, now: Optional[datetime] = None) -> Dict:
+        """Model run timing, the next batch and the pending refresh order"""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            latest = self.latest_run(now)
+            upcoming = self.next_run(now)
+            by_demand = sorted(self._requests.items(), key=lambda item: -item[1])[:10]
+            return {
+                'active': self.active,
+                'model_run_hours_utc': self.run_hours,
+                'lag_minutes': self.lag.total_seconds() / 60,
+                'window_minutes': self.window.total_seconds() / 60,
+                'batches': self.batches,
+                'idle_refresh_hours': self.idle_interval.total_seconds() / 3600,
+                'current_run': _iso(latest),
+                'current_run_available_at': _iso(latest + self.lag),
+                'next_run': _iso(upcoming),
+                'next_run_available_at': _iso(upcoming + self.lag),
+                'next_batch_at': _iso(self._next_refresh_at(now)) if self.active else None,
+                'pending_cities': len(self._pending),
+                'next_cities': self._pending[:10],
+                'most_requested': dict(by_demand),
+                'tracked_cities': len(self._refreshed),
+                'last_batch': self.last_batch
+            }
+
+
+# Global instance
+_scheduler: Optional[RefreshScheduler] = None
+
+
+def get_refresh_scheduler() -> RefreshScheduler:
+    """Get global refresh scheduler built from configuration"""
+    global _scheduler
+    if _scheduler is None:
+        config = get_config()
+        _scheduler = RefreshScheduler(
+            config.MODEL_RUN_HOURS,
+            lag_minutes=config.MODEL_RUN_LAG_MINUTES,
+            window_minutes=config.REFRESH_WINDOW_MINUTES,
+            batches=config.REFRESH_BATCHES,
+            idle_hours=config.REFRESH_IDLE_HOURS
+        )
+    return _scheduler
@@ -0,0 +1,136 @@
+"""
+JSON Serialization
+==================
+Pluggable JSON layer used for API responses, dataset files and upstream
+responses. Uses orjson when it is installed and falls back to the standard
+library otherwise.
+
+This module only depends on the standard library (plus optional orjson) so
+the standalone CLI updater can import it as well.
+"""
+
+import json
+import math
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # Optional dependency
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _default(value: Any) -> str:
+    """Serialize unknown types (datetimes, paths, ...) as strings"""
+    return str(value)
+
+
+def _finite(value: Any) -> Any:
+    """Copy of `value` with NaN and infinities replaced by None, as orjson writes them"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize an object to UTF-8 JSON bytes; non-finite floats become null"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+
+    if indent:
+        options = {'indent': 2}
+    else:
+        options = {'separators': (',', ':')}
+    try:
+        text = json.dumps(obj, ensure_ascii=False, allow_nan=False, default=_default, **options)
+    except ValueError:
+        # NaN/Infinity are not JSON; only pay for the copy when the data holds them
+        text = json.dumps(_finite(obj), ensure_ascii=False, allow_nan=False, default=_default, **options)
+    return text.encode('utf-8')
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Parse JSON from bytes or text"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode('utf-8')
+    return json.loads(data)
+
+
+def load_file(path: Union[str, os.PathLike]) -> Any:
+    """Read and parse a JSON file"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def dump_file(obj: Any, path: Union[str, os.PathLike], indent: bool = False) -> None:
+    """Serialize an object to a JSON file"""
+    with open(path, 'wb') as f:
+        f.write(dumps(obj, indent=indent))
+
+
+def _object_lines(members: Iterable[Tuple[str, bytes]]) -> Iterable[bytes]:
+    """Chunks of a JSON object with one `"key":value` member per line"""
+    separator = b'{\n'
+    for key, value in members:
+        yield separator + dumps(key) + b':' + value
+        separator = b',\n'
+    yield b'{\n}\n' if separator == b'{\n' else b'\n}\n'
+
+
+def dump_object_lines(members: Iterable[Tuple[str, bytes]], path: Union[str, os.PathLike]) -> None:
+    """Write a JSON object with one `"key":value` member per line from pre-serialized values
+
+    The file is ordinary JSON; the layout lets `index_object_lines` find
+    single members without parsing the rest.
+    """
+    with open(path, 'wb') as f:
+        f.writelines(_object_lines(members))
+
+
+def dumps_object_lines(members: Iterable[Tuple[str, bytes]]) -> bytes:
+    """In-memory counterpart of `dump_object_lines`"""
+    return b''.join(_object_lines(members))
+
+
+def index_object_lines(buffer) -> Optional[Dict[str, Tuple[int, int]]]:
+    """Byte ranges of the member values in a `dump_object_lines` layout; None for any other layout
+
+    `buffer` is any bytes-like object with `find` (bytes or an mmap); only
+    the start of each line is copied to decode its key.
+    """
+    size = len(buffer)
+    if buffer[:2] != b'{\n':
+        return None
+    members = {}
+    start = 2
+    while start < size:
+        end = buffer.find(b'\n', start)
+        if end < 0:
+            return None
+        if end == start + 1 and buffer[start:end] == b'}':
+            return members if end + 1 == size else None
+        if buffer[start:start + 1] != b'"':
+            return None
+        # Keys are short; only the start of the line is decoded to find where the key ends
+        head = bytes(buffer[start:min(end, start + 1024)]).decode('utf-8', 'ignore')
+        try:
+            key, key_end = json.decoder.scanstring(head, 1)
+        except ValueError:
+            return None
+        if head[key_end:key_end + 1] != ':':
+            return None
+        value_end = end - 1 if buffer[end - 1:end] == b',' else end
+        members[key] = (start + len(head[:key_end + 1].encode('utf-8')), value_end)
+        start = end + 1
+    return None
@@ -0,0 +1,203 @@
+"""
+Tiered Data Reader
+==================
+Read path for the hybrid data mode: a city is served from the hot in-memory
+cache, then from the last on-disk snapshot, and only then from the upstream
+API. Stale copies are served immediately while a background refresh
+revalidates them, so latency stays predictable during upstream outages.
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from .config import get_config
+from .admission import UpstreamOverloaded
+from .data_manager import get_data_manager
+from .live_data_manager import get_live_data_manager
+
+logger = logging.getLogger(__name__)
+
+TIER_MEMORY = 'memory'
+TIER_SNAPSHOT = 'snapshot'
+TIER_UPSTREAM = 'upstream'
+TIERS = (TIER_MEMORY, TIER_SNAPSHOT, TIER_UPSTREAM)
+
+# Cities refreshed per background job, so large refreshes spread over the workers
+REFRESH_BATCH_SIZE = 25
+
+
+def summarize_tiers(tiers: Dict[str, str]) -> str:
+    """Collapse per-city tiers into one X-Data-Tier header value"""
+    values = set(tiers.values())
+    if not values:
+        return 'none'
+    if len(values) == 1:
+        return values.pop()
+    return 'mixed'
+
+
+class TieredReader:
+    """Serves cities from memory → snapshot → upstream with background revalidation"""
+
+    def __init__(self, live_manager=None, data_manager=None):
+        self.config = get_config()
+        self.live = live_manager or get_live_data_manager()
+        self.files = data_manager or get_data_manager()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.config.HYBRID_REFRESH_WORKERS,
+            thread_name_prefix='tier-refresh'
+        )
+        self._lock = threading.Lock()
+        self._in_flight: Set[str] = set()
+        self._last_attempt: Dict[str, float] = {}
+        self.served = dict.fromkeys(TIERS, 0)
+        self.refreshed = 0
+        self.refresh_failures = 0
+
+    def get_city(self, city: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """Get one city's data and the tier that served it (None, None if unavailable)"""
+        locations = self.live.load_locations()
+        if city not in locations:
+            return None, None
+
+        data, tiers = self.get_cities({city: locations[city]})
+        return data.get(city), tiers.get(city)
+
+    def get_cities(self, locations: Dict, limit: int = 0) -> Tuple[Dict, Dict[str, str]]:
+        """Get data for several cities and the tier that served each one"""
+        selected = dict(list(locations.items())[:limit]) if limit else locations
+        cached = self.live.cache.get_many(f"live:{city}" for city in selected)
+        snapshot = self.files.load_weather_data() or {}
+
+        found = {}
+        tiers = {}
+        stale = []
+        missing = []
+        for city in selected:
+            data = cached.get(f"live:{city}")
+            if data is not None:
+                self.live._track_city_data(city, data)
+                found[city] = data
+                tiers[city] = TIER_MEMORY
+                if not self.live._is_fresh(data):
+                    stale.append(city)
+            elif city in snapshot:
+                found[city] = snapshot[city]
+                tiers[city] = TIER_SNAPSHOT
+                stale.append(city)
+            else:
+                missing.append(city)
+
+        # Only cities with no copy at all wait for the upstream API
+        index = 0
+        try:
+            with self.live.upstream_budget.deadline():
+                for index, city in enumerate(missing):
+                    data = self.live._refresh_city_data(city, selected[city])
+                    if data is not None:
+                        found[city] = data
+                        tiers[city] = TIER_UPSTREAM
+        except UpstreamOverloaded as e:
+            # Nothing to serve: let the caller shed the request
+            if not found:
+                raise
+            # Serve what we have; the cities not fetched yet follow in the background
+            logger.info(f"Serving {len(found)} cities without {len(missing) - index} unfetched ones: {e}")
+            stale += missing[index:]
+        finally:
+            if missing:
+                self.live._flush_changes(force=False)
+
+        self.schedule_refresh(stale, selected)
+
+        with self._lock:
+            for tier in tiers.values():
+                self.served[tier] += 1
+
+        # Keep the requested city order
+        result = {city: found[city] for city in selected if city in found}
+        return result, tiers
+
+    def schedule_refresh(self, cities: List[str], locations: Dict) -> int:
+        """Revalidate cities in the background; returns how many refreshes were queued
+
+        Cities already being refreshed, or attempted within HYBRID_RETRY_INTERVAL,
+        are skipped so an upstream outage doesn't pile up refresh jobs.
+        """
+        now = time.time()
+        with self._lock:
+            due = [
+                city for city in cities
+                if city not in self._in_flight
+                and now - self._last_attempt.get(city, 0) >= self.config.HYBRID_RETRY_INTERVAL
+            ]
+            self._in_flight.update(due)
+            for city in due:
+                self._last_attempt[city] = now
+
+        for start in range(0, len(due), REFRESH_BATCH_SIZE):
+            batch = due[start:start + REFRESH_BATCH_SIZE]
+            try:
+                self._executor.submit(self._refresh, {city: locations[city] for city in batch})
+            except RuntimeError:
+                # Executor shut down
+                with self._lock:
+                    self._in_flight.difference_update(batch)
+        return len(due)
+
+    def _refresh(self, batch: Dict):
+        """Fetch a batch of cities upstream and record them as one dataset version"""
+        try:
+            snapshot = self.files.load_weather_data() or {}
+            with self.live.upstream_budget.deadline():
+                for city, coordinates in batch.items():
+                    # Diff against the snapshot clients were served, not an empty history
+                    if city in snapshot:
+                        self.live.seed_baseline(city, snapshot[city])
+
+                    if self.live._refresh_city_data(city, coordinates) is None:
+                        self.refresh_failures += 1
+                    else:
+                        self.refreshed += 1
+
+            self.live._flush_changes()
+        except UpstreamOverloaded as e:
+            # Request traffic has priority; the cities stay stale until the next attempt
+            logger.info(f"Background refresh deferred: {e}")
+            self.live._flush_changes()
+        except Exception as e:
+            logger.error(f"Error refreshing cities in the background: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.difference_update(batch)
+
+    def get_status(self) -> Dict:
+        """Get tier usage and background refresh statistics"""
+        with self._lock:
+            return {
+                'served': dict(self.served),
+                'refreshing': len(self._in_flight),
+                'refreshed': self.refreshed,
+                'refresh_failures': self.refresh_failures,
+                'fresh_for_seconds': self.config.LIVE_CACHE_TTL,
+                'max_stale_seconds': self.config.LIVE_CACHE_MAX_STALE
+            }
+
+    def shutdown(self):
+        """Stop accepting background refreshes"""
+        self._executor.shutdown(wait=False)
+
+
+# Global instance
+_tiered_reader: Optional[TieredReader] = None
+
+
+def get_tiered_reader() -> TieredReader:
+    """Get global tiered reader instance"""
+    global _tiered_reader
+    if _tiered_reader is None:
+        _tiered_reader = TieredReader()
+    return _tiered_reader
@@ -2,17 +2,43 @@
 """
 Weather Data Updater v2.0
 Enhanced weather data fetcher with self-hosted Open-Meteo support
+
+Large backfills can run in parallel and be split across machines:
+    update_weather_information.py --concurrency 8 --rate 5 --shard 0/4 --output output_data.0.json
+    update_weather_information.py merge output_data.*.json --output output_data.json
+An interrupted run continues where it stopped with --resume.
+
+History beyond the forecast endpoint's past_days comes from the archive API:
+    update_weather_information.py backfill --start 2020-01-01 --end 2024-12-31 --history-dir history
 """
 
 import requests
 import json
 import time
 import os
+import sys
+import zlib
 import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import date, timedelta
 from urllib.parse import quote
 from typing import Dict, List, Tuple, Optional
 import logging
 
+try:
+    from ..serialization import dump_file, dump_object_lines, dumps, load_file, loads
+    from ..circuit_breaker import OPEN, CircuitBreaker, CircuitOpenError
+    from ..quality import check_city
+    from ..history_store import HistoryStore
+except ImportError:
+    # Running as a standalone script: import shared modules from the weather_station package directory
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from serialization import dump_file, dump_object_lines, dumps, load_file, loads
+    from circuit_breaker import OPEN, CircuitBreaker, CircuitOpenError
+    from quality import check_city
+    from history_store import HistoryStore
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -20,18 +46,112 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Hourly variables available from the ERA5-based archive endpoint
+ARCHIVE_PARAMS = [
+    'temperature_2m', 'relative_humidity_2m', 'dew_point_2m',
+    'apparent_temperature', 'precipitation', 'rain', 'snowfall', 'snow_depth',
+    'pressure_msl', 'surface_pressure', 'cloud_cover',
+    'wind_speed_10m', 'wind_direction_10m', 'wind_gusts_10m'
+]
+
+# The archive is complete up to about this many days before today
+ARCHIVE_DELAY_DAYS = 5
+
+class RateLimiter:
+    """Token bucket shared by all worker threads (rate <= 0 disables limiting)"""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a request may be sent"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def date_chunks(start: date, end: date, days: int) -> List[Tuple[date, date]]:
+    """Split an inclusive date range into consecutive ranges of at most `days` days"""
+    chunks = []
+    while start <= end:
+        chunk_end = min(end, start + timedelta(days=days - 1))
+        chunks.append((start, chunk_end))
+        start = chunk_end + timedelta(days=1)
+    return chunks
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse an "i/n" shard spec (0 <= i < n)"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}' (expected i/n, e.g. 0/4)")
+    if count < 1 or not (0 <= index < count):
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}' (need 0 <= i < n)")
+    return index, count
+
+def select_shard(locations: Dict, index: int, count: int) -> Dict:
+    """Cities of shard `index` out of `count`; stable across runs and machines"""
+    return {
+        city: coordinates for city, coordinates in locations.items()
+        if zlib.crc32(city.encode('utf-8')) % count == index
+    }
+
+def save_output(data: Dict, output_file: str, indent: bool = True) -> None:
+    """Write a dataset indented, or compact with one city per line (the server maps that layout)"""
+    if indent:
+        dump_file(data, output_file, indent=True)
+    else:
+        dump_object_lines(((city, dumps(city_data)) for city, city_data in data.items()), output_file)
+
+def merge_outputs(input_files: List[str], output_file: str, indent: bool = True) -> Dict:
+    """Combine shard output files into one dataset (later files win on duplicates)"""
+    merged = {}
+    for path in input_files:
+        try:
+            data = load_file(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Cannot read shard output {path}: {e}")
+            return {}
+        duplicates = merged.keys() & data.keys()
+        if duplicates:
+            logger.warning(f"{len(duplicates)} cities in {path} were already merged; using the newer data")
+        merged.update(data)
+        logger.info(f"✓ Merged {len(data)} locations from {path}")
+    
+    if merged:
+        save_output(merged, output_file, indent)
+        logger.info(f"✓ Saved {len(merged)} merged locations to {output_file}")
+    return merged
+
 class WeatherDataUpdater:
     """Enhanced weather data updater with multiple API source support"""
     
     def __init__(self, api_base_url: str = "https://api.open-meteo.com", 
-                 retry_delay: int = 5, max_retries: int = 3):
+                 retry_delay: int = 5, max_retries: int = 3,
+                 archive_base_url: str = "https://archive-api.open-meteo.com"):
         self.api_base_url = api_base_url.rstrip('/')
+        self.archive_base_url = archive_base_url.rstrip('/')
         self.retry_delay = retry_delay
         self.max_retries = max_retries
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'WeatherStation/2.0 (Enhanced Data Fetcher)'
-        })
+        # requests.Session is not thread-safe; each worker thread gets its own
+        self._local = threading.local()
+        # Stop hammering an upstream that keeps failing; timeouts follow its p95 latency
+        self.breaker = CircuitBreaker(self.api_base_url, min_calls=5, open_seconds=60)
+        # Month-long archive responses are legitimately slow; only errors should open this one
+        self.archive_breaker = CircuitBreaker(self.archive_base_url, min_calls=5, open_seconds=60,
+                                              slow_call_seconds=60)
         
         # Weather parameters to fetch
         self.weather_params = [
@@ -43,13 +163,23 @@ class WeatherDataUpdater:
             'soil_moisture_0_to_1cm'
         ]
         
+    @property
+    def session(self) -> requests.Session:
+        """HTTP session of the calling thread"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update({
+                'User-Agent': 'WeatherStation/2.0 (Enhanced Data Fetcher)'
+            })
+        return session
+    
     def load_locations(self, filepath: str = 'geolocations.json') -> Dict[str, List[float]]:
         """Load city locations from JSON file"""
         try:
-            with open(filepath, 'r') as file:
-                locations = json.load(file)
-                logger.info(f"Loaded {len(locations)} locations from {filepath}")
-                return locations
+            locations = load_file(filepath)
+            logger.info(f"Loaded {len(locations)} locations from {filepath}")
+            return locations
         except FileNotFoundError:
             logger.error(f"Location file {filepath} not found")
             return {}
@@ -72,30 +202,56 @@ class WeatherDataUpdater:
         }
         
         url = f"{self.api_base_url}/v1/forecast"
+        return self._get_json(url, params, city, self.breaker)
+    
+    def fetch_archive_chunk(self, city: str, coordinates: List[float],
+                            start: date, end: date) -> Dict:
+        """Fetch reanalysis history for one city and date range (inclusive, UTC)"""
+        latitude, longitude = coordinates
         
+        params = {
+            'latitude': latitude,
+            'longitude': longitude,
+            'hourly': ','.join(ARCHIVE_PARAMS),
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+            # Partitions are UTC days, whatever the city's time zone
+            'timezone': 'GMT'
+        }
+        
+        url = f"{self.archive_base_url}/v1/archive"
+        return self._get_json(url, params, f"{city} {start}..{end}", self.archive_breaker)
+    
+    def _get_json(self, url: str, params: Dict, label: str, breaker: CircuitBreaker) -> Dict:
+        """GET a JSON document with retry logic; {} on failure"""
         for attempt in range(self.max_retries + 1):
             try:
-                logger.info(f"Fetching data for {city} (attempt {attempt + 1}/{self.max_retries + 1})")
+                logger.info(f"Fetching data for {label} (attempt {attempt + 1}/{self.max_retries + 1})")
                 
-                response = self.session.get(url, params=params, timeout=30)
-                response.raise_for_status()
+                with breaker.guard():
+                    response = self.session.get(url, params=params, timeout=breaker.timeout(30))
+                    response.raise_for_status()
                 
-                data = response.json()
-                logger.info(f"✓ Successfully fetched data for {city}")
+                data = loads(response.content)
+                logger.info(f"✓ Successfully fetched data for {label}")
                 return data
                 
+            except CircuitOpenError as e:
+                logger.error(f"✗ Not fetching {label}: {e}")
+                return {}
+            
             except requests.exceptions.RequestException as e:
-                logger.warning(f"Failed to fetch data for {city}: {e}")
+                logger.warning(f"Failed to fetch data for {label}: {e}")
                 
                 if attempt < self.max_retries:
                     logger.info(f"Retrying in {self.retry_delay} seconds...")
                     time.sleep(self.retry_delay)
                 else:
-                    logger.error(f"✗ Failed to fetch data for {city} after {self.max_retries + 1} attempts")
+                    logger.error(f"✗ Failed to fetch data for {label} after {self.max_retries + 1} attempts")
                     return {}
             
             except json.JSONDecodeError as e:
-                logger.error(f"Invalid JSON response for {city}: {e}")
+                logger.error(f"Invalid JSON response for {label}: {e}")
                 return {}
         
         return {}
@@ -120,13 +276,29 @@ class WeatherDataUpdater:
         if param_count < len(self.weather_params) * 0.5:  # At least 50% of parameters
             logger.warning(f"Insufficient weather parameters for {city} ({param_count}/{len(self.weather_params)})")
         
+        # Nulls, out-of-range values, spikes and flat-lines in one pass
+        report = check_city(data)
+        if not report['valid']:
+            logger.warning(f"Mostly null key parameters for {city}: {', '.join(report['flags'])}")
+            return False
+        if report['flags']:
+            logger.warning(f"Quality issues for {city} (score {report['score']}): {', '.join(report['flags'])}")
+        
         logger.info(f"Data validation passed for {city}")
         return True
     
     def update_all_locations(self, locations_file: str = 'geolocations.json', 
                            output_file: str = 'output_data.json',
-                           past_days: int = 92) -> Dict:
-        """Update weather data for all locations"""
+                           past_days: int = 92, concurrency: int = 1, rate: float = 1.0,
+                           shard: Optional[Tuple[int, int]] = None, resume: bool = False,
+                           indent: bool = True) -> Dict:
+        """Update weather data for all locations
+
+        Cities are fetched by `concurrency` threads sharing a `rate` requests
+        per second budget. Every accepted city is appended to a checkpoint
+        file (`<output>.partial`); with `resume`, cities already in it are
+        skipped. The checkpoint is removed once the output file is written.
+        """
         logger.info("Starting weather data update process...")
         
         # Load locations
@@ -135,35 +307,66 @@ class WeatherDataUpdater:
             logger.error("No locations to process")
             return {}
         
-        output = {}
-        successful_updates = 0
+        if shard:
+            locations = select_shard(locations, *shard)
+            logger.info(f"Shard {shard[0]}/{shard[1]}: {len(locations)} locations")
         
-        # Process each location
-        for i, (city, coordinates) in enumerate(locations.items(), 1):
-            logger.info(f"Processing {city} ({i}/{len(locations)})")
-            
-            try:
-                data = self.fetch_weather_data(city, coordinates, past_days)
+        checkpoint_file = f"{output_file}.partial"
+        output = self._load_checkpoint(checkpoint_file) if resume else {}
+        if output:
+            logger.info(f"Resuming: {len(output)} locations already fetched")
+        elif os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+        
+        pending = [(city, coordinates) for city, coordinates in locations.items() if city not in output]
+        limiter = RateLimiter(rate, burst=concurrency)
+        processed = 0
+        aborted = False
+        
+        def process(city: str, coordinates: List[float]) -> Optional[Dict]:
+            limiter.acquire()
+            data = self.fetch_weather_data(city, coordinates, past_days)
+            return data if self.validate_data(data, city) else None
+        
+        with open(checkpoint_file, 'ab') as checkpoint, \
+                ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='updater') as executor:
+            futures = {executor.submit(process, city, coordinates): city for city, coordinates in pending}
+            for future in as_completed(futures):
+                city = futures[future]
+                processed += 1
+                try:
+                    data = future.result()
+                    if data:
+                        output[city] = data
+                        # One line per city, so an interrupted run loses at most the cities in flight
+                        checkpoint.write(dumps({'city': city, 'data': data}) + b'\n')
+                        checkpoint.flush()
+                    else:
+                        logger.warning(f"Skipping {city} due to invalid data")
+                except Exception as e:
+                    logger.error(f"Unexpected error processing {city}: {e}")
                 
-                if self.validate_data(data, city):
-                    output[city] = data
-                    successful_updates += 1
-                else:
-                    logger.warning(f"Skipping {city} due to invalid data")
-                    
-            except Exception as e:
-                logger.error(f"Unexpected error processing {city}: {e}")
-            
-            # Add small delay between requests to be respectful
-            if i < len(locations):
-                time.sleep(1)
+                if processed % 20 == 0 or processed == len(pending):
+                    logger.info(f"Progress: {processed}/{len(pending)} locations processed")
+                
+                # A partial file would replace a complete one, so stop while the upstream is down
+                if self.breaker.state == OPEN:
+                    aborted = True
+                    for pending_future in futures:
+                        pending_future.cancel()
+                    break
+        
+        if aborted:
+            logger.error(f"Upstream failing consistently after {len(output)} locations - aborting update "
+                         f"(rerun with --resume to continue from {checkpoint_file})")
+            return {}
         
         # Save results
         if output:
             try:
-                with open(output_file, 'w') as file:
-                    json.dump(output, file, indent=2)
-                logger.info(f"✓ Saved weather data for {successful_updates}/{len(locations)} locations to {output_file}")
+                save_output(output, output_file, indent)
+                os.remove(checkpoint_file)
+                logger.info(f"✓ Saved weather data for {len(output)}/{len(locations)} locations to {output_file}")
             except Exception as e:
                 logger.error(f"Failed to save output file: {e}")
         else:
@@ -171,11 +374,119 @@ class WeatherDataUpdater:
         
         return output
     
+    def _load_checkpoint(self, checkpoint_file: str) -> Dict:
+        """Cities saved by an interrupted run; a torn last line is cut off so appends stay valid"""
+        output = {}
+        try:
+            with open(checkpoint_file, 'r+b') as f:
+                valid_end = 0
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        entry = loads(line)
+                    except ValueError:
+                        break
+                    output[entry['city']] = entry['data']
+                    valid_end += len(line)
+                f.truncate(valid_end)
+        except FileNotFoundError:
+            pass
+        return output
+    
+    def backfill_history(self, locations_file: str, history_dir: str, start: date, end: date,
+                         chunk_days: int = 31, concurrency: int = 4, rate: float = 1.0,
+                         shard: Optional[Tuple[int, int]] = None) -> Dict:
+        """Fetch archive history for all locations into a day-partitioned store
+
+        The range is split into `chunk_days` chunks per city, fetched by
+        `concurrency` threads sharing a `rate` requests per second budget.
+        Each chunk is written to the store as soon as it arrives and then
+        dropped, and only a few chunks are queued ahead of the workers, so
+        memory use does not grow with the length of the range. Rerunning a
+        range rewrites it; newer data wins for the same city and hour.
+        """
+        logger.info(f"Starting history backfill {start} to {end}...")
+        
+        locations = self.load_locations(locations_file)
+        if not locations:
+            logger.error("No locations to process")
+            return {}
+        
+        if shard:
+            locations = select_shard(locations, *shard)
+            logger.info(f"Shard {shard[0]}/{shard[1]}: {len(locations)} locations")
+        
+        store = HistoryStore(history_dir)
+        chunks = date_chunks(start, end, chunk_days)
+        total = len(locations) * len(chunks)
+        tasks = ((city, coordinates, chunk) for city, coordinates in locations.items() for chunk in chunks)
+        limiter = RateLimiter(rate, burst=concurrency)
+        stats = {'chunks': total, 'fetched': 0, 'failed': 0, 'partitions_written': 0}
+        processed = 0
+        aborted = False
+        
+        def process(city: str, coordinates: List[float], chunk: Tuple[date, date]) -> int:
+            limiter.acquire()
+            data = self.fetch_archive_chunk(city, coordinates, *chunk)
+            hourly = data.get('hourly') if data else None
+            if not hourly or not hourly.get('time'):
+                return -1
+            return store.write({city: hourly})
+        
+        max_workers = max(1, concurrency)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='backfill') as executor:
+            in_flight = {}
+            while True:
+                # Keep the queue short instead of creating a future per chunk up front
+                while len(in_flight) < max_workers * 2:
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    in_flight[executor.submit(process, *task)] = task
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    city, _, (chunk_start, chunk_end) = in_flight.pop(future)
+                    processed += 1
+                    try:
+                        written = future.result()
+                        if written >= 0:
+                            stats['fetched'] += 1
+                            stats['partitions_written'] += written
+                        else:
+                            stats['failed'] += 1
+                            logger.warning(f"No history for {city} {chunk_start}..{chunk_end}")
+                    except Exception as e:
+                        stats['failed'] += 1
+                        logger.error(f"Unexpected error processing {city} {chunk_start}..{chunk_end}: {e}")
+                    
+                    if processed % 50 == 0 or processed == total:
+                        logger.info(f"Progress: {processed}/{total} chunks processed")
+                
+                if self.archive_breaker.state == OPEN:
+                    aborted = True
+                    for future in in_flight:
+                        future.cancel()
+                    break
+        
+        if aborted:
+            logger.error(f"Archive API failing consistently after {stats['fetched']} chunks - aborting backfill")
+            stats['aborted'] = True
+        else:
+            logger.info(f"✓ Backfilled {stats['fetched']}/{total} chunks into {history_dir} "
+                        f"({stats['failed']} failed)")
+        return stats
+    
     def check_api_status(self) -> bool:
         """Check if the API endpoint is accessible"""
         try:
             logger.info(f"Checking API status at {self.api_base_url}")
-            response = self.session.get(f"{self.api_base_url}/v1/forecast?latitude=0&longitude=0", timeout=10)
+            with self.breaker.guard():
+                response = self.session.get(f"{self.api_base_url}/v1/forecast?latitude=0&longitude=0",
+                                            timeout=self.breaker.timeout(10))
             if response.status_code == 200:
                 logger.info("✓ API is accessible")
                 return True
@@ -186,9 +497,98 @@ class WeatherDataUpdater:
             logger.error(f"API not accessible: {e}")
             return False
 
+def merge_main(argv: List[str]) -> int:
+    """`merge` subcommand: combine shard outputs into one dataset"""
+    parser = argparse.ArgumentParser(prog='update_weather_information.py merge',
+                                     description='Combine shard output files into one dataset')
+    parser.add_argument('inputs', nargs='+', help='Shard output files, e.g. output_data.0.json output_data.1.json')
+    parser.add_argument('--output', default='output_data.json',
+                       help='Merged output JSON file (default: output_data.json)')
+    parser.add_argument('--compact', action='store_true',
+                       help='Write compact JSON, one city per line, instead of indented (smaller, faster to write '
+                            'and parse, and shared between server workers without parsing)')
+    args = parser.parse_args(argv)
+    
+    merged = merge_outputs(args.inputs, args.output, indent=not args.compact)
+    return 0 if merged else 1
+
+def parse_date(value: str) -> date:
+    """Parse a YYYY-MM-DD command-line date"""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date '{value}' (expected YYYY-MM-DD)")
+
+def backfill_main(argv: List[str]) -> int:
+    """`backfill` subcommand: fetch archive history into the history store"""
+    parser = argparse.ArgumentParser(prog='update_weather_information.py backfill',
+                                     description='Fetch hourly history from the archive API into a '
+                                                 'day-partitioned history store')
+    parser.add_argument('--start', type=parse_date, required=True,
+                       help='First day to fetch (YYYY-MM-DD)')
+    parser.add_argument('--end', type=parse_date,
+                       default=date.today() - timedelta(days=ARCHIVE_DELAY_DAYS),
+                       help=f'Last day to fetch (default: {ARCHIVE_DELAY_DAYS} days ago; '
+                            'the archive lags behind real time)')
+    parser.add_argument('--archive-url', default='https://archive-api.open-meteo.com',
+                       help='Open-Meteo archive API base URL (default: https://archive-api.open-meteo.com)')
+    parser.add_argument('--locations', default='geolocations.json',
+                       help='Path to locations JSON file (default: geolocations.json)')
+    parser.add_argument('--history-dir', default='history',
+                       help='History store directory, the server\'s HISTORY_DIR to serve it (default: history)')
+    parser.add_argument('--retention-days', type=int,
+                       default=int(os.getenv('HISTORY_RETENTION_DAYS', '365')),
+                       help='The server\'s HISTORY_RETENTION_DAYS; a --start older than this is refused, '
+                            'since the next maintenance pass would drop it (default: $HISTORY_RETENTION_DAYS or 365; 0 keeps all)')
+    parser.add_argument('--chunk-days', type=int, default=31,
+                       help='Days per archive request (default: 31)')
+    parser.add_argument('--retries', type=int, default=3,
+                       help='Maximum number of retry attempts (default: 3)')
+    parser.add_argument('--retry-delay', type=int, default=5,
+                       help='Delay between retries in seconds (default: 5)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                       help='Chunks fetched in parallel (default: 4)')
+    parser.add_argument('--rate', type=float, default=1.0,
+                       help='Maximum requests per second across all workers, 0 for no limit (default: 1)')
+    parser.add_argument('--shard', type=parse_shard,
+                       help='Only fetch shard i of n (e.g. 0/4); shards can share one history directory')
+    args = parser.parse_args(argv)
+    
+    if args.end < args.start:
+        parser.error('--end is before --start')
+    if args.chunk_days < 1:
+        parser.error('--chunk-days must be at least 1')
+    if args.retention_days > 0 and args.start < date.today() - timedelta(days=args.retention_days):
+        parser.error(f'--start {args.start} is older than the {args.retention_days} day history retention; '
+                     'raise HISTORY_RETENTION_DAYS on the server (0 keeps all) and pass it as --retention-days')
+    
+    updater = WeatherDataUpdater(
+        retry_delay=args.retry_delay,
+        max_retries=args.retries,
+        archive_base_url=args.archive_url
+    )
+    stats = updater.backfill_history(
+        locations_file=args.locations,
+        history_dir=args.history_dir,
+        start=args.start,
+        end=args.end,
+        chunk_days=args.chunk_days,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        shard=args.shard
+    )
+    return 0 if stats.get('fetched') and not stats.get('aborted') else 1
+
 def main():
     """Main function with command-line interface"""
-    parser = argparse.ArgumentParser(description='Weather Station Data Updater v2.0')
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        return merge_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'backfill':
+        return backfill_main(sys.argv[2:])
+    
+    parser = argparse.ArgumentParser(description='Weather Station Data Updater v2.0',
+                                     epilog='Run "%(prog)s merge -h" to combine shard outputs, '
+                                            '"%(prog)s backfill -h" to fetch archive history.')
     parser.add_argument('--api-url', default='https://api.open-meteo.com',
                        help='Open-Meteo API base URL (default: https://api.open-meteo.com)')
     parser.add_argument('--self-hosted', action='store_true',
@@ -203,6 +603,17 @@ def main():
                        help='Maximum number of retry attempts (default: 3)')
     parser.add_argument('--retry-delay', type=int, default=5,
                        help='Delay between retries in seconds (default: 5)')
+    parser.add_argument('--concurrency', type=int, default=1,
+                       help='Locations fetched in parallel (default: 1)')
+    parser.add_argument('--rate', type=float, default=1.0,
+                       help='Maximum requests per second across all workers, 0 for no limit (default: 1)')
+    parser.add_argument('--shard', type=parse_shard,
+                       help='Only fetch shard i of n (e.g. 0/4); combine the outputs with the merge subcommand')
+    parser.add_argument('--resume', action='store_true',
+                       help='Skip locations already saved by an interrupted run with the same --output')
+    parser.add_argument('--compact', action='store_true',
+                       help='Write compact JSON, one city per line, instead of indented (smaller, faster to write '
+                            'and parse, and shared between server workers without parsing)')
     
     args = parser.parse_args()
     
@@ -232,7 +643,12 @@ def main():
     result = updater.update_all_locations(
         locations_file=args.locations,
         output_file=args.output,
-        past_days=args.past_days
+        past_days=args.past_days,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        shard=args.shard,
+        resume=args.resume,
+        indent=not args.compact
     )
     
     if result:
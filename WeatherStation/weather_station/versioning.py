@@ -0,0 +1,211 @@
+"""
+Dataset Versioning
+==================
+Assigns a monotonically increasing version to every dataset refresh and
+records which cities and hour ranges changed, so clients can sync deltas.
+"""
+
+import os
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+from .config import get_config
+from .serialization import dump_file, load_file
+from .events import get_broadcaster
+from .leader import file_lock
+
+logger = logging.getLogger(__name__)
+
+
+def diff_city_hourly(old_data: Optional[Dict], new_data: Optional[Dict]) -> Optional[Dict]:
+    """Return the changed hour range between two versions of a city, or None if unchanged"""
+    new_hourly = (new_data or {}).get('hourly') or {}
+    new_times = new_hourly.get('time') or []
+    if not new_times:
+        return None
+
+    old_hourly = (old_data or {}).get('hourly') or {}
+    old_times = old_hourly.get('time') or []
+    if not old_times:
+        return {'start': new_times[0], 'end': new_times[-1]}
+
+    old_index = {t: i for i, t in enumerate(old_times)}
+    first_changed = None
+    last_changed = None
+
+    for i, timestamp in enumerate(new_times):
+        j = old_index.get(timestamp)
+        changed = j is None
+        if not changed:
+            for variable, values in new_hourly.items():
+                if variable == 'time' or not isinstance(values, list):
+                    continue
+                old_values = old_hourly.get(variable)
+                if not isinstance(old_values, list) or j >= len(old_values) or i >= len(values):
+                    changed = True
+                    break
+                if old_values[j] != values[i]:
+                    changed = True
+                    break
+        if changed:
+            if first_changed is None:
+                first_changed = timestamp
+            last_changed = timestamp
+
+    if first_changed is None:
+        return None
+    return {'start': first_changed, 'end': last_changed}
+
+
+def diff_datasets(old_data: Optional[Dict], new_data: Dict) -> Dict[str, Dict]:
+    """Compute per-city changes between two datasets"""
+    old_data = old_data or {}
+    changes = {}
+
+    for city, city_data in new_data.items():
+        change = diff_city_hourly(old_data.get(city), city_data)
+        if change is not None:
+            changes[city] = change
+
+    for city in old_data:
+        if city not in new_data:
+            changes[city] = {'removed': True}
+
+    return changes
+
+
+class DatasetVersionTracker:
+    """Tracks dataset versions and their per-city change ranges on disk"""
+
+    def __init__(self, path: Optional[str] = None, history_limit: Optional[int] = None):
+        self.config = get_config()
+        self.path = Path(path or self.config.DATASET_VERSION_FILE)
+        self.history_limit = history_limit or self.config.VERSION_HISTORY_LIMIT
+        self._lock = threading.Lock()
+        self._version = 0
+        self._history = []
+        self._source_mtime = None
+        self._loaded_mtime = None
+        self._load()
+
+    def _load(self):
+        """Load version state from disk if another process updated it"""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+
+        try:
+            state = load_file(self.path)
+            self._version = int(state.get('version', 0))
+            self._history = state.get('history', [])
+            self._source_mtime = state.get('source_mtime')
+            self._loaded_mtime = mtime
+        except Exception as e:
+            logger.warning(f"Could not load dataset versions from {self.path}: {e}")
+
+    def _save(self):
+        """Atomically persist version state"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        dump_file({
+            'version': self._version,
+            'source_mtime': self._source_mtime,
+            'history': self._history
+        }, tmp_path)
+        os.replace(tmp_path, self.path)
+        self._loaded_mtime = self.path.stat().st_mtime_ns
+
+    @property
+    def current_version(self) -> int:
+        """Latest dataset version"""
+        with self._lock:
+            self._load()
+            return self._version
+
+    @property
+    def source_mtime(self) -> Optional[int]:
+        """Modification time of the data file the latest version describes"""
+        with self._lock:
+            self._load()
+            return self._source_mtime
+
+    def record(self, changes: Dict[str, Dict], source_mtime: Optional[int] = None) -> int:
+        """Record a refresh and return its version (unchanged if nothing changed)"""
+        # The file lock keeps versions monotonic when several workers record
+        with self._lock, file_lock(str(self.path) + '.lock'):
+            self._load()
+            if source_mtime is not None:
+                self._source_mtime = source_mtime
+
+            if not changes:
+                if source_mtime is not None:
+                    self._save()
+                return self._version
+
+            self._version += 1
+            self._history.append({
+                'version': self._version,
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'changes': changes
+            })
+            if len(self._history) > self.history_limit:
+                self._history = self._history[-self.history_limit:]
+
+            try:
+                self._save()
+            except Exception as e:
+                logger.error(f"Error saving dataset versions: {e}")
+
+            logger.info(f"Dataset version {self._version}: {len(changes)} cities changed")
+            get_broadcaster().publish('dataset_version', {
+                'version': self._version,
+                'locations': list(changes.keys())
+            })
+            return self._version
+
+    def changes_since(self, since: int) -> Optional[Dict]:
+        """Merge all changes after `since`; None when the client is up to date"""
+        with self._lock:
+            self._load()
+            if since == self._version:
+                return None
+            if since > self._version:
+                # Versions were reset (e.g. the version file was lost); the client's data is unrelated
+                return {'version': self._version, 'full_refresh': True, 'changes': {}}
+
+            oldest = self._history[0]['version'] if self._history else self._version + 1
+            if since < oldest - 1:
+                # History was trimmed past the client's version
+                return {'version': self._version, 'full_refresh': True, 'changes': {}}
+
+            merged = {}
+            for entry in self._history:
+                if entry['version'] <= since:
+                    continue
+                for city, change in entry['changes'].items():
+                    previous = merged.get(city)
+                    if previous is None or change.get('removed') or previous.get('removed'):
+                        merged[city] = dict(change)
+                    else:
+                        previous['start'] = min(previous['start'], change['start'])
+                        previous['end'] = max(previous['end'], change['end'])
+
+            return {'version': self._version, 'full_refresh': False, 'changes': merged}
+
+
+# Global instance
+_version_tracker: Optional[DatasetVersionTracker] = None
+
+
+def get_version_tracker() -> DatasetVersionTracker:
+    """Get global dataset version tracker instance"""
+    global _version_tracker
+    if _version_tracker is None:
+        _version_tracker = DatasetVersionTracker()
+    return _version_tracker
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+End-to-End Benchmark
+====================
+Starts the Open-Meteo stub and the Weather Station server (uvicorn, in a
+subprocess) against synthetic locations, then drives the data endpoints in
+live, file and hybrid modes at several city counts and concurrency levels.
+Reports throughput, p50/p95/p99 latency and server RSS per run.
+
+Usage:
+    python benchmarks/bench_e2e.py [--modes live file hybrid] [--cities 50 250] [--concurrency 1 16]
+                                   [--duration 5] [--latency-ms 20] [--output results.json]
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.openmeteo_stub import start_stub
+from benchmarks.synthetic import make_dataset
+from WeatherStation.weather_station import serialization
+
+MODES = ('live', 'file', 'hybrid')
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(sorted_values, percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values), max(1, math.ceil(percent / 100 * len(sorted_values)))) - 1
+    return sorted_values[rank]
+
+
+def _rss_mb(pid: int):
+    """Current and peak resident set size of a process in MB (Linux only)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return (round(int(fields['VmRSS'].split()[0]) / 1024, 1),
+                round(int(fields['VmHWM'].split()[0]) / 1024, 1))
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+class Server:
+    """The Weather Station app running under uvicorn in a subprocess"""
+
+    def __init__(self, mode: str, city_count: int, upstream_url: str, workdir: str):
+        self.port = _free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        data_dir = os.path.join(workdir, f'{mode}-{city_count}')
+        os.makedirs(data_dir, exist_ok=True)
+
+        # The snapshot/file data and the locations share city names and coordinates
+        dataset = make_dataset(city_count)
+        self.cities = list(dataset.keys())
+        locations_file = os.path.join(data_dir, 'geolocations.json')
+        serialization.dump_file({name: city['coordinates'] for name, city in dataset.items()}, locations_file)
+        if mode in ('file', 'hybrid'):
+            serialization.dump_file(dataset, os.path.join(data_dir, 'output_data.json'), indent=True)
+
+        env = dict(os.environ)
+        env.update({
+            'DATA_MODE': mode,
+            'OPEN_METEO_API_URL': upstream_url,
+            'LOCATIONS_FILE': locations_file,
+            'DATA_DIR': data_dir,
+            'AUTO_UPDATE_ENABLED': 'false',
+            'LIVE_CACHE_SNAPSHOT_ENABLED': 'false',
+            'LOG_LEVEL': 'WARNING',
+            'PYTHONPATH': ROOT,
+        })
+        # Server output goes to a file; a full pipe would block the server mid-run
+        self.log_path = os.path.join(data_dir, 'server.log')
+        with open(self.log_path, 'wb') as log:
+            self.process = subprocess.Popen(
+                [sys.executable, '-m', 'uvicorn', 'WeatherStation.weather_station.index:app',
+                 '--host', '127.0.0.1', '--port', str(self.port), '--log-level', 'warning', '--no-access-log'],
+                cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+
+    def wait_ready(self, timeout: float = 60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                with open(self.log_path, 'rb') as log:
+                    raise RuntimeError(f"Server exited: {log.read().decode(errors='replace')[-2000:]}")
+            try:
+                if requests.get(f'{self.base_url}/health', timeout=1).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError('Server did not become ready')
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def _scenarios(mode: str, cities):
+    """Endpoint generators per scenario; each call returns a path"""
+    limit = min(len(cities), 300)
+    scenarios = {'weather': lambda rng: f'/api/data/weather?limit={limit}'}
+    if mode == 'file':
+        scenarios['city'] = lambda rng: f'/api/data/rollups?city={rng.choice(cities)}'
+    else:
+        scenarios['city'] = lambda rng: f'/api/data/live/{rng.choice(cities)}'
+    return scenarios
+
+
+def drive(base_url: str, path_for, concurrency: int, duration: float, seed: int) -> dict:
+    """Issue requests from `concurrency` threads for `duration` seconds"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index: int):
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        local = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + path_for(rng), timeout=60)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            local.append((time.perf_counter() - start) * 1000)
+            local_errors += 0 if ok else 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(_percentile(latencies, 50), 2),
+            'p95': round(_percentile(latencies, 95), 2),
+            'p99': round(_percentile(latencies, 99), 2),
+            'max': round(latencies[-1], 2) if latencies else 0.0,
+        },
+    }
+
+
+def run(modes, city_counts, concurrencies, duration: float, warmup: int, latency_ms: float,
+        jitter_ms: float, error_rate: float, seed: int) -> dict:
+    stub = start_stub(0, latency_ms, jitter_ms, error_rate, seed)
+    upstream_url = f'http://127.0.0.1:{stub.server_port}'
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'serialization_backend': serialization.BACKEND,
+        },
+        'settings': {
+            'duration_seconds': duration,
+            'warmup_requests': warmup,
+            'upstream_latency_ms': latency_ms,
+            'upstream_jitter_ms': jitter_ms,
+            'upstream_error_rate': error_rate,
+            'seed': seed,
+        },
+        'runs': [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in modes:
+            for city_count in city_counts:
+                server = Server(mode, city_count, upstream_url, workdir)
+                try:
+                    server.wait_ready()
+                    for scenario, path_for in _scenarios(mode, server.cities).items():
+                        rng = random.Random(seed)
+                        for _ in range(warmup):
+                            requests.get(server.base_url + path_for(rng), timeout=300)
+
+                        for concurrency in concurrencies:
+                            result = drive(server.base_url, path_for, concurrency, duration, seed)
+                            rss, peak_rss = _rss_mb(server.process.pid)
+                            result.update({
+                                'mode': mode,
+                                'cities': city_count,
+                                'scenario': scenario,
+                                'concurrency': concurrency,
+                                'rss_mb': rss,
+                                'peak_rss_mb': peak_rss,
+                            })
+                            results['runs'].append(result)
+                            _print_run(result)
+                finally:
+                    server.stop()
+
+    stub.shutdown()
+    return results
+
+
+def _print_run(run: dict):
+    latency = run['latency_ms']
+    print(f"  {run['mode']:<7} {run['cities']:>6} {run['scenario']:<8} {run['concurrency']:>4} "
+          f"{run['throughput_rps']:>9} {latency['p50']:>9} {latency['p95']:>9} {latency['p99']:>9} "
+          f"{run['errors']:>6} {run['rss_mb'] if run['rss_mb'] is not None else '-':>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end Weather Station benchmark against a local Open-Meteo stub')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES),
+                        help='Data modes to benchmark (default: live file hybrid)')
+    parser.add_argument('--cities', type=int, nargs='+', default=[50, 250],
+                        help='Location counts (default: 50 250)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16],
+                        help='Concurrent clients per run (default: 1 16)')
+    parser.add_argument('--duration', type=float, default=5,
+                        help='Seconds per run (default: 5)')
+    parser.add_argument('--warmup', type=int, default=3,
+                        help='Untimed requests per scenario before measuring (default: 3)')
+    parser.add_argument('--latency-ms', type=float, default=20,
+                        help='Stub upstream latency (default: 20)')
+    parser.add_argument('--jitter-ms', type=float, default=10,
+                        help='Stub upstream latency jitter (default: 10)')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='Share of stub requests failing with 503 (default: 0)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for data and request mix (default: 42)')
+    parser.add_argument('--output', help='Write machine-readable results to this JSON file')
+    args = parser.parse_args()
+
+    print(f"  {'mode':<7} {'cities':>6} {'scenario':<8} {'conc':>4} {'req/s':>9} {'p50 ms':>9} "
+          f"{'p95 ms':>9} {'p99 ms':>9} {'errors':>6} {'rss MB':>8}")
+    results = run(args.modes, args.cities, args.concurrency, args.duration, args.warmup,
+                  args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Ingest-Path Microbenchmark
+==========================
+Times the per-city work done at every refresh — field name normalization
+(with and without ensemble statistics), the quality-control pass and the
+updater's `validate_data` — plus full dataset dump and load, on synthetic
+250-, 1000- and 5000-city datasets.
+
+Results can be compared against the committed baseline
+(`benchmarks/baseline_ingest.json`); `--check` exits non-zero when any
+operation is slower than the baseline by more than the tolerance.
+
+Usage:
+    python benchmarks/bench_ingest.py [--cities 250 1000 5000] [--repeat 5] [--output results.json]
+    python benchmarks/bench_ingest.py --check [--tolerance 0.25]
+    python benchmarks/bench_ingest.py --update-baseline
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_FILE = os.path.join(ROOT, 'benchmarks', 'baseline_ingest.json')
+
+# Keep generated data files out of the real assets directory
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='ws-bench-ingest-'))
+
+from benchmarks.synthetic import MODELS, make_dataset
+from WeatherStation.weather_station import serialization
+from WeatherStation.weather_station.data_manager import WeatherDataManager
+from WeatherStation.weather_station.live_data_manager import LiveWeatherDataManager
+from WeatherStation.weather_station import normalization
+from WeatherStation.weather_station.normalization import WEATHER_VARIABLES, FieldNormalizer
+from WeatherStation.weather_station.quality import check_city
+from WeatherStation.weather_station.updaters import update_weather_information
+
+# Distinct synthetic cities per dataset; the rest share their series
+DISTINCT_CITIES = 250
+
+# validate_data logs one INFO line per city; measure the checks, not the log handler
+logging.getLogger(update_weather_information.__name__).setLevel(logging.WARNING)
+
+
+def _time(func, repeat: int, setup=None) -> float:
+    """Median wall time of `func(setup())` in milliseconds; setup is not timed
+
+    The garbage collector is paused while timing (as timeit does); its passes
+    over large freshly loaded datasets are the main source of run-to-run noise.
+    """
+    samples = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func(argument) if setup else func()
+            samples.append((time.perf_counter() - start) * 1000)
+        finally:
+            gc.enable()
+    return statistics.median(samples)
+
+
+def _with_model_suffixes(dataset):
+    """Model-suffixed copy of `dataset` as returned with `models=`; series are shared, not copied"""
+    suffixed = {}
+    for name, city in dataset.items():
+        hourly = {'time': city['hourly']['time']}
+        for field, values in city['hourly'].items():
+            if field != 'time':
+                for model in MODELS:
+                    hourly[f'{field}_{model}'] = values
+        suffixed[name] = dict(city, hourly=hourly)
+    return suffixed
+
+
+def run(city_counts, repeat: int) -> dict:
+    file_manager = WeatherDataManager()
+    live_manager = LiveWeatherDataManager()
+    updater = update_weather_information.WeatherDataUpdater()
+    ensemble_normalizer = FieldNormalizer(WEATHER_VARIABLES, MODELS, keep_models=True, ensemble=True)
+
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'serialization_backend': serialization.BACKEND,
+            'numpy': normalization.np is not None,
+        },
+        'repeat': repeat,
+        'datasets': {},
+    }
+
+    for count in city_counts:
+        dataset = make_dataset(count, distinct=DISTINCT_CITIES)
+        suffixed = _with_model_suffixes(dataset)
+        cities = list(dataset.values())
+
+        def fresh_suffixed():
+            # Normalization replaces data['hourly'], so each run gets new top-level dicts
+            return [dict(city) for city in suffixed.values()]
+
+        def validate_all(_=None):
+            for name, city in dataset.items():
+                updater.validate_data(city, name)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'output_data.json')
+            timings = {
+                'normalize_file': _time(
+                    lambda batch: [file_manager._normalize_field_names(city) for city in batch],
+                    repeat, fresh_suffixed
+                ),
+                'normalize_live': _time(
+                    lambda batch: [live_manager._normalize_field_names(city) for city in batch],
+                    repeat, fresh_suffixed
+                ),
+                'normalize_ensemble': _time(
+                    lambda batch: [ensemble_normalizer.normalize(city) for city in batch],
+                    repeat, fresh_suffixed
+                ),
+                'quality_check': _time(lambda: [check_city(city) for city in cities], repeat),
+                'validate_data': _time(validate_all, repeat),
+                'dump_file': _time(lambda: serialization.dump_file(dataset, path, indent=True), repeat),
+                'load_file': _time(lambda: serialization.load_file(path), repeat),
+            }
+            size_mb = os.path.getsize(path) / 1024 / 1024
+
+        results['datasets'][str(count)] = {
+            'file_mb': round(size_mb, 2),
+            'timings_ms': {operation: round(ms, 3) for operation, ms in timings.items()},
+            'per_city_us': {operation: round(ms * 1000 / count, 2) for operation, ms in timings.items()},
+        }
+
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Operations slower than the baseline by more than `tolerance` (a fraction)"""
+    regressions = []
+    for count, result in results['datasets'].items():
+        reference = baseline.get('datasets', {}).get(count, {}).get('timings_ms', {})
+        for operation, ms in result['timings_ms'].items():
+            expected = reference.get(operation)
+            if expected and ms > expected * (1 + tolerance):
+                regressions.append({
+                    'cities': count,
+                    'operation': operation,
+                    'baseline_ms': expected,
+                    'current_ms': ms,
+                    'change': round(ms / expected - 1, 3),
+                })
+    return regressions
+
+
+def _print_results(results: dict, baseline: dict = None):
+    print(f"Serialization backend: {results['environment']['serialization_backend']}")
+    for count, result in results['datasets'].items():
+        reference = (baseline or {}).get('datasets', {}).get(count, {}).get('timings_ms', {})
+        print(f"\n{count} cities ({result['file_mb']} MB file)")
+        print(f"  {'operation':<24} {'ms':>10} {'us/city':>10} {'baseline':>10} {'change':>8}")
+        for operation, ms in result['timings_ms'].items():
+            expected = reference.get(operation)
+            change = f"{(ms / expected - 1) * 100:+.1f}%" if expected else '-'
+            print(f"  {operation:<24} {ms:>10} {result['per_city_us'][operation]:>10} "
+                  f"{expected if expected else '-':>10} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmark the dataset ingest path')
+    parser.add_argument('--cities', type=int, nargs='+', default=[250, 1000, 5000],
+                        help='Dataset sizes in cities (default: 250 1000 5000)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Repetitions per measurement, median is reported (default: 5)')
+    parser.add_argument('--output', help='Write machine-readable results to this JSON file')
+    parser.add_argument('--baseline', default=BASELINE_FILE,
+                        help='Baseline results file (default: benchmarks/baseline_ingest.json)')
+    parser.add_argument('--check', action='store_true',
+                        help='Exit with status 1 if any operation regressed beyond the tolerance')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown versus the baseline as a fraction (default: 0.25)')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Write these results as the new baseline')
+    args = parser.parse_args()
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = run(args.cities, args.repeat)
+    _print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"\nBaseline updated: {args.baseline}")
+        return
+
+    if args.check:
+        if baseline is None:
+            print(f"\nNo baseline at {args.baseline}; run with --update-baseline first")
+            sys.exit(2)
+        if baseline['environment'].get('serialization_backend') != results['environment']['serialization_backend']:
+            print("\nWarning: baseline was recorded with a different serialization backend")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression['cities']:>5} cities  {regression['operation']:<24} "
+                      f"{regression['baseline_ms']} ms -> {regression['current_ms']} ms "
+                      f"({regression['change']:+.1%})")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
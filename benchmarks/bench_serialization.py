@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Serialization Microbenchmark
+============================
+Compares the standard library JSON path with the fast serialization layer
+(orjson when installed) on realistic 250- and 1000-city datasets.
+
+Usage:
+    python benchmarks/bench_serialization.py [--cities 250 1000] [--repeat 5] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import make_dataset
+from WeatherStation.weather_station import serialization
+
+
+def _time(func, repeat: int) -> float:
+    """Median wall time of `func` in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _stdlib_response(payload):
+    # Mirrors starlette.responses.JSONResponse.render
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')).encode('utf-8')
+
+
+def run(city_counts, repeat: int) -> dict:
+    results = {'backend': serialization.BACKEND, 'repeat': repeat, 'datasets': {}}
+
+    for count in city_counts:
+        dataset = make_dataset(count)
+        payload = {'data': dataset, 'locations': list(dataset.keys()), 'total': count}
+        compact = serialization.dumps(dataset)
+        indented = serialization.dumps(dataset, indent=True)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'output_data.json')
+            serialization.dump_file(dataset, path, indent=True)
+
+            def stdlib_file_write():
+                with open(path, 'w') as f:
+                    json.dump(dataset, f, indent=2)
+
+            def stdlib_file_read():
+                with open(path, 'r') as f:
+                    json.load(f)
+
+            timings = {
+                'response_render': {
+                    'stdlib': _time(lambda: _stdlib_response(payload), repeat),
+                    'fast': _time(lambda: serialization.dumps(payload), repeat),
+                },
+                'file_write_indented': {
+                    'stdlib': _time(stdlib_file_write, repeat),
+                    'fast': _time(lambda: serialization.dump_file(dataset, path, indent=True), repeat),
+                },
+                'file_read': {
+                    'stdlib': _time(stdlib_file_read, repeat),
+                    'fast': _time(lambda: serialization.load_file(path), repeat),
+                },
+                'parse_upstream_bytes': {
+                    'stdlib': _time(lambda: json.loads(compact.decode('utf-8')), repeat),
+                    'fast': _time(lambda: serialization.loads(compact), repeat),
+                },
+            }
+
+        for timing in timings.values():
+            timing['speedup'] = round(timing['stdlib'] / timing['fast'], 2) if timing['fast'] else None
+            timing['stdlib'] = round(timing['stdlib'], 2)
+            timing['fast'] = round(timing['fast'], 2)
+
+        results['datasets'][str(count)] = {
+            'compact_mb': round(len(compact) / 1024 / 1024, 2),
+            'indented_mb': round(len(indented) / 1024 / 1024, 2),
+            'timings_ms': timings,
+        }
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare stdlib and fast JSON serialization')
+    parser.add_argument('--cities', type=int, nargs='+', default=[250, 1000],
+                        help='Dataset sizes in cities (default: 250 1000)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Repetitions per measurement, median is reported (default: 5)')
+    parser.add_argument('--output', help='Write machine-readable results to this JSON file')
+    args = parser.parse_args()
+
+    results = run(args.cities, args.repeat)
+
+    print(f"Fast backend: {results['backend']}")
+    for count, result in results['datasets'].items():
+        print(f"\n{count} cities ({result['compact_mb']} MB compact, {result['indented_mb']} MB indented)")
+        print(f"  {'operation':<22} {'stdlib ms':>10} {'fast ms':>10} {'speedup':>8}")
+        for operation, timing in result['timings_ms'].items():
+            print(f"  {operation:<22} {timing['stdlib']:>10} {timing['fast']:>10} {timing['speedup']:>7}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Open-Meteo Stub Server
+======================
+Local `/v1/forecast` and `/v1/archive` endpoints for benchmarks and offline
+development. Responses have the shape and size of real Open-Meteo responses:
+the requested hourly variables over `past_days + forecast_days` (forecast,
+with per-model field suffixes when `models=` is given) or from `start_date`
+to `end_date` (archive). Latency, jitter and error rate are
+configurable so the upstream can be made slow or flaky on purpose.
+
+Usage:
+    python benchmarks/openmeteo_stub.py [--port 18080] [--latency-ms 50] [--jitter-ms 20] [--error-rate 0.01]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import HOURLY_VARIABLES, hourly_series, hourly_times
+
+# Generated response bodies kept per distinct query, so the stub isn't the bottleneck
+BODY_CACHE_SIZE = 4096
+
+
+class StubSettings:
+    """Behaviour shared by all handler threads"""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, seed: int = 42):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.bodies: "OrderedDict[str, bytes]" = OrderedDict()
+        self.requests = 0
+        self.errors = 0
+
+    def delay(self) -> float:
+        with self.lock:
+            return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            return self.rng.random() < self.error_rate
+
+
+def build_forecast(query: dict, seed: int) -> dict:
+    """Deterministic Open-Meteo forecast response for a parsed query string"""
+    latitude = float(query.get('latitude', ['0'])[0])
+    longitude = float(query.get('longitude', ['0'])[0])
+    variables = [v for v in query.get('hourly', [','.join(HOURLY_VARIABLES)])[0].split(',') if v]
+    models = [m for m in query.get('models', [''])[0].split(',') if m]
+    past_days = int(query.get('past_days', ['0'])[0])
+    forecast_days = int(query.get('forecast_days', ['7'])[0])
+
+    # Same coordinates and parameters always produce the same series
+    rng = random.Random(f"{seed}:{latitude}:{longitude}:{past_days}:{forecast_days}")
+    times = hourly_times(past_days, forecast_days)
+    hourly = {'time': times}
+    units = {'time': 'iso8601'}
+    for variable in variables:
+        for name in ([f'{variable}_{model}' for model in models] if models else [variable]):
+            hourly[name] = hourly_series(rng, variable, len(times))
+            units[name] = ''
+
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'generationtime_ms': round(rng.uniform(0.5, 5.0), 3),
+        'utc_offset_seconds': 0,
+        'timezone': 'GMT',
+        'timezone_abbreviation': 'GMT',
+        'elevation': round(rng.uniform(0, 2000), 1),
+        'hourly_units': units,
+        'hourly': hourly
+    }
+
+
+def build_archive(query: dict, seed: int) -> dict:
+    """Deterministic Open-Meteo archive response for a parsed query string"""
+    latitude = float(query.get('latitude', ['0'])[0])
+    longitude = float(query.get('longitude', ['0'])[0])
+    variables = [v for v in query.get('hourly', [','.join(HOURLY_VARIABLES)])[0].split(',') if v]
+    start = date.fromisoformat(query['start_date'][0])
+    end = date.fromisoformat(query['end_date'][0])
+
+    rng = random.Random(f"{seed}:{latitude}:{longitude}:{start}:{end}")
+    days = (end - start).days + 1
+    times = hourly_times(0, days, datetime.combine(start, datetime.min.time()))
+    hourly = {'time': times}
+    for variable in variables:
+        hourly[variable] = hourly_series(rng, variable, len(times))
+
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'generationtime_ms': round(rng.uniform(0.5, 5.0), 3),
+        'utc_offset_seconds': 0,
+        'timezone': 'GMT',
+        'timezone_abbreviation': 'GMT',
+        'elevation': round(rng.uniform(0, 2000), 1),
+        'hourly_units': {name: 'iso8601' if name == 'time' else '' for name in hourly},
+        'hourly': hourly
+    }
+
+
+BUILDERS = {'/v1/forecast': build_forecast, '/v1/archive': build_archive}
+
+
+class ForecastHandler(BaseHTTPRequestHandler):
+    settings: StubSettings = StubSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        settings = self.settings
+        url = urlparse(self.path)
+        with settings.lock:
+            settings.requests += 1
+
+        time.sleep(settings.delay())
+
+        builder = BUILDERS.get(url.path)
+        if builder is None:
+            self._send(404, b'{"error": true, "reason": "Not found"}')
+            return
+
+        if settings.should_fail():
+            with settings.lock:
+                settings.errors += 1
+            self._send(503, b'{"error": true, "reason": "Stub injected failure"}')
+            return
+
+        with settings.lock:
+            body = settings.bodies.get(self.path)
+            if body is not None:
+                settings.bodies.move_to_end(self.path)
+        if body is None:
+            try:
+                body = json.dumps(builder(parse_qs(url.query), settings.seed)).encode()
+            except (KeyError, ValueError):
+                self._send(400, b'{"error": true, "reason": "Invalid parameters"}')
+                return
+            with settings.lock:
+                settings.bodies[self.path] = body
+                while len(settings.bodies) > BODY_CACHE_SIZE:
+                    settings.bodies.popitem(last=False)
+
+        self._send(200, body)
+
+
+def start_stub(port: int = 0, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+               seed: int = 42) -> ThreadingHTTPServer:
+    """Start the stub on a background thread; port 0 picks a free port (see server.server_port)"""
+    handler = type('Handler', (ForecastHandler,), {'settings': StubSettings(latency_ms, jitter_ms, error_rate, seed)})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='openmeteo-stub', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Open-Meteo /v1/forecast and /v1/archive stub')
+    parser.add_argument('--port', type=int, default=18080, help='Port to listen on (default: 18080)')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Base response latency (default: 0)')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Uniform latency jitter (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of requests answered with 503 (default: 0)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for payloads and injected faults (default: 42)')
+    args = parser.parse_args()
+
+    server = start_stub(args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    print(f"Open-Meteo stub listening on http://127.0.0.1:{server.server_port} (/v1/forecast, /v1/archive)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
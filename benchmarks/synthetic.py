@@ -0,0 +1,133 @@
+"""
+Synthetic Weather Datasets
+==========================
+Generates realistic Open-Meteo shaped datasets for benchmarks: 16 past days
+plus 7 forecast days of hourly values for every requested city.
+"""
+
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+HOURLY_VARIABLES = [
+    'temperature_2m', 'relative_humidity_2m', 'dew_point_2m',
+    'apparent_temperature', 'precipitation_probability', 'precipitation',
+    'rain', 'showers', 'snowfall', 'snow_depth', 'pressure_msl',
+    'surface_pressure', 'cloud_cover', 'visibility', 'uv_index',
+    'wind_speed_10m', 'wind_direction_10m', 'wind_gusts_10m',
+    'soil_temperature_0cm', 'soil_moisture_0_to_1cm'
+]
+
+MODELS = ['ecmwf_ifs025', 'ncep_gfs025', 'meteofrance_arpege_world025']
+
+# (base value, daily amplitude, noise) per variable family
+_PROFILES = {
+    'temperature_2m': (12.0, 6.0, 1.0),
+    'apparent_temperature': (11.0, 7.0, 1.5),
+    'dew_point_2m': (6.0, 2.0, 0.8),
+    'soil_temperature_0cm': (10.0, 5.0, 0.5),
+    'relative_humidity_2m': (70.0, 15.0, 5.0),
+    'pressure_msl': (1013.0, 1.5, 0.8),
+    'surface_pressure': (1000.0, 1.5, 0.8),
+    'cloud_cover': (50.0, 20.0, 20.0),
+    'visibility': (24000.0, 4000.0, 2000.0),
+    'wind_speed_10m': (12.0, 4.0, 3.0),
+    'wind_gusts_10m': (22.0, 6.0, 5.0),
+    'wind_direction_10m': (180.0, 60.0, 40.0),
+    'precipitation_probability': (20.0, 10.0, 15.0),
+    'uv_index': (2.0, 2.0, 0.3),
+    'soil_moisture_0_to_1cm': (0.3, 0.02, 0.01),
+}
+
+# Physical bounds values are clamped to, so the data passes ingest-time QC
+_RANGES = {
+    'relative_humidity_2m': (0.0, 100.0),
+    'cloud_cover': (0.0, 100.0),
+    'precipitation_probability': (0.0, 100.0),
+    'uv_index': (0.0, 20.0),
+    'visibility': (0.0, None),
+    'wind_speed_10m': (0.0, None),
+    'wind_gusts_10m': (0.0, None),
+    'soil_moisture_0_to_1cm': (0.0, 1.0),
+}
+
+
+def hourly_times(past_days: int = 16, forecast_days: int = 7,
+                 start: datetime = datetime(2025, 1, 1)) -> List[str]:
+    """ISO-formatted hourly timestamps as returned by Open-Meteo"""
+    first = start - timedelta(days=past_days)
+    return [(first + timedelta(hours=i)).strftime('%Y-%m-%dT%H:%M')
+            for i in range((past_days + forecast_days) * 24)]
+
+
+def hourly_series(rng: random.Random, variable: str, hours: int) -> List:
+    """One hourly series with a diurnal cycle, noise and occasional nulls"""
+    if variable in ('precipitation', 'rain', 'showers', 'snowfall', 'snow_depth'):
+        return [round(rng.expovariate(4.0), 1) if rng.random() < 0.15 else 0.0 for _ in range(hours)]
+
+    base, amplitude, noise = _PROFILES.get(variable, (10.0, 3.0, 1.0))
+    low, high = _RANGES.get(variable, (None, None))
+    phase = rng.uniform(0, 2 * math.pi)
+    values = []
+    for hour in range(hours):
+        if rng.random() < 0.01:
+            values.append(None)
+            continue
+        value = base + amplitude * math.sin(2 * math.pi * hour / 24 + phase) + rng.gauss(0, noise)
+        if variable == 'wind_direction_10m':
+            value %= 360
+        if low is not None:
+            value = max(low, value)
+        if high is not None:
+            value = min(high, value)
+        values.append(round(value, 2 if variable.startswith('soil_moisture') else 1))
+    return values
+
+
+def make_city(rng: random.Random, name: str, times: List[str], models: List[str] = None) -> Dict:
+    """A single city response; with `models`, fields carry per-model suffixes"""
+    hourly = {'time': list(times)}
+    for variable in HOURLY_VARIABLES:
+        if models:
+            for model in models:
+                hourly[f'{variable}_{model}'] = hourly_series(rng, variable, len(times))
+        else:
+            hourly[variable] = hourly_series(rng, variable, len(times))
+
+    latitude = round(rng.uniform(-60, 70), 4)
+    longitude = round(rng.uniform(-180, 180), 4)
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'generationtime_ms': round(rng.uniform(0.5, 5.0), 3),
+        'utc_offset_seconds': 0,
+        'timezone': 'GMT',
+        'timezone_abbreviation': 'GMT',
+        'elevation': round(rng.uniform(0, 2000), 1),
+        'hourly_units': {variable: '' for variable in HOURLY_VARIABLES},
+        'hourly': hourly,
+        'city': name,
+        'coordinates': [latitude, longitude],
+    }
+
+
+def make_dataset(city_count: int, seed: int = 42, models: List[str] = None,
+                 past_days: int = 16, forecast_days: int = 7, distinct: int = None) -> Dict[str, Dict]:
+    """A deterministic dataset of `city_count` cities
+
+    With `distinct`, only that many cities get their own series and the rest
+    share them (each city still has its own dict), so large datasets fit in
+    memory. Serialized files are full size either way.
+    """
+    rng = random.Random(seed)
+    times = hourly_times(past_days, forecast_days)
+    dataset = {}
+    for i in range(city_count):
+        name = f'City {i:05d}'
+        if distinct and i >= distinct:
+            source = dataset[f'City {i % distinct:05d}']
+            dataset[name] = dict(source, city=name, hourly=dict(source['hourly']))
+        else:
+            dataset[name] = make_city(rng, name, times, models)
+    return dataset
@@ -1,22 +1,6 @@
 from WeatherStation.weather_station.index import *
-import threading
-import time
-import os
 
-def thread_1():
-    time.sleep(604800)
-    os.system('./init-weather-data.sh')
-    print(f'Finished Check!')
-    return
-
-def thread_main():
-    main()
-    return
+# Refreshes (and the optional MODEL_SYNC_COMMAND, e.g. ./init-weather-data.sh)
+# are scheduled by the data manager around upstream model runs
 if __name__ == "__main__":
-    thread_0 = threading.Thread(target=thread_main, daemon=True)
-    thread_0.start()
-    thread_1 = threading.Thread(target=thread_1, daemon=True)
-    thread_1.start()
-    
-    thread_0.join()
-    thread_1.join()
\ No newline at end of file
+    main()
@@ -0,0 +1,72 @@
+"""Cache backend tests; the Redis backend runs against fakeredis"""
+
+import time
+
+import pytest
+
+from WeatherStation.weather_station.cache import InProcessLRUCache, RedisCache
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def redis_cache():
+    return RedisCache(client=fakeredis.FakeRedis(), prefix='test:')
+
+
+def test_redis_get_set_roundtrips_json_and_bytes(redis_cache):
+    redis_cache.set('city', {'temperature': [1.5, None]})
+    redis_cache.set('fragment', b'{"a":1}')
+
+    assert redis_cache.get('city') == {'temperature': [1.5, None]}
+    assert redis_cache.get('fragment') == b'{"a":1}'
+    assert redis_cache.get('missing') is None
+    assert redis_cache.get_many(['city', 'missing']) == {'city': {'temperature': [1.5, None]}}
+    assert redis_cache.client.get('test:city') is not None
+
+
+def test_redis_ttl_expiry(redis_cache):
+    redis_cache.set('short', 1, ttl=0.05)
+    redis_cache.set('long', 2, ttl=60)
+    assert redis_cache.get('short') == 1
+
+    time.sleep(0.1)
+    assert redis_cache.get('short') is None
+    assert redis_cache.get('long') == 2
+
+
+def test_redis_delete_and_clear_keep_other_prefixes(redis_cache):
+    other = RedisCache(client=redis_cache.client, prefix='other:')
+    redis_cache.set('a', 1)
+    redis_cache.set('b', 2)
+    other.set('a', 3)
+
+    redis_cache.delete('a')
+    assert redis_cache.get('a') is None
+    assert redis_cache.get('b') == 2
+
+    redis_cache.clear()
+    assert redis_cache.get('b') is None
+    assert other.get('a') == 3
+
+    stats = redis_cache.get_stats()
+    assert stats['errors'] == 0
+    assert stats['hits'] == 1
+
+
+def test_memory_cache_byte_budget_evicts_oldest():
+    cache = InProcessLRUCache(max_entries=100, max_bytes=10)
+    cache.set('a', b'1234')
+    cache.set('b', b'5678')
+    cache.get('a')
+    cache.set('c', b'90ab')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1234'
+    assert cache.get('c') == b'90ab'
+    assert cache.get_stats()['bytes'] == 8
+
+    cache.set('huge', b'x' * 11)
+    assert cache.get('huge') is None
+    cache.delete('a')
+    assert cache.get_stats()['bytes'] == 4
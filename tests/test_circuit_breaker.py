@@ -0,0 +1,129 @@
+"""Circuit breaker state transitions, failure classification and adaptive timeouts"""
+
+import threading
+
+import pytest
+
+from WeatherStation.weather_station import circuit_breaker
+from WeatherStation.weather_station.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, is_upstream_failure
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', fake.monotonic)
+    return fake
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = type('Response', (), {'status_code': status_code})()
+
+
+def fail(breaker, error=None):
+    with pytest.raises(type(error) if error else RuntimeError):
+        with breaker.guard():
+            raise error or RuntimeError('timeout')
+
+
+def test_opens_on_error_rate_and_recovers_through_half_open(clock):
+    breaker = CircuitBreaker('test', error_threshold=0.5, min_calls=4, open_seconds=30)
+    for _ in range(2):
+        with breaker.guard():
+            pass
+    fail(breaker)
+    assert breaker.state == CLOSED
+    fail(breaker)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as rejected:
+        breaker.check()
+    assert rejected.value.retry_after == pytest.approx(30)
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    with breaker.guard():
+        pass
+    assert breaker.state == CLOSED
+    assert breaker.get_status()['times_opened'] == 1
+
+
+def test_failed_trial_reopens(clock):
+    breaker = CircuitBreaker('test', min_calls=1, open_seconds=10)
+    fail(breaker)
+    assert breaker.state == OPEN
+
+    clock.now += 10
+    fail(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_half_open_admits_one_trial_at_a_time(clock):
+    breaker = CircuitBreaker('test', min_calls=1, open_seconds=10)
+    fail(breaker)
+    clock.now += 10
+
+    admitted = []
+    release = threading.Event()
+
+    def trial():
+        try:
+            with breaker.guard():
+                admitted.append(1)
+                release.wait(1)
+        except CircuitOpenError:
+            pass
+
+    threads = [threading.Thread(target=trial) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(admitted) == 1
+
+
+def test_slow_calls_open_the_circuit(clock):
+    breaker = CircuitBreaker('test', min_calls=3, slow_call_seconds=4, slow_call_threshold=0.8)
+    for _ in range(3):
+        breaker.record(True, 5.0)
+    assert breaker.state == OPEN
+
+
+def test_client_errors_do_not_count_as_failures(clock):
+    breaker = CircuitBreaker('test', min_calls=3)
+    for _ in range(5):
+        fail(breaker, HTTPError(404))
+    assert breaker.state == CLOSED
+    assert breaker.get_status()['error_rate'] == 0.0
+
+    assert is_upstream_failure(HTTPError(503))
+    assert is_upstream_failure(HTTPError(429))
+    assert is_upstream_failure(TimeoutError())
+    assert not is_upstream_failure(HTTPError(400))
+
+
+def test_timeout_follows_p95_of_timed_calls_only(clock):
+    breaker = CircuitBreaker('test', min_calls=3, min_timeout=1.0, timeout_multiplier=3.0)
+    assert breaker.timeout(10) == 10
+
+    for _ in range(3):
+        breaker.record(True, 0.5)
+    for _ in range(10):
+        breaker.record(True, None)
+    assert breaker.latency_p95() == 0.5
+    assert breaker.timeout(10) == 1.5
+    assert breaker.timeout(1.2) == 1.2
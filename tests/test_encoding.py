@@ -0,0 +1,32 @@
+"""Response encodings"""
+
+import pytest
+
+from WeatherStation.weather_station.encoding import encode_msgpack
+
+msgpack = pytest.importorskip('msgpack')
+
+
+def test_msgpack_keeps_double_precision_outside_hourly_arrays():
+    payload = {
+        'fetched_at': 1760000000.123,
+        'data': {
+            'Oslo': {
+                'latitude': 59.91234567,
+                'hourly': {'time': ['2025-01-01T00:00'], 'temperature_2m': [1.1, None]},
+                'series': {'temperature_2m': {'time': ['2025-01-01T00:00'], 'values': [2.2]}},
+            }
+        },
+        'stalls': [{'duration_ms': 12.5}],
+    }
+    decoded = msgpack.unpackb(encode_msgpack(payload))
+    city = decoded['data']['Oslo']
+
+    assert decoded['fetched_at'] == 1760000000.123
+    assert city['latitude'] == 59.91234567
+    assert decoded['stalls'] == [{'duration_ms': 12.5}]
+    assert city['hourly']['time'] == ['2025-01-01T00:00']
+    assert city['hourly']['temperature_2m'][0] == pytest.approx(1.1, rel=1e-6)
+    assert city['hourly']['temperature_2m'][0] != 1.1
+    assert city['hourly']['temperature_2m'][1] is None
+    assert city['series']['temperature_2m']['values'][0] == pytest.approx(2.2, rel=1e-6)
@@ -0,0 +1,74 @@
+"""History store: day partitions, segment precedence, compaction and retention"""
+
+from datetime import date, datetime, timedelta, timezone
+
+from WeatherStation.weather_station.history_store import COMPACTED_NAME, HistoryStore
+
+
+def hours(day, first, count):
+    return [f"{day}T{hour:02d}:00" for hour in range(first, first + count)]
+
+
+def test_writes_are_split_by_day_and_bounded(tmp_path):
+    store = HistoryStore(tmp_path)
+    times = hours('2025-01-01', 22, 2) + hours('2025-01-02', 0, 3)
+
+    written = store.write({'Oslo': {'time': times, 'temperature_2m': [1, 2, 3, 4, 5], 'units': 'C'}},
+                          since='2025-01-01T23:00', until='2025-01-02T02:00')
+
+    assert written == 2
+    assert store.partitions() == ['2025-01-01', '2025-01-02']
+    assert store.read(date(2025, 1, 1), date(2025, 1, 2)) == {
+        'Oslo': {'time': ['2025-01-01T23:00', '2025-01-02T00:00', '2025-01-02T01:00'], 'temperature_2m': [2, 3, 4]}
+    }
+
+
+def test_compaction_keeps_later_writes_and_reads_the_same(tmp_path):
+    store = HistoryStore(tmp_path)
+    day = '2025-01-01'
+    store.write({'Oslo': {'time': hours(day, 0, 3), 'temperature_2m': [1, 2, 3]},
+                 'Bergen': {'time': hours(day, 0, 1), 'temperature_2m': [7]}})
+    # A later refresh corrects one hour and adds another variable for the next ones
+    store.write({'Oslo': {'time': hours(day, 1, 3), 'temperature_2m': [20, 30, 40], 'wind_speed_10m': [5, 6, 7]}})
+
+    expected = {
+        'Oslo': {'time': hours(day, 0, 4), 'temperature_2m': [1, 20, 30, 40], 'wind_speed_10m': [None, 5, 6, 7]},
+        'Bergen': {'time': hours(day, 0, 1), 'temperature_2m': [7]},
+    }
+    assert store.read_day(day) == expected
+    assert store.get_status()['pending_segments'] == 2
+
+    assert store.compact(day) is True
+    assert [path.name for path in store._files(day)] == [COMPACTED_NAME]
+    assert store.read_day(day) == expected
+    assert store.read_day(day, ['Bergen']) == {'Bergen': expected['Bergen']}
+    assert store.compact(day) is False
+
+    # Segments written after compaction still win over the compacted file
+    store.write({'Bergen': {'time': hours(day, 0, 1), 'temperature_2m': [8]}})
+    assert store.read_day(day, ['Bergen'])['Bergen']['temperature_2m'] == [8]
+
+
+def test_retention_drops_old_partitions(tmp_path):
+    store = HistoryStore(tmp_path, retention_days=2)
+    for day in ('2025-01-01', '2025-01-02', '2025-01-03', '2025-01-04'):
+        store.write({'Oslo': {'time': hours(day, 0, 1), 'temperature_2m': [1]}})
+
+    assert store.drop_expired(today=date(2025, 1, 4)) == ['2025-01-01']
+    assert store.partitions() == ['2025-01-02', '2025-01-03', '2025-01-04']
+
+    assert HistoryStore(tmp_path).drop_expired(today=date(2030, 1, 1)) == []
+
+
+def test_maintenance_drops_expired_days_and_compacts_the_rest(tmp_path):
+    today = datetime.now(timezone.utc).date()
+    old, recent = (today - timedelta(days=10)).isoformat(), today.isoformat()
+    store = HistoryStore(tmp_path, retention_days=7)
+    for day in (old, recent, recent):
+        store.write({'Oslo': {'time': hours(day, 0, 1), 'temperature_2m': [1]}})
+
+    result = store.maintain()
+
+    assert result['dropped_partitions'] == 1 and result['compacted_partitions'] == 1
+    assert store.partitions() == [recent]
+    assert store.get_status()['pending_segments'] == 0
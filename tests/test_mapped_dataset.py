@@ -0,0 +1,67 @@
+"""Mapped data file: line layout index, lazy parsing and the private fallback"""
+
+import json
+
+from WeatherStation.weather_station.encoding import serialize_cities
+from WeatherStation.weather_station.cache import InProcessLRUCache
+from WeatherStation.weather_station.mapped_dataset import open_dataset
+from WeatherStation.weather_station.serialization import dump_object_lines, dumps, index_object_lines
+
+DATA = {
+    'Zürich': {'hourly': {'time': ['2025-01-01T00:00'], 'temperature_2m': [1.5]}},
+    'A "quoted" city': {'hourly': {'time': [], 'temperature_2m': []}},
+    'Oslo': {'latitude': 59.9, 'hourly': {'time': ['2025-01-01T00:00'], 'temperature_2m': [-3.0]}},
+}
+
+
+def write_lines(path, data):
+    dump_object_lines(((city, dumps(city_data)) for city, city_data in data.items()), path)
+
+
+def test_index_object_lines_rejects_other_layouts():
+    assert index_object_lines(dumps(DATA)) is None
+    assert index_object_lines(json.dumps(DATA, indent=2).encode()) is None
+    assert index_object_lines(b'{\n}\n') == {}
+    assert index_object_lines(b'{\n"a":1\n}\n') == {'a': (6, 7)}
+
+
+def test_line_layout_is_mapped_and_parsed_lazily(tmp_path):
+    path = tmp_path / 'output_data.json'
+    write_lines(path, DATA)
+    dataset = open_dataset(path, parse_cache_size=1)
+
+    assert dataset.shared
+    assert list(dataset) == list(DATA)
+    assert 'Oslo' in dataset and 'Paris' not in dataset
+    assert json.loads(bytes(dataset.raw('Zürich'))) == DATA['Zürich']
+    assert dataset.get_status()['parsed_cities'] == 0
+
+    assert dataset['Oslo'] == DATA['Oslo']
+    assert dataset['Oslo'] is dataset['Oslo']
+    assert dataset['Zürich'] == DATA['Zürich']
+    assert dataset.get_status()['parsed_cities'] == 1
+    assert dict(dataset) == DATA
+
+
+def test_select_and_serialize_copy_raw_fragments(tmp_path):
+    path = tmp_path / 'output_data.json'
+    write_lines(path, DATA)
+    subset = open_dataset(path).select(['Oslo', 'Paris', 'Zürich'])
+
+    assert list(subset) == ['Oslo', 'Zürich']
+    body = serialize_cities(subset, {}, InProcessLRUCache(max_entries=10))
+    assert json.loads(body) == {'Oslo': DATA['Oslo'], 'Zürich': DATA['Zürich']}
+    assert serialize_cities(subset.select([]), {}, InProcessLRUCache(max_entries=10)) == b'{}'
+
+
+def test_other_layouts_fall_back_to_a_private_copy(tmp_path):
+    path = tmp_path / 'output_data.json'
+    path.write_text(json.dumps(DATA, indent=2))
+    dataset = open_dataset(path)
+
+    assert not dataset.shared
+    assert dict(dataset) == DATA
+    assert dataset.get_status()['mapped_bytes'] == 0
+
+    path.write_text('[1, 2]')
+    assert open_dataset(path) is None
@@ -0,0 +1,67 @@
+"""Refresh planning around model runs, demand and failed attempts"""
+
+from datetime import datetime, timezone
+
+from WeatherStation.weather_station.scheduler import RefreshScheduler
+
+CITIES = ['A', 'B', 'C', 'D', 'E', 'F']
+
+
+def at(day, hour, minute=0):
+    return datetime(2025, 1, day, hour, minute, tzinfo=timezone.utc)
+
+
+def scheduler():
+    # Runs at 00/06/12/18Z are served 4 hours later; due cities go out in 3 batches over an hour
+    return RefreshScheduler(run_hours=(0, 6, 12, 18), lag_minutes=240, window_minutes=60,
+                            batches=3, idle_hours=24)
+
+
+def test_due_cities_are_spread_over_the_window_most_requested_first():
+    plan = scheduler()
+    plan.record_requests(['C', 'C', 'E'])
+
+    assert plan.plan(CITIES, at(1, 10)) == (['C', 'E'], 0.0)
+    plan.record_result(['C', 'E'], ['C'], at(1, 10))
+    assert plan.plan(CITIES, at(1, 10, 5)) == ([], 15 * 60)
+
+    # E failed once and is still requested, so it leads the next slot; the rest share the two slots left
+    assert plan.plan(CITIES, at(1, 10, 20)) == (['E', 'A', 'B'], 0.0)
+    plan.record_result(['E', 'A', 'B'], ['E', 'A', 'B'], at(1, 10, 20))
+    assert plan.plan(CITIES, at(1, 10, 40)) == (['D', 'F'], 0.0)
+    plan.record_result(['D', 'F'], ['D', 'F'], at(1, 10, 40))
+
+    # Nothing left: wait until the 12Z run is served
+    assert plan.plan(CITIES, at(1, 11)) == ([], 5 * 3600)
+
+
+def test_idle_cities_wait_for_the_idle_interval_unless_requested():
+    plan = scheduler()
+    plan.seed(CITIES, at(1, 10, 30))
+
+    assert plan.plan(CITIES, at(1, 16)) == ([], 6 * 3600)
+    plan.record_request('B')
+    assert plan.plan(CITIES, at(1, 16)) == (['B'], 0.0)
+    plan.record_result(['B'], ['B'], at(1, 16))
+    assert plan.plan(CITIES, at(1, 16, 30))[0] == []
+
+    # A day of runs later the idle cities are due again; B was fetched for a later run
+    batch, _ = plan.plan(CITIES, at(2, 10))
+    assert batch == ['A', 'C']
+    assert plan.get_status(at(2, 10))['next_cities'] == ['A', 'C', 'D', 'E', 'F']
+
+
+def test_cities_failing_twice_wait_for_the_next_run():
+    plan = scheduler()
+    plan.seed(['A', 'B'], at(1, 4))
+    plan.record_requests(['A', 'B'])
+
+    for minute in (0, 20):
+        assert plan.plan(['A', 'B'], at(1, 10, minute)) == (['A'], 0.0)
+        plan.record_result(['A'], [], at(1, 10, minute))
+    assert plan.plan(['A', 'B'], at(1, 10, 40)) == (['B'], 0.0)
+    plan.record_result(['B'], ['B'], at(1, 10, 40))
+    assert plan.plan(['A', 'B'], at(1, 11)) == ([], 5 * 3600)
+
+    # A new run clears the failed attempts
+    assert plan.plan(['A', 'B'], at(1, 16)) == (['A'], 0.0)
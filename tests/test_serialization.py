@@ -0,0 +1,29 @@
+"""JSON layer: both backends write the same valid JSON"""
+
+import json
+
+import pytest
+
+from WeatherStation.weather_station import serialization
+
+PAYLOAD = {'Oslo': {'hourly': {'temperature_2m': [1.5, float('nan'), float('inf')], 'time': ('00:00', '01:00')},
+                    'elevation': float('-inf'), 'city': 'Oslo'}}
+EXPECTED = {'Oslo': {'hourly': {'temperature_2m': [1.5, None, None], 'time': ['00:00', '01:00']},
+                     'elevation': None, 'city': 'Oslo'}}
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def backend(request, monkeypatch):
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(serialization, 'orjson', None)
+    return request.param
+
+
+def test_non_finite_floats_are_written_as_null(backend):
+    for indent in (False, True):
+        body = serialization.dumps(PAYLOAD, indent=indent)
+        assert json.loads(body, parse_constant=pytest.fail) == EXPECTED
+    assert serialization.dumps(PAYLOAD) == b'{"Oslo":{"hourly":{"temperature_2m":[1.5,null,null],' \
+                                          b'"time":["00:00","01:00"]},"elevation":null,"city":"Oslo"}}'
@@ -0,0 +1,99 @@
+"""Hybrid read path: memory → snapshot → upstream"""
+
+import pytest
+
+from WeatherStation.weather_station.admission import UpstreamBudget, UpstreamOverloaded
+from WeatherStation.weather_station.cache import InProcessLRUCache
+from WeatherStation.weather_station.tiered import TIER_MEMORY, TIER_SNAPSHOT, TIER_UPSTREAM, TieredReader
+
+LOCATIONS = {'Oslo': [59.9, 10.7], 'Bergen': [60.4, 5.3], 'Tromsø': [69.6, 18.9], 'Bodø': [67.3, 14.4]}
+
+
+class StubLive:
+    """Live manager with a canned upstream; from `shed_from` on, cities are shed"""
+
+    def __init__(self, shed_from=None):
+        self.cache = InProcessLRUCache(max_entries=100)
+        self.upstream_budget = UpstreamBudget(max_concurrent=1, max_queue=1, queue_timeout=1)
+        self.shed_from = shed_from
+        self.fetched = []
+
+    def load_locations(self):
+        return LOCATIONS
+
+    def _track_city_data(self, city, data):
+        pass
+
+    def _is_fresh(self, data):
+        return data.get('fresh', True)
+
+    def _refresh_city_data(self, city, coordinates):
+        if city == self.shed_from or (self.shed_from and self.shed_from in self.fetched):
+            self.fetched.append(city)
+            raise UpstreamOverloaded('queue full', 429, 5)
+        self.fetched.append(city)
+        return {'city': city, 'source': 'upstream'}
+
+    def _flush_changes(self, force=True):
+        pass
+
+    def seed_baseline(self, city, data):
+        return True
+
+
+class StubFiles:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def load_weather_data(self):
+        return self.snapshot
+
+
+@pytest.fixture
+def reader_for():
+    readers = []
+    scheduled = []
+
+    def build(live, snapshot=None):
+        reader = TieredReader(live_manager=live, data_manager=StubFiles(snapshot or {}))
+        reader.schedule_refresh = lambda cities, locations: scheduled.extend(cities) or len(cities)
+        readers.append(reader)
+        return reader
+
+    build.scheduled = scheduled
+    yield build
+    for reader in readers:
+        reader._executor.shutdown(wait=False)
+
+
+def test_cities_are_served_from_the_first_tier_that_has_them(reader_for):
+    live = StubLive()
+    live.cache.set('live:Oslo', {'city': 'Oslo', 'fresh': True})
+    live.cache.set('live:Bergen', {'city': 'Bergen', 'fresh': False})
+    reader = reader_for(live, {'Tromsø': {'city': 'Tromsø'}})
+
+    data, tiers = reader.get_cities(LOCATIONS)
+
+    assert list(data) == list(LOCATIONS)
+    assert tiers == {'Oslo': TIER_MEMORY, 'Bergen': TIER_MEMORY, 'Tromsø': TIER_SNAPSHOT, 'Bodø': TIER_UPSTREAM}
+    assert live.fetched == ['Bodø']
+    assert reader_for.scheduled == ['Bergen', 'Tromsø']
+
+
+def test_shed_missing_city_keeps_what_was_found(reader_for):
+    live = StubLive(shed_from='Tromsø')
+    live.cache.set('live:Oslo', {'city': 'Oslo'})
+    reader = reader_for(live)
+
+    data, tiers = reader.get_cities(LOCATIONS)
+
+    assert list(data) == ['Oslo', 'Bergen']
+    assert tiers == {'Oslo': TIER_MEMORY, 'Bergen': TIER_UPSTREAM}
+    assert reader_for.scheduled == ['Tromsø', 'Bodø']
+
+
+def test_shed_request_with_nothing_to_serve_is_raised(reader_for):
+    reader = reader_for(StubLive(shed_from='Oslo'))
+
+    with pytest.raises(UpstreamOverloaded):
+        reader.get_cities(LOCATIONS)
@@ -0,0 +1,57 @@
+"""Dataset versions: delta merging, trimmed history and resets"""
+
+from WeatherStation.weather_station.versioning import DatasetVersionTracker, diff_datasets
+
+
+def change(start, end):
+    return {'start': start, 'end': end}
+
+
+def tracker_at(tmp_path, history_limit=10):
+    return DatasetVersionTracker(path=str(tmp_path / 'dataset_version.json'), history_limit=history_limit)
+
+
+def test_diff_datasets_reports_changed_ranges_and_removals():
+    old = {'Oslo': {'hourly': {'time': ['00', '01', '02'], 't': [1, 2, 3]}}, 'Bergen': {}}
+    new = {'Oslo': {'hourly': {'time': ['01', '02', '03'], 't': [2, 4, 5]}}, 'Bodø': {'hourly': {'time': ['00']}}}
+
+    assert diff_datasets(old, new) == {
+        'Oslo': change('02', '03'),
+        'Bodø': change('00', '00'),
+        'Bergen': {'removed': True},
+    }
+
+
+def test_changes_since_merges_ranges_after_the_client_version(tmp_path):
+    tracker = tracker_at(tmp_path)
+    assert tracker.record({'Oslo': change('05', '08')}) == 1
+    assert tracker.record({'Oslo': change('02', '04'), 'Bergen': change('01', '01')}) == 2
+    assert tracker.record({'Bergen': {'removed': True}}) == 3
+    assert tracker.record({}) == 3
+
+    assert tracker.changes_since(3) is None
+    assert tracker.changes_since(1) == {
+        'version': 3,
+        'full_refresh': False,
+        'changes': {'Oslo': change('02', '04'), 'Bergen': {'removed': True}},
+    }
+    assert tracker.changes_since(0)['changes']['Oslo'] == change('02', '08')
+
+    # Another process (a fresh tracker on the same file) sees the same history
+    assert tracker_at(tmp_path).changes_since(2) == tracker.changes_since(2)
+
+
+def test_trimmed_history_asks_for_a_full_refresh(tmp_path):
+    tracker = tracker_at(tmp_path, history_limit=2)
+    for hour in range(4):
+        tracker.record({'Oslo': change(str(hour), str(hour))})
+
+    assert tracker.changes_since(2)['changes'] == {'Oslo': change('2', '3')}
+    assert tracker.changes_since(1) == {'version': 4, 'full_refresh': True, 'changes': {}}
+
+
+def test_client_ahead_of_a_reset_asks_for_a_full_refresh(tmp_path):
+    tracker = tracker_at(tmp_path)
+    tracker.record({'Oslo': change('00', '01')})
+
+    assert tracker.changes_since(7) == {'version': 1, 'full_refresh': True, 'changes': {}}